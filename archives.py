@@ -0,0 +1,152 @@
+import io
+import os
+import posixpath
+import zipfile
+from collections import deque
+
+from ase.io import read
+
+from constants import *
+from tracing import count
+
+TAIL_BLOCK = 1 << 12
+
+_archives = {}
+
+
+class ResultArchive:
+    """
+    Read only view of a zip made by cp_util.sh ({DIR}_{FILETYPE}.zip), no extraction.
+    The member index is built once when the archive is opened. Besides the real members,
+    every run folder's file is also listed the way POSTOUTPUT/POSTCONTCAR lay them out, so
+
+        H_OSZICAR.zip: H_OSZICAR/1stLayer/O0/OSZICAR
+        can be read as "H_OSZICAR.zip/1stLayer/OSZICAR_O0"
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.files = {}
+        self.dirs = {}
+
+        members = [info for info in self.zip.infolist() if not info.is_dir()]
+        names = [posixpath.normpath(info.filename) for info in members]
+        # cp_util.sh puts everything under one {DIR}_{FILETYPE} folder, which we hide
+        tops = {name.split("/")[0] for name in names}
+        strip = len(tops) == 1 and all("/" in name for name in names)
+
+        for info, name in zip(members, names):
+            rel = name.split("/", 1)[1] if strip else name
+            self._add(rel, info)
+
+            runFolder, fileType = posixpath.split(rel)
+            if runFolder:
+                parent, run = posixpath.split(runFolder)
+                self._add(posixpath.join(parent, f"{fileType}_{run}"), info)
+
+    def _add(self, rel: str, info):
+        self.files[rel] = info
+        parent, name = posixpath.split(rel)
+        self.dirs.setdefault(parent, set()).add(name)
+
+    def listdir(self, inner: str = ""):
+        inner = inner.strip("/")
+        if inner not in self.dirs:
+            print(f"{bcolors.FAIL}{inner} is not in {self.path}{bcolors.ENDC}")
+            raise FileNotFoundError(f"{self.path}/{inner}")
+        # only files, same as the flat POSTOUTPUT folders
+        return sorted(
+            name
+            for name in self.dirs[inner]
+            if posixpath.join(inner, name) in self.files
+        )
+
+    def open(self, inner: str):
+        inner = inner.strip("/")
+        if inner not in self.files:
+            print(f"{bcolors.FAIL}{inner} is not in {self.path}{bcolors.ENDC}")
+            raise FileNotFoundError(f"{self.path}/{inner}")
+        return io.TextIOWrapper(self.zip.open(self.files[inner]))
+
+    def read(self, inner: str):
+        with self.open(inner) as f:
+            return f.read()
+
+    def tail(self, inner: str, n: int = 1):
+        """Last n lines, streamed so the member is never held in memory"""
+        with self.open(inner) as f:
+            return list(deque(f, maxlen=n))
+
+    def close(self):
+        self.zip.close()
+
+
+def splitArchivePath(path: str):
+    # "POSTOUTPUT/H_OSZICAR.zip/1stLayer/OSZICAR_O0"
+    # -> ("POSTOUTPUT/H_OSZICAR.zip", "1stLayer/OSZICAR_O0")
+    parts = path.replace(os.sep, "/").split("/")
+    for i, part in enumerate(parts):
+        if part.lower().endswith(".zip"):
+            return "/".join(parts[: i + 1]), "/".join(parts[i + 1 :])
+    return None, path
+
+
+def isArchivePath(path: str):
+    return splitArchivePath(path)[0] is not None
+
+
+def openArchive(zipPath: str):
+    # opened once per process, the index is reused by every later read.
+    # keyed by pid too, forked workers must not share the parent's file offset
+    key = (os.getpid(), zipPath)
+    if key not in _archives:
+        _archives[key] = ResultArchive(zipPath)
+    else:
+        count("archive cache hits")
+    return _archives[key]
+
+
+def listResults(directory: str):
+    """os.listdir that also works inside archives"""
+    zipPath, inner = splitArchivePath(directory)
+    if zipPath is None:
+        return os.listdir(directory)
+    return openArchive(zipPath).listdir(inner)
+
+
+def openResult(path: str):
+    """open(path) that also works inside archives"""
+    zipPath, inner = splitArchivePath(path)
+    if zipPath is None:
+        return open(path)
+    return openArchive(zipPath).open(inner)
+
+
+def tailResult(path: str, n: int = 1):
+    """Last n lines of a result file, inside archives or not"""
+    zipPath, inner = splitArchivePath(path)
+    count("files")
+    if zipPath is not None:
+        return openArchive(zipPath).tail(inner, n)
+
+    # plain file: read backwards from the end until we have n full lines
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        block = TAIL_BLOCK
+        while True:
+            f.seek(max(0, size - block))
+            data = f.read()
+            if data.count(b"\n") > n or block >= size:
+                break
+            block *= 4
+    count("bytes", len(data))
+    return [line.decode() for line in data.splitlines(keepends=True)[-n:]]
+
+
+def readResultAtoms(path: str, format: str = "vasp"):
+    """ase.io.read for CONTCAR/POSCAR files, inside archives or not"""
+    if not isArchivePath(path):
+        return read(path, format=format)
+    with openResult(path) as f:
+        return read(io.StringIO(f.read()), format=format)
@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import energies
+import main
+from constants import *
+from coverage import iterCoverageCombinations
+from supercell import UnitSites
+from synthetic import wo3Slab, writeOszicar
+
+BASELINE = "benchmarks.json"
+TIME_THRESHOLD = 1.25  # slower than the baseline by more than 25% = regression
+MEMORY_THRESHOLD = 1.25
+
+
+class Benchmark:
+    """
+    fn(*setup(size)) timed for every size, scale(size) is the problem size the scaling
+    exponent is fitted against (ex: number of atoms of the nx x nx slab)
+    """
+
+    def __init__(self, name, setup, fn, sizes, scale, unit, quickSizes=None):
+        self.name = name
+        self.setup = setup
+        self.fn = fn
+        self.sizes = sizes
+        self.quickSizes = quickSizes or sizes[:2]
+        self.scale = scale
+        self.unit = unit
+
+
+def measure(fn, args, repeat: int):
+    """(best seconds of repeat runs, peak traced bytes of one more run)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    # separate run, tracemalloc slows allocations down a lot
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def scalingExponent(scales, seconds):
+    # slope of log(time) vs log(size), 1 = linear, 2 = quadratic
+    if len(scales) < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(scales), np.log(seconds), 1)[0])
+
+
+def hotPathBenchmarks(workspace: str):
+    slabs = {}
+
+    def slab(n):
+        if n not in slabs:
+            slabs[n] = wo3Slab(n, n)
+        return slabs[n]
+
+    def oszicar(steps):
+        path = os.path.join(workspace, f"OSZICAR_{steps}")
+        if not os.path.exists(path):
+            writeOszicar(path, steps)
+        return (path,)
+
+    def contcarRun(n):
+        # POSCAR + CONTCAR of one run in the layout addContcarImagesToDf reads
+        name = f"O{n}"
+        os.makedirs(os.path.join(workspace, f"H/{name}"), exist_ok=True)
+        os.makedirs(os.path.join(workspace, "POSTCONTCAR/H_CONTCAR"), exist_ok=True)
+        slab(n).write(os.path.join(workspace, f"H/{name}/POSCAR"), format="vasp")
+        slab(n).write(
+            os.path.join(workspace, f"POSTCONTCAR/H_CONTCAR/CONTCAR_{name}"),
+            format="vasp",
+        )
+        return (
+            pd.DataFrame({"name": [name]}),
+            "POSTCONTCAR/H_CONTCAR",
+            "H",
+            "name",
+            True,
+        )
+
+    # 27 O sites of the top two layers of a 3x3 WO3 slab, k = 8 -> 31783 placements
+    coverageCell = UnitSites(wo3Slab(1, 1)).supercell(3, 3)
+    placements = {}
+
+    def placeAdsorbates(supercell, k):
+        return sum(1 for _ in iterCoverageCombinations(supercell, k, layers=(-1, -2)))
+
+    def placementCount(k):
+        if k not in placements:
+            placements[k] = placeAdsorbates(coverageCell, k)
+        return placements[k]
+
+    natoms = lambda n: len(slab(n))
+    return [
+        Benchmark(
+            "getSurfaceAtoms",
+            lambda n: ("O", 0, slab(n)),
+            main.getSurfaceAtoms,
+            [1, 2, 4, 8],
+            natoms,
+            "atoms",
+        ),
+        Benchmark(
+            "calculateDistancesForEachAtomPair",
+            lambda n: (slab(n), "W", "O"),
+            main.calculateDistancesForEachAtomPair,
+            [1, 2, 4, 8],
+            natoms,
+            "atoms",
+        ),
+        Benchmark(
+            "readOszicarFileAndGetLastLineEnergy",
+            oszicar,
+            energies.readOszicarFileAndGetLastLineEnergy,
+            [10, 100, 1000, 10000, 100000],
+            lambda steps: steps,
+            "ionic steps",
+            quickSizes=[10, 1000, 100000],
+        ),
+        Benchmark(
+            "addContcarImagesToDf",
+            contcarRun,
+            main.addContcarImagesToDf,
+            [1, 2, 4],
+            natoms,
+            "atoms",
+            quickSizes=[1, 2],
+        ),
+        Benchmark(
+            "iterCoverageCombinations",
+            lambda k: (coverageCell, k),
+            placeAdsorbates,
+            [2, 4, 6, 8],
+            placementCount,
+            "placements",
+            quickSizes=[4, 6],
+        ),
+    ]
+
+
+def runBenchmarks(names=None, quick=False, repeat: int = 3):
+    """
+    {benchmark: {"unit", "sizes", "scales", "seconds", "peakBytes", "exponent"}} of every
+    hot path, run inside a throwaway workspace (images are rendered there too)
+    """
+    results = {}
+    cwd = os.getcwd()
+    workspace = tempfile.mkdtemp(prefix="benchmarks_")
+    try:
+        os.chdir(workspace)
+        for benchmark in hotPathBenchmarks(workspace):
+            if names and benchmark.name not in names:
+                continue
+            sizes = benchmark.quickSizes if quick else benchmark.sizes
+            entry = {"unit": benchmark.unit, "sizes": sizes, "scales": []}
+            entry.update(seconds=[], peakBytes=[])
+            for size in sizes:
+                args = benchmark.setup(size)
+                seconds, peak = measure(benchmark.fn, args, repeat)
+                entry["scales"].append(benchmark.scale(size))
+                entry["seconds"].append(seconds)
+                entry["peakBytes"].append(peak)
+                print(
+                    f"{benchmark.name:40s} {benchmark.scale(size):>8} {benchmark.unit:12s}"
+                    f"{seconds * 1e3:12.3f} ms {peak / 2**20:10.2f} MiB"
+                )
+            entry["exponent"] = scalingExponent(entry["scales"], entry["seconds"])
+            print(
+                f"{bcolors.OKCYAN}{benchmark.name}: time ~ {benchmark.unit}^{entry['exponent']:.2f}{bcolors.ENDC}"
+            )
+            results[benchmark.name] = entry
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def compareToBaseline(
+    results, baseline, timeThreshold=TIME_THRESHOLD, memoryThreshold=MEMORY_THRESHOLD
+):
+    """Regressions as (benchmark, size, what, ratio), sizes missing from either side are skipped"""
+    regressions = []
+    for name, entry in results.items():
+        if name not in baseline:
+            continue
+        before = dict(
+            zip(
+                baseline[name]["sizes"],
+                zip(baseline[name]["seconds"], baseline[name]["peakBytes"]),
+            )
+        )
+        for size, seconds, peak in zip(
+            entry["sizes"], entry["seconds"], entry["peakBytes"]
+        ):
+            if size not in before:
+                continue
+            oldSeconds, oldPeak = before[size]
+            if seconds > oldSeconds * timeThreshold:
+                regressions.append((name, size, "time", seconds / oldSeconds))
+            if oldPeak and peak > oldPeak * memoryThreshold:
+                regressions.append((name, size, "memory", peak / oldPeak))
+    return regressions
+
+
+def plotScaling(results, output: str = "benchmarks.png"):
+    """log-log time and peak memory vs problem size, one line per benchmark"""
+    import matplotlib.pyplot as plt
+
+    fig, (timeAxis, memoryAxis) = plt.subplots(1, 2, figsize=(12, 5))
+    for name, entry in results.items():
+        label = f"{name} (~{entry['unit']}^{entry['exponent']:.2f})"
+        timeAxis.loglog(entry["scales"], entry["seconds"], "o-", label=label)
+        memoryAxis.loglog(
+            entry["scales"], np.array(entry["peakBytes"]) / 2**20, "o-", label=name
+        )
+    timeAxis.set_xlabel("size (atoms / ionic steps)")
+    timeAxis.set_ylabel("time (s)")
+    memoryAxis.set_xlabel("size (atoms / ionic steps)")
+    memoryAxis.set_ylabel("peak memory (MiB)")
+    timeAxis.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(output, dpi=150)
+    plt.close(fig)
+    return output
+
+
+if __name__ == "__main__":
+    # python benchmarks.py --save              -> records benchmarks.json as the baseline
+    # python benchmarks.py --compare --plot    -> exits 1 if anything got slower/bigger
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of the generation/analysis hot paths"
+    )
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--quick", action="store_true", help="fewer, smaller sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--save", nargs="?", const=BASELINE, help="write the results as a baseline"
+    )
+    parser.add_argument(
+        "--compare", nargs="?", const=BASELINE, help="baseline to check against"
+    )
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    parser.add_argument("--plot", nargs="?", const="benchmarks.png")
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.names, args.quick, args.repeat)
+    if args.plot:
+        print(plotScaling(results, args.plot))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compareToBaseline(
+            results, baseline, args.time_threshold, args.memory_threshold
+        )
+        for name, size, what, ratio in regressions:
+            print(
+                f"{bcolors.FAIL}{name} at {size}: {what} x{ratio:.2f} of the baseline{bcolors.ENDC}"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"{bcolors.OKGREEN}No regressions against {args.compare}{bcolors.ENDC}")
@@ -0,0 +1,152 @@
+import numpy as np
+from ase.data import atomic_numbers, chemical_symbols, covalent_radii
+
+from constants import *
+
+# fraction of the covalent radii sum two atoms can get to before it counts as a clash
+CLASH_SCALE = 0.75
+
+
+def topLayerZ(slab):
+    # same reference height add_adsorbate uses
+    info = slab.info.get("adsorbate_info", {})
+    top = info.get("top layer atom index")
+    if top is None or top >= len(slab):
+        top = slab.positions[:, 2].argmax()
+    return slab.positions[top, 2]
+
+
+def placementPositions(slab, moleculePositions, heights, xys, mol_index: int = 0):
+    """
+    Where add_adsorbate would put each candidate, without touching the slab.
+    moleculePositions is (natoms, 3) or (N, natoms, 3), heights (N,), xys (N, 2) -> (N, natoms, 3)
+    """
+    xys = np.atleast_2d(np.asarray(xys, dtype=float))
+    heights = np.broadcast_to(np.asarray(heights, dtype=float), (len(xys),))
+    moleculePositions = np.asarray(moleculePositions, dtype=float)
+    if moleculePositions.ndim == 2:
+        moleculePositions = np.broadcast_to(
+            moleculePositions, (len(xys),) + moleculePositions.shape
+        )
+
+    anchors = np.column_stack([xys, topLayerZ(slab) + heights])
+    # same order of operations as ads.translate(anchor - ads.positions[mol_index])
+    return moleculePositions + (
+        anchors[:, None] - moleculePositions[:, mol_index : mol_index + 1]
+    )
+
+
+def pairThresholds(adsorbateNumbers, slabNumbers, scale=CLASH_SCALE, overrides=None):
+    """
+    (natoms, nslab) minimum allowed distances. overrides ex: {("H", "O"): 0.9} in Å,
+    order of the pair doesn't matter
+    """
+    adsorbateNumbers = np.asarray(adsorbateNumbers)
+    slabNumbers = np.asarray(slabNumbers)
+    thresholds = scale * (
+        covalent_radii[adsorbateNumbers][:, None] + covalent_radii[slabNumbers][None, :]
+    )
+    for (a, b), distance in (overrides or {}).items():
+        za, zb = atomic_numbers[a], atomic_numbers[b]
+        pair = (adsorbateNumbers[:, None] == za) & (slabNumbers[None, :] == zb)
+        pair |= (adsorbateNumbers[:, None] == zb) & (slabNumbers[None, :] == za)
+        thresholds[pair] = distance
+    return thresholds
+
+
+def adsorbateSlabDistances(slab, candidates, chunkSize: int = 256):
+    """
+    Minimum image distances between every candidate adsorbate atom and every slab atom.
+    candidates is (N, natoms, 3) -> (N, natoms, nslab). Done chunkSize candidates at a time
+    """
+    candidates = np.asarray(candidates, dtype=float)
+    cell = np.asarray(slab.get_cell())
+    periodic = np.asarray(slab.pbc)
+    slabFrac = np.linalg.solve(cell.T, slab.positions.T).T
+
+    distances = np.empty(candidates.shape[:2] + (len(slab),))
+    for start in range(0, len(candidates), chunkSize):
+        chunk = candidates[start : start + chunkSize]
+        frac = np.einsum("nai,ij->naj", chunk, np.linalg.inv(cell))
+        diff = frac[:, :, None, :] - slabFrac[None, None, :, :]
+        diff[..., periodic] -= np.rint(diff[..., periodic])
+        distances[start : start + chunkSize] = np.linalg.norm(diff @ cell, axis=-1)
+    return distances
+
+
+def clashReasons(distances, thresholds, adsorbateNumbers, slabNumbers):
+    """Text for the worst offending pair of each candidate, None when it is clear"""
+    margin = distances - thresholds[None]
+    flat = margin.reshape(len(margin), -1).argmin(axis=1)
+    atom, slabAtom = np.unravel_index(flat, thresholds.shape)
+
+    reasons = []
+    for n in range(len(distances)):
+        i, j = atom[n], slabAtom[n]
+        if margin[n, i, j] >= 0:
+            reasons.append(None)
+            continue
+        reasons.append(
+            f"{chemical_symbols[adsorbateNumbers[i]]}-{chemical_symbols[slabNumbers[j]]} "
+            f"{distances[n, i, j]:.2f} Å < {thresholds[i, j]:.2f} Å "
+            f"(adsorbate atom {i}, slab atom {j})"
+        )
+    return reasons
+
+
+def filterClashes(
+    slab,
+    candidates,
+    adsorbateNumbers,
+    mode: str = "reject",
+    scale=CLASH_SCALE,
+    overrides=None,
+    step: float = 0.1,
+    maxRaise: float = 2.0,
+):
+    """
+    Checks a whole batch of placed candidates (N, natoms, 3) against the slab.
+    mode "reject": clashing candidates are dropped
+    mode "raise": clashing candidates are lifted in `step` Å increments, up to `maxRaise`
+    Returns (keep mask, z shift per candidate, reason per candidate or None)
+    """
+    candidates = np.array(candidates, dtype=float)
+    adsorbateNumbers = np.asarray(adsorbateNumbers)
+    thresholds = pairThresholds(adsorbateNumbers, slab.numbers, scale, overrides)
+
+    distances = adsorbateSlabDistances(slab, candidates)
+    clashing = np.any(distances < thresholds[None], axis=(1, 2))
+    shifts = np.zeros(len(candidates))
+
+    if mode == "raise":
+        lift = 0.0
+        while clashing.any() and lift + step <= maxRaise + 1e-9:
+            lift += step
+            idx = np.flatnonzero(clashing)
+            candidates[idx, :, 2] += step
+            shifts[idx] = lift
+            distances[idx] = adsorbateSlabDistances(slab, candidates[idx])
+            clashing[idx] = np.any(distances[idx] < thresholds[None], axis=(1, 2))
+    elif mode != "reject":
+        print(f'{bcolors.FAIL}Unknown clash mode "{mode}"{bcolors.ENDC}')
+        raise ValueError
+
+    reasons = clashReasons(distances, thresholds, adsorbateNumbers, slab.numbers)
+    if mode == "raise":
+        reasons = [
+            (
+                None
+                if reason is None
+                else f"{reason}, still clashing after raising {maxRaise} Å"
+            )
+            for reason in reasons
+        ]
+    return ~clashing, shifts, reasons
+
+
+def printClashReport(names, keep, shifts, reasons):
+    for name, kept, shift, reason in zip(names, keep, shifts, reasons):
+        if not kept:
+            print(f"{bcolors.FAIL}Dropped {name}: {reason}{bcolors.ENDC}")
+        elif shift > 0:
+            print(f"{bcolors.WARNING}Raised {name} by {shift:.2f} Å{bcolors.ENDC}")
@@ -0,0 +1,159 @@
+from array import array
+
+import numpy as np
+from ase import Atoms
+
+from constants import *
+
+
+class Configuration:
+    """
+    A generated structure stored as what changed from its parent slab: the parent indices
+    that were removed (vacancies) and the atoms that were added (adsorbates), in that order,
+    the same way add_h/add_h2o_vacancy build them (slab.copy(), del O, add_adsorbate).
+    The full Atoms only exists once atoms() is called.
+
+    Pickling a list of configurations that share a parent (an executor chunk) sends the
+    parent once, pickle memoizes it
+    """
+
+    __slots__ = ("parent", "removed", "numbers", "positions", "name")
+
+    def __init__(self, parent, removed=(), numbers=(), positions=None, name=None):
+        self.parent = parent
+        self.removed = np.asarray(removed, dtype=np.int32)
+        self.numbers = np.asarray(numbers, dtype=np.uint8)
+        self.positions = (
+            np.zeros((0, 3))
+            if positions is None
+            else np.asarray(positions, dtype=float).reshape(-1, 3)
+        )
+        self.name = name
+
+    def atoms(self):
+        atoms = self.parent.copy()
+        if len(self.removed):
+            # ase shifts the FixAtoms indices for us
+            del atoms[self.removed]
+        if len(self.numbers):
+            atoms.extend(Atoms(numbers=self.numbers, positions=self.positions))
+        return atoms
+
+    def __len__(self):
+        return len(self.parent) - len(self.removed) + len(self.numbers)
+
+    @property
+    def nbytes(self):
+        # delta only, the parent is shared
+        return self.removed.nbytes + self.numbers.nbytes + self.positions.nbytes
+
+    def __repr__(self):
+        return (
+            f"Configuration({self.name}, -{list(self.removed)}, +{list(self.numbers)})"
+        )
+
+
+def materialize(configuration):
+    """Atoms from a Configuration, Atoms are passed through"""
+    if isinstance(configuration, Configuration):
+        return configuration.atoms()
+    return configuration
+
+
+class ConfigurationStore:
+    """
+    Columnar store for large sweeps (100k+ candidates): parents are kept once, every
+    configuration is a parent index plus its slice of the flat removed/added arrays.
+    store[i] gives a Configuration back, store.atoms(i) the materialized Atoms
+    """
+
+    def __init__(self):
+        self.parents = []
+        self._parentIds = {}
+        self.parentIndex = array("i")
+        self.removed = array("i")
+        self.removedOffsets = array("i", [0])
+        self.numbers = array("B")
+        self.positions = array("d")
+        self.addedOffsets = array("i", [0])
+        self.names = []
+
+    def _parent(self, parent):
+        # same Atoms object -> same parent entry
+        key = id(parent)
+        if key not in self._parentIds:
+            self._parentIds[key] = len(self.parents)
+            self.parents.append(parent)
+        return self._parentIds[key]
+
+    def add(self, parent, removed=(), numbers=(), positions=None, name=None):
+        """Returns the index of the new configuration"""
+        self.parentIndex.append(self._parent(parent))
+        self.removed.extend(int(i) for i in removed)
+        self.removedOffsets.append(len(self.removed))
+        self.numbers.extend(int(z) for z in numbers)
+        if positions is not None:
+            self.positions.extend(np.asarray(positions, dtype=float).ravel())
+        if len(self.positions) != 3 * len(self.numbers):
+            print(
+                f"{bcolors.FAIL}Added atoms need one position per number{bcolors.ENDC}"
+            )
+            raise ValueError
+        self.addedOffsets.append(len(self.numbers))
+        self.names.append(name)
+        return len(self.parentIndex) - 1
+
+    def append(self, configuration):
+        return self.add(
+            configuration.parent,
+            configuration.removed,
+            configuration.numbers,
+            configuration.positions,
+            configuration.name,
+        )
+
+    def __len__(self):
+        return len(self.parentIndex)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        r0, r1 = self.removedOffsets[i], self.removedOffsets[i + 1]
+        a0, a1 = self.addedOffsets[i], self.addedOffsets[i + 1]
+        return Configuration(
+            self.parents[self.parentIndex[i]],
+            self.removed[r0:r1],
+            self.numbers[a0:a1],
+            self.positions[3 * a0 : 3 * a1],
+            self.names[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def atoms(self, i):
+        return self[i].atoms()
+
+    @property
+    def nbytes(self):
+        # deltas only, not the parents or the name strings
+        columns = (
+            self.parentIndex,
+            self.removed,
+            self.removedOffsets,
+            self.numbers,
+            self.positions,
+            self.addedOffsets,
+        )
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def __getstate__(self):
+        # id() based parent lookup doesn't survive pickling, rebuilt on load
+        state = self.__dict__.copy()
+        del state["_parentIds"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parentIds = {id(parent): i for i, parent in enumerate(self.parents)}
@@ -14,3 +14,6 @@ OUTPUT_DIR = "POSTOUTPUT"
 NAME_LABEL = "Orientation/Location Molecule Takes"
 ENERGY_LABEL = "Adsorption Energy (eV)"
 
+FINGERPRINT_DB = "fingerprints.db"
+CONVERGENCE_CACHE = "convergence.json"
+RESULTS_DB = "results.db"
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+
+import pandas as pd
+
+from constants import *
+from executors import SerialExecutor, isRoot
+from outcar import freeAtomsMask, scanOutcar
+from pipeline import findRuns
+from tracing import count, traced
+
+CONVERGED = "converged"
+ELECTRONIC = "electronically unconverged"
+IONIC = "ionically unconverged"
+CRASHED = "crashed"
+# only an OSZICAR: a run killed before NSW looks exactly like one that reached EDIFFG
+UNVERIFIED = "unverified"
+
+LABEL_COLORS = {
+    CONVERGED: "green",
+    ELECTRONIC: "orange",
+    IONIC: "orange",
+    CRASHED: "red",
+    UNVERIFIED: "gray",
+}
+
+# files the label depends on, a change to any of them invalidates the cached label
+RUN_FILES = ("INCAR", "OUTCAR", "OSZICAR", "POSCAR")
+
+OSZICAR_IONIC_RE = re.compile(r"^\s*\d+\s+F=", re.M)
+# "DAV:  12   -0.43E+03 ..." / "RMM:" / "CG :", the number is the electronic iteration
+OSZICAR_ELECTRONIC_RE = re.compile(r"^[A-Z][A-Z ]{1,4}:\s+(\d+)", re.M)
+
+
+def readIncar(path: str):
+    """INCAR tags as {TAG: value string}, comments (# or !) and ; separated tags handled"""
+    tags = {}
+    with open(path) as f:
+        for line in f:
+            line = re.split(r"[#!]", line, maxsplit=1)[0]
+            for statement in line.split(";"):
+                if "=" in statement:
+                    tag, value = statement.split("=", 1)
+                    tags[tag.strip().upper()] = value.strip()
+    return tags
+
+
+def incarSettings(tags: dict):
+    # the tags the classifier needs, with the VASP defaults for the missing ones
+    nsw = int(tags.get("NSW", 0))
+    ediff = float(tags.get("EDIFF", 1e-4))
+    return {
+        "NSW": nsw,
+        "NELM": int(tags.get("NELM", 60)),
+        "EDIFF": ediff,
+        "EDIFFG": float(tags.get("EDIFFG", 10 * ediff)),
+        "IBRION": int(tags.get("IBRION", -1 if nsw in (-1, 0) else 0)),
+    }
+
+
+def scanOszicar(path: str):
+    """(ionic steps, electronic steps of the last ionic step) from an OSZICAR"""
+    with open(path) as f:
+        text = f.read()
+    ionic = [m.start() for m in OSZICAR_IONIC_RE.finditer(text)]
+    if not ionic:
+        return 0, 0
+    # last electronic iteration number before the last "N F=" line
+    last = 0
+    for m in OSZICAR_ELECTRONIC_RE.finditer(text, 0, ionic[-1]):
+        last = int(m.group(1))
+    return len(ionic), last
+
+
+def classifyRun(runFolder: str):
+    """
+    (label, details) of one run folder, label is one of CONVERGED, ELECTRONIC, IONIC,
+    CRASHED or UNVERIFIED. Needs the OUTCAR (forces, accuracy message, normal
+    termination), with only an OSZICAR the run is UNVERIFIED unless its last SCF hit NELM.
+    Relaxations with EDIFFG < 0 are checked on the last max force of the free atoms
+    """
+    incarPath = os.path.join(runFolder, "INCAR")
+    incar = incarSettings(readIncar(incarPath) if os.path.exists(incarPath) else {})
+    outcarPath = os.path.join(runFolder, "OUTCAR")
+    oszicarPath = os.path.join(runFolder, "OSZICAR")
+
+    details = dict(incar)
+    if os.path.exists(outcarPath):
+        steps, summary = scanOutcar(outcarPath, freeAtomsMask(runFolder))
+        ionicSteps = summary["steps"]
+        electronicSteps = int(steps["Electronic steps"].iloc[-1]) if ionicSteps else 0
+        finished = summary["finished"]
+        reached = summary["reachedAccuracy"]
+        if ionicSteps:
+            details["Max force (eV/Å)"] = float(steps["Max force (eV/Å)"].iloc[-1])
+    elif os.path.exists(oszicarPath):
+        ionicSteps, electronicSteps = scanOszicar(oszicarPath)
+        details.update(ionicSteps=ionicSteps, electronicSteps=electronicSteps)
+        if ionicSteps and electronicSteps >= incar["NELM"]:
+            return ELECTRONIC, details
+        return UNVERIFIED, details
+    else:
+        return CRASHED, details
+    details.update(ionicSteps=ionicSteps, electronicSteps=electronicSteps)
+
+    if not finished or ionicSteps == 0:
+        return CRASHED, details
+    if electronicSteps >= incar["NELM"]:
+        # the last SCF ran out of NELM, the energy we'd report isn't converged
+        return ELECTRONIC, details
+    relaxation = incar["NSW"] > 0 and incar["IBRION"] in (1, 2, 3)
+    if relaxation and incar["EDIFFG"] < 0:
+        # a force criterion: the INCAR says what "reached" means, not just the message
+        maxForce = details.get("Max force (eV/Å)", float("nan"))
+        reached = maxForce <= abs(incar["EDIFFG"])
+    if relaxation and not reached:
+        return IONIC, details
+    return CONVERGED, details
+
+
+def _stamp(runFolder: str):
+    stamp = []
+    for name in RUN_FILES:
+        path = os.path.join(runFolder, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stamp.append([name, stat.st_size, stat.st_mtime_ns])
+    return stamp
+
+
+def _classifyJob(runFolder: str):
+    label, details = classifyRun(runFolder)
+    return {"stamp": _stamp(runFolder), "label": label, "details": details}
+
+
+@traced("classify")
+def cachedClassifications(
+    runFolders, executor=None, cachePath: str = CONVERGENCE_CACHE
+):
+    """
+    {run folder: {"stamp", "label", "details"}}. Entries are cached in cachePath with the
+    size/mtime of the run's files, so only new or changed runs are scanned again and an
+    unchanged tree costs one stat per file
+    """
+    executor = executor or SerialExecutor()
+    cache = {}
+    if cachePath and os.path.exists(cachePath):
+        with open(cachePath) as f:
+            cache = json.load(f)
+
+    stale = [
+        run for run in runFolders if cache.get(run, {}).get("stamp") != _stamp(run)
+    ]
+    count("cache hits", len(runFolders) - len(stale))
+    count("runs classified", len(stale))
+    if stale:
+        for run, entry in zip(stale, executor.map(_classifyJob, stale)):
+            cache[run] = entry
+        # every MPI rank has the same entries, one writer is enough
+        if cachePath and isRoot(executor):
+            tmp = cachePath + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, cachePath)
+
+    return {run: cache[run] for run in runFolders}
+
+
+def classifyRuns(runFolders, executor=None, cachePath: str = CONVERGENCE_CACHE):
+    """{run folder: label}, see cachedClassifications"""
+    entries = cachedClassifications(runFolders, executor, cachePath)
+    return {run: entry["label"] for run, entry in entries.items()}
+
+
+def convergenceTable(tree: str, executor=None, cachePath: str = CONVERGENCE_CACHE):
+    """One row per run folder under tree (ex: "H2O") with its label and the numbers behind it"""
+    runs = findRuns(tree)
+    rows = []
+    for run, entry in cachedClassifications(runs, executor, cachePath).items():
+        row = {"Run": os.path.relpath(run, tree), "Convergence": entry["label"]}
+        row.update(entry["details"])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def formatConvergence(label: str):
+    """to_html formatter for the Convergence column, ex: format_dict["Convergence"] = formatConvergence"""
+    return f'<span style="color: {LABEL_COLORS.get(label, "black")}">{label}</span>'
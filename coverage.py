@@ -0,0 +1,145 @@
+import numpy as np
+from ase.geometry import get_distances
+
+from clashes import placementPositions, topLayerZ
+from configurations import Configuration
+from constants import *
+from selection import symbolLayerIndices
+from supercell import Supercell
+from vacancies import SLAB_PBC, candidateSymmetryPermutations
+
+
+def siteDistanceMatrix(slab, positions):
+    """In plane minimum image distances between every pair of site positions (n, 3), see SLAB_PBC"""
+    _, distances = get_distances(
+        np.asarray(positions, dtype=float), cell=slab.cell, pbc=SLAB_PBC
+    )
+    return distances
+
+
+def iterSiteCombinations(compatible, k: int, permutations=None):
+    """
+    Streams every set of k sites that are pairwise `compatible` ((n, n) bool) as sorted
+    arrays of site positions, depth first in lexicographic order. Branch and bound:
+    - a branch stops as soon as fewer sites are left than it still needs
+    - with `permutations` (n_ops, n) a partial set is dropped when a symmetry operation
+      maps it to a lexicographically smaller one, every completion of it would be too,
+      so only the smallest member of each orbit is built and nothing is deduplicated after
+    """
+    count = len(compatible)
+    if k < 1 or k > count:
+        return
+    # only look forward so every set is built once, in sorted order
+    forward = np.asarray(compatible, dtype=bool) & (
+        np.arange(count)[None, :] > np.arange(count)[:, None]
+    )
+    # the set as a base-count number compares like the sorted tuple
+    dtype = np.int64 if count**k < 2**63 else object
+    powers = np.array([count**p for p in range(k - 1, -1, -1)], dtype=dtype)
+    if permutations is not None:
+        permutations = np.asarray(permutations)
+
+    stack = [(np.array([i]), forward[i]) for i in range(count - 1, -1, -1)]
+    while stack:
+        chosen, allowed = stack.pop()
+        depth = len(chosen)
+        if permutations is not None:
+            weights = powers[k - depth :]
+            images = np.sort(permutations[:, chosen], axis=1)
+            if (images @ weights).min() < chosen @ weights:
+                continue
+        if depth == k:
+            yield chosen
+            continue
+
+        remaining = np.flatnonzero(allowed)
+        if len(remaining) < k - depth:
+            continue
+        for nxt in remaining[::-1]:
+            stack.append((np.append(chosen, nxt), allowed & forward[nxt]))
+
+
+def _sitesOf(slab, symbol, layers, symmetry, candidates, permutations):
+    # a Supercell brings the sites and symmetry it broadcast from its unit cell
+    if isinstance(slab, Supercell):
+        if candidates is None:
+            candidates = slab.layerIndices(symbol, layers)
+        if symmetry and permutations is None:
+            permutations = slab.candidatePermutations(symbol, layers)
+        slab = slab.atoms
+    if candidates is None:
+        candidates = symbolLayerIndices(slab, symbol, layers)
+    candidates = np.asarray(candidates)
+    if not symmetry:
+        permutations = None
+    elif permutations is None:
+        permutations = candidateSymmetryPermutations(slab, candidates)
+    return slab, candidates, permutations
+
+
+def iterCoverageCombinations(
+    slab,
+    coverage: int,
+    symbol: str = "O",
+    layers=(-1,),
+    minDistance: float = 0.0,
+    symmetry=True,
+    candidates=None,
+    permutations=None,
+):
+    """
+    Streams every placement of `coverage` adsorbates on distinct `symbol` sites of `layers`
+    at least `minDistance` apart (in plane minimum image), one per symmetry orbit, as
+    (layer positions, slab indices). `slab` can be a Supercell
+    """
+    slab, candidates, permutations = _sitesOf(
+        slab, symbol, layers, symmetry, candidates, permutations
+    )
+    distances = siteDistanceMatrix(slab, slab.positions[candidates])
+    compatible = distances >= minDistance
+    np.fill_diagonal(compatible, False)
+    for chosen in iterSiteCombinations(compatible, coverage, permutations):
+        yield chosen, candidates[chosen]
+
+
+def iterCoverageConfigurations(
+    slab,
+    molecule,
+    coverage: int,
+    height: float,
+    symbol: str = "O",
+    layers=(-1,),
+    minDistance: float = 0.0,
+    vacancy=False,
+    symmetry=True,
+    candidates=None,
+    permutations=None,
+):
+    """
+    Same placements as Configurations: `molecule` (already oriented) add_adsorbate'd
+    `height` above every chosen site, the site atoms removed first with `vacancy`.
+    name is the "-" joined layer positions, ex: "0-4"
+    """
+    slab, candidates, permutations = _sitesOf(
+        slab, symbol, layers, symmetry, candidates, permutations
+    )
+    top = topLayerZ(slab)
+    z = slab.positions[:, 2]
+    for chosen, sites in iterCoverageCombinations(
+        slab, coverage, symbol, layers, minDistance, symmetry, candidates, permutations
+    ):
+        removed = sites if vacancy else ()
+        # add_adsorbate measures the height from the top of the slab the vacancies left
+        heights = height
+        if vacancy:
+            heights = height + np.delete(z, sites).max() - top
+        placed = placementPositions(
+            slab, molecule.positions, heights, slab.positions[sites, :2]
+        )
+        yield Configuration(
+            slab,
+            removed,
+            numbers=np.tile(molecule.numbers, coverage),
+            positions=placed.reshape(-1, 3),
+            name="-".join(str(i) for i in chosen),
+        )
@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+from ase import Atoms
+from ase.geometry import get_distances
+from pymatgen.io.vasp import Vasprun
+
+from constants import *
+from executors import SerialExecutor
+from selection import symbolLayerIndices
+from tracing import count, traced
+
+
+@traced("parse")
+def loadProjectedDos(vasprunPath: str, cache=True):
+    """
+    Site projected DOS of a run as arrays, cached next to the file as {path}.pdos.npz
+    pdos is (nspins, natoms, norbitals, nE), orbitals are pymatgen names (s, py, ... or s, p, d)
+    """
+    cachePath = f"{vasprunPath}.pdos.npz"
+    if (
+        cache
+        and os.path.exists(cachePath)
+        and os.path.getmtime(cachePath) >= os.path.getmtime(vasprunPath)
+    ):
+        count("cache hits")
+        return dict(np.load(cachePath))
+
+    count("files")
+    count("bytes", os.path.getsize(vasprunPath))
+
+    vr = Vasprun(
+        vasprunPath,
+        parse_potcar_file=False,
+        parse_eigen=False,
+        parse_projected_eigen=False,
+    )
+    dos = vr.complete_dos
+    structure = vr.final_structure
+
+    orbitals = [str(orb) for orb in dos.pdos[structure[0]]]
+    spins = list(dos.densities)
+    pdos = np.zeros(
+        (len(spins), len(structure), len(orbitals), len(dos.energies)),
+        dtype=np.float32,
+    )
+    for i, site in enumerate(structure):
+        for j, orbital in enumerate(dos.pdos[site].values()):
+            for k, spin in enumerate(spins):
+                pdos[k, i, j] = orbital[spin]
+
+    data = {
+        "energies": np.asarray(dos.energies, dtype=np.float64),
+        "efermi": np.float64(dos.efermi),
+        "pdos": pdos,
+        "orbitals": np.array(orbitals),
+        "numbers": np.array([site.specie.Z for site in structure]),
+        "positions": structure.cart_coords,
+        "cell": structure.lattice.matrix,
+    }
+    if cache:
+        with open(cachePath, "wb") as f:
+            np.savez(f, **data)
+    return data
+
+
+def atomsOf(data):
+    return Atoms(
+        numbers=data["numbers"],
+        positions=data["positions"],
+        cell=data["cell"],
+        pbc=True,
+    )
+
+
+def selectAtoms(atoms, symbol: str, layers=(-1,), near=None, radius: float = None):
+    """
+    Indices picked like getSurfaceAtoms (symbol + layer), optionally only the ones within
+    `radius` Å of `near` (x, y) or (x, y, z), ex: O next to a vacancy
+    """
+    indices = symbolLayerIndices(atoms, symbol, layers)
+    if near is None:
+        return indices
+
+    if radius is None:
+        print(
+            f"{bcolors.FAIL}selectAtoms: near={near} needs a radius (Å){bcolors.ENDC}"
+        )
+        raise ValueError
+    near = np.asarray(near, dtype=float)
+    if near.shape not in ((2,), (3,)):
+        print(
+            f"{bcolors.FAIL}selectAtoms: near has to be (x, y) or (x, y, z), got {near.tolist()}{bcolors.ENDC}"
+        )
+        raise ValueError
+    if len(near) == 2:
+        # only in plane distance matters
+        positions = atoms.positions[indices].copy()
+        positions[:, 2] = 0.0
+        near = np.r_[near, 0.0]
+    else:
+        positions = atoms.positions[indices]
+    _, distances = get_distances(near[None], positions, cell=atoms.cell, pbc=atoms.pbc)
+    return indices[distances[0] < radius]
+
+
+def orbitalMask(orbitals, orbital: str):
+    # "d" -> dxy, dyz, dz2, dxz, dx2 (or the single "d" column for l decomposed runs)
+    return np.array([str(name).startswith(orbital) for name in orbitals])
+
+
+def bandMoments(energies, densities, emin=None, emax=None):
+    """
+    Center, width (sqrt of the second central moment) and weight of densities (..., nE)
+    between emin and emax, all rows at once
+    """
+    window = np.ones(len(energies), dtype=bool)
+    if emin is not None:
+        window &= energies >= emin
+    if emax is not None:
+        window &= energies <= emax
+    e = energies[window]
+    rho = densities[..., window]
+
+    weight = np.trapz(rho, e, axis=-1)
+    center = np.trapz(rho * e, e, axis=-1) / weight
+    second = np.trapz(rho * (e - center[..., None]) ** 2, e, axis=-1) / weight
+    return center, np.sqrt(second), weight
+
+
+def siteBandMoments(data, indices, orbital: str = "d", emin=None, emax=None):
+    """
+    Moments of the DOS projected on `orbital` of the atoms in `indices` summed together
+    (spins summed too). Energies relative to the fermi level
+    """
+    mask = orbitalMask(data["orbitals"], orbital)
+    rho = data["pdos"][:, indices][:, :, mask].sum(axis=(0, 1, 2))
+    return bandMoments(data["energies"] - data["efermi"], rho, emin, emax)
+
+
+def _descriptorRow(job):
+    name, path, descriptors, name_label = job
+    data = loadProjectedDos(path)
+    atoms = atomsOf(data)
+    row = {name_label: name}
+    for descriptor in descriptors:
+        indices = selectAtoms(
+            atoms,
+            descriptor["symbol"],
+            descriptor.get("layers", (-1,)),
+            descriptor.get("near"),
+            descriptor.get("radius"),
+        )
+        center, width, _ = siteBandMoments(
+            data,
+            indices,
+            descriptor["orbital"],
+            descriptor.get("emin"),
+            descriptor.get("emax"),
+        )
+        label = descriptor.get(
+            "label", f"{descriptor['symbol']} {descriptor['orbital']}-band"
+        )
+        row[f"{label} center (eV)"] = float(center)
+        row[f"{label} width (eV)"] = float(width)
+    return row
+
+
+def addBandCentersToDf(
+    df,
+    key: str,
+    directory: str,
+    starting: str,
+    symbol: str,
+    orbital: str = "d",
+    layers=(-1,),
+    emin=None,
+    emax=None,
+    near=None,
+    radius: float = None,
+    executor=None,
+):
+    """
+    Same idea as addShortestThreeBondLengthsToDf: reads {directory}/{starting}_{name} for
+    every row and adds the band center of the selected atoms as a column
+    ex: addBandCentersToDf(df, key, "POSTVASPRUN/H2O_VASPRUN", "vasprun", "W", "d")
+    """
+    executor = executor or SerialExecutor()
+    descriptor = {
+        "symbol": symbol,
+        "orbital": orbital,
+        "layers": layers,
+        "emin": emin,
+        "emax": emax,
+        "near": near,
+        "radius": radius,
+    }
+    rows = executor.map(
+        _descriptorRow,
+        [
+            (name, f"{directory}/{starting}_{name}", [descriptor], key)
+            for name in df[key]
+        ],
+    )
+
+    # same column name the descriptor row uses
+    refKey = f"{symbol} {orbital}-band center (eV)"
+    df[refKey] = [row[refKey] for row in rows]
+    return refKey
+
+
+def descriptorTable(vasprunPaths: dict, descriptors, name_label="name", executor=None):
+    """
+    One row per run, one column per descriptor, runs are parsed in parallel by executor.
+    vasprunPaths: {row name: vasprun.xml path}
+    descriptors: list of dicts with symbol, orbital and optionally layers, emin, emax, near,
+    radius, label. ex: [{"symbol": "W", "orbital": "d"}, {"symbol": "O", "orbital": "p", "layers": (-1, -2)}]
+    """
+    executor = executor or SerialExecutor()
+    return executor.map(
+        _descriptorRow,
+        [(name, path, descriptors, name_label) for name, path in vasprunPaths.items()],
+    )
@@ -1,4 +1,10 @@
+from functools import lru_cache
+
+import numpy as np
+
 from constants import *
+from archives import tailResult
+from tracing import span
 
 
 def parseACFdat(slab):
@@ -48,11 +54,9 @@ def parseACFdat(slab):
 
 
 def readOszicarFileAndGetLastLineEnergy(fileName: str, debug=False):
-    lines = []
-    with open(fileName) as f:
-        lines = f.readlines()
-
-    lastLine = lines[-1]
+    # fileName can also point inside a cp_util.sh zip, ex: "H_OSZICAR.zip/1stLayer/OSZICAR_O0"
+    with span("parse", file=fileName):
+        lastLine = tailResult(fileName, 1)[-1]
     tmp = lastLine.split()
     energy = float(tmp[2])
 
@@ -64,87 +68,73 @@ O = 6.000
 H = 1.000
 N = 5.000
 
-o_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_O")
-o2_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_O2")
-no_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_NO")
-n2o_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_N2O")
-n_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_N")
-n2_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_N2")
-h2o_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_H2O")
-h2_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_H2")
-h_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_H")
-wo3_energy = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_WO3")
-wo3_v_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_WO3_V_O0")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_WO3_V_O1")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/OSZICAR_WO3_V_O2")
-) / 3.0
-
-n2_vac_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O0-UPR")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O1-UPR")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O2-UPR")
-) / 3.0
-
-n_energy_O0 = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N_OSZICAR/O0_NC")
-n2_energy_O0 = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N2_OSZICAR/O0")
-
-n_vac_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N_OSZICAR/OSZICAR_O2")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/N_OSZICAR/OSZICAR_O0")
-) / 2.0
-h_wo3_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O0")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O1")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O2")
-) / 3.0
-h2_wo3_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O0-OD")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O1-OD")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O2-OD")
-) / 3.0
-
-h2_avg_o014_wo3_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2_OSZICAR/avgO014"
-)
-h2_bridge_wo3_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2_OSZICAR/bridge0"
-)
-
-h2o_2_amount_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_2H2O"
-)
-h2o_3_amount_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_3H2O"
-)
-h2o_2_1vac_O0_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_1VAC_2H2O"
-)
-h2o_3_1vac_O0_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_1VAC_3H2O"
-)
-
-
-large_wo3_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/Large/OSZICAR_WO3"
-)
-large_wo3_v_energy = (
-    readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O1")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O2")
-    + readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O3")
-) / 3.0
-
-large_n2_vac_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/Large/N2_OSZICAR/O1"
-)
-
-
-medium_wo3_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/Medium/OSZICAR_WO3"
-)
-medium_wo3_v_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/Medium/OSZICAR_WO3_V_O0"
-)
-medium_n2_vac_energy = readOszicarFileAndGetLastLineEnergy(
-    f"{OUTPUT_DIR}/Medium/N2_OSZICAR/O0_VAC"
-)
+# name -> the runs it is the mean of, read on first use: importing energies doesn't touch
+# the disk (process pool workers and MPI ranks import it too)
+REFERENCE_RUNS = {
+    "o_energy": (f"{OUTPUT_DIR}/OSZICAR_O",),
+    "o2_energy": (f"{OUTPUT_DIR}/OSZICAR_O2",),
+    "no_energy": (f"{OUTPUT_DIR}/OSZICAR_NO",),
+    "n2o_energy": (f"{OUTPUT_DIR}/OSZICAR_N2O",),
+    "n_energy": (f"{OUTPUT_DIR}/OSZICAR_N",),
+    "n2_energy": (f"{OUTPUT_DIR}/OSZICAR_N2",),
+    "h2o_energy": (f"{OUTPUT_DIR}/OSZICAR_H2O",),
+    "h2_energy": (f"{OUTPUT_DIR}/OSZICAR_H2",),
+    "h_energy": (f"{OUTPUT_DIR}/OSZICAR_H",),
+    "wo3_energy": (f"{OUTPUT_DIR}/OSZICAR_WO3",),
+    "wo3_v_energy": (
+        f"{OUTPUT_DIR}/OSZICAR_WO3_V_O0",
+        f"{OUTPUT_DIR}/OSZICAR_WO3_V_O1",
+        f"{OUTPUT_DIR}/OSZICAR_WO3_V_O2",
+    ),
+    "n2_vac_energy": (
+        f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O0-UPR",
+        f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O1-UPR",
+        f"{OUTPUT_DIR}/N2_OSZICAR/OSZICAR_V-O2-UPR",
+    ),
+    "n_energy_O0": (f"{OUTPUT_DIR}/N_OSZICAR/O0_NC",),
+    "n2_energy_O0": (f"{OUTPUT_DIR}/N2_OSZICAR/O0",),
+    "n_vac_energy": (
+        f"{OUTPUT_DIR}/N_OSZICAR/OSZICAR_O2",
+        f"{OUTPUT_DIR}/N_OSZICAR/OSZICAR_O0",
+    ),
+    "h_wo3_energy": (
+        f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O0",
+        f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O1",
+        f"{OUTPUT_DIR}/H_1stLayer_OSZICAR/OSZICAR_O2",
+    ),
+    "h2_wo3_energy": (
+        f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O0-OD",
+        f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O1-OD",
+        f"{OUTPUT_DIR}/H2O_OSZICAR/OSZICAR_V-O2-OD",
+    ),
+    "h2_avg_o014_wo3_energy": (f"{OUTPUT_DIR}/H2_OSZICAR/avgO014",),
+    "h2_bridge_wo3_energy": (f"{OUTPUT_DIR}/H2_OSZICAR/bridge0",),
+    "h2o_2_amount_energy": (f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_2H2O",),
+    "h2o_3_amount_energy": (f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_3H2O",),
+    "h2o_2_1vac_O0_energy": (f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_1VAC_2H2O",),
+    "h2o_3_1vac_O0_energy": (f"{OUTPUT_DIR}/H2O_amt_OSZICAR/OSZICAR_1VAC_3H2O",),
+    "large_wo3_energy": (f"{OUTPUT_DIR}/Large/OSZICAR_WO3",),
+    "large_wo3_v_energy": (
+        f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O1",
+        f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O2",
+        f"{OUTPUT_DIR}/Large/OSZICAR_WO3_V_O3",
+    ),
+    "large_n2_vac_energy": (f"{OUTPUT_DIR}/Large/N2_OSZICAR/O1",),
+    "medium_wo3_energy": (f"{OUTPUT_DIR}/Medium/OSZICAR_WO3",),
+    "medium_wo3_v_energy": (f"{OUTPUT_DIR}/Medium/OSZICAR_WO3_V_O0",),
+    "medium_n2_vac_energy": (f"{OUTPUT_DIR}/Medium/N2_OSZICAR/O0_VAC",),
+}
+
+
+@lru_cache(maxsize=None)
+def referenceEnergy(name: str):
+    """Last OSZICAR energy of a reference, averaged over its runs, ex: referenceEnergy("h2o_energy")"""
+    runs = REFERENCE_RUNS[name]
+    return sum(readOszicarFileAndGetLastLineEnergy(run) for run in runs) / len(runs)
+
+
+def __getattr__(name):
+    # keeps `from energies import h2o_energy` and energies.h2o_energy working
+    if name in REFERENCE_RUNS:
+        return referenceEnergy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
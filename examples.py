@@ -1,10 +1,16 @@
 # FUNCTION EXAMPLES...
+# paste them into main.py's __main__ block, after setup() has read the slabs
 
 # EX 0
 # EX 0.1
 # generateSlabVac(slab.copy(), "O", 2)
 # generateSlabVac(large_slab.copy(), "O", 2)
 
+# Ex 0.1.1 - every di-vacancy of the top two O layers, one per symmetry orbit, at least 3 Å apart
+# for fileName in generateSlabVacancies(large_slab.copy(), "O", 2, layers=(-1, -2), minDistance=3.0):
+#     print(fileName)
+#     generateSimulationFolders(fileName, "surface_v_x2y2", templateFolderName="templates_W001_x2y2")
+
 # Ex 0.2 - adjusting for the top layer of atoms instead of bottom layer (WO2)
 
 # slab = slab.copy()
@@ -30,6 +36,18 @@
 # print(fileName)
 # generateSimulationFolders(fileName, "2_H")
 
+# EX 1.1 - same as above but for every converged H/1stLayer run, as they finish
+# pipeline = StagePipeline(
+#     [
+#         chainStage(
+#             "2H",
+#             "H/1stLayer",
+#             lambda contcar: add_h(contcar, h.copy(), -0.6, "O", 0, dis_x=0, dis_y=-0.60),
+#         )
+#     ]
+# )
+# pipeline.watch(interval=600)
+
 # fileName = add_h(slab.copy(), h.copy(), height_above_slab, "O", 0, pos=(1,2))
 # print(fileName)
 # generateSimulationFolders(fileName, )
@@ -81,6 +99,11 @@
 #     )
 
 
+# EX 2.1 - refuse (or lift) a water that would sit on top of the slab
+# fileName = add_h2o_vacancy(
+#     slab.copy(), h2o, height_above_slab_for_vacancies, "O", 0, "O_down", clash="raise"
+# )
+
 # EX 3
 # UNIT cell - 4 N2 vs 1 N2 vs 2 N2 ... this is for 2 N2 in the unit cell
 # large = large_slab.copy()
@@ -96,6 +119,12 @@
 # )
 # replacePOTCARfromHtoN("2N2_x2y2")
 
+# Ex 3.1 H2O on the O0 vacancy, 20 directions x 4 spins from the orientation library
+# for fileName in add_molecule_vacancy_orientations(
+#     slab, h2o, "H2O", height_above_slab_for_vacancies, "O", 0, 20, nSpins=4
+# ):
+#     generateSimulationFolders(fileName, "H2O_scan")
+
 # Ex 3.2 N2 on a WO3 normal unit cell.
 # for i in range(3):
 #     fileName = add_n2_vacancy(
@@ -126,6 +155,148 @@
 # print(dis[1])
 # print(dis[2])
 
+# EX 5.1 - trajectories, frames are read on demand from a memory mapped XDATCAR
+# from xdatcar import Xdatcar
+# with Xdatcar("H/1stLayer/O0/XDATCAR") as xd:
+#     print(len(xd))
+#     last = xd.positions(-1)
+#     every100 = xd[::100]
+
+# EX 5.2 - bond lengths / coordination at every ionic step
+# from trajectory import shortestDistanceSeries, nearestNeighborSeries, plotTrajectorySeries
+# series = shortestDistanceSeries("H/1stLayer/O0/XDATCAR", "H", "O")
+# plotTrajectorySeries(series)
+# hops = nearestNeighborSeries("H/1stLayer/O0/XDATCAR", "H", ("O", "W"))
+
+# EX 5.3 - volumetric data, CHGCAR/LOCPOT grids are cached as .npy after the first read
+# from volumetric import Volumetric, workFunction, chargeDensityDifference
+# phi, step = workFunction("H/1stLayer/O0/LOCPOT", efermi=Vasprun("H/1stLayer/O0/vasprun.xml").efermi)
+# z, drho = chargeDensityDifference(
+#     "H/1stLayer/O0/CHGCAR", "surface/CHGCAR", "adsorbates/H/CHGCAR", "data/cdd_H_O0.npy"
+# )
+# plt.plot(z, drho)
+
+# EX 5.4 - band centers next to the adsorption energies
+# from descriptors import addBandCentersToDf, descriptorTable
+# refKey = addBandCentersToDf(df, key, "POSTVASPRUN/H2O_VASPRUN", "vasprun", "W", "d")
+# rows = descriptorTable(
+#     {"V-O0-OD": "H2O/V-O0-OD/vasprun.xml"},
+#     [
+#         {"symbol": "W", "orbital": "d"},
+#         {"symbol": "O", "orbital": "p", "layers": (-1, -2), "near": (1.9, 0.0), "radius": 2.5},
+#     ],
+# )
+
+# EX 5.5 - read straight out of the cp_util.sh zips, no unzipping
+# post_oszicar = "POSTOUTPUT/H_OSZICAR.zip/1stLayer"
+# post_contcar = "POSTCONTCAR/H_CONTCAR.zip/1stLayer"
+# df = pd.DataFrame(adsorptionEnergiesOfFolder(post_oszicar, "OSZICAR_WO3", "OSZICAR_H2", "OSZICAR_O"))
+# df, format_dict = addContcarImagesToDf(df, post_contcar, "1st", "Oxygen Index")
+
+# EX 5.6 - spread parsing/rendering over cores, or nodes with mpirun -np 4 python main.py
+# from executors import getExecutor, isRoot
+# executor = getExecutor("process", workers=8)  # or getExecutor() under mpirun/srun
+# datas = adsorptionEnergiesOfFolder(post_oszicar, "OSZICAR_WO3", "OSZICAR_H2", executor=executor)
+# df = pd.DataFrame(datas)
+# df, format_dict = addContcarImagesToDf(df, post_contcar, "H", "name", executor=executor)
+# # every rank calls it (the rendering is a collective map), only rank 0 writes the pages
+# writeReport(df, "H_adsorption_energy", formatters=format_dict, executor=executor)
+# if isRoot(executor):
+#     print(df)
+
+# EX 5.7 - big sweeps as deltas from one slab, Atoms are only built when written
+# from configurations import ConfigurationStore
+# store = ConfigurationStore()
+# for configuration in iterVacancyConfigurations(large_slab, "O", 3, layers=(-1, -2)):
+#     store.append(configuration)
+# print(len(store), store.nbytes)
+# writePoscar("POSCAR_test", store.atoms(0))
+
+# EX 5.8 - forces/magnetization/timings of every ionic step of every run, straight from the OUTCARs
+# from outcar import scanOutcar, scanOutcarTree
+# steps, summary = scanOutcarTree("H", executor=getExecutor("process"))
+# print(summary[["Run", "Ionic steps", "Reached accuracy", "Max force (eV/Å)", "Warnings"]])
+# steps[steps["Run"] == "1stLayer/O0"].plot(x="Step", y="Max force (eV/Å)")
+
+# EX 5.9 - which runs actually converged, cached in convergence.json between reports
+# from convergence import convergenceTable
+# print(convergenceTable("H2O"))
+
+# EX 5.10 - every generated run in results.db instead of encoded in its folder name
+# db = ResultsDatabase()
+# generateSimulationFolders(fileName, "N2", templateFolderName="templates_W001_x2y2", resultsDb=db)
+# db.importTree("H2O")  # folders made before the database existed
+# db.harvest()  # convergence label + final energy of every run that has output
+# rows = db.query(molecule="N2", vacancy=True, orientation="UPR", cell="x2y2")
+# df = db.dataFrame(molecule="H2O", status="converged")
+
+# EX 5.11 - run.json next to every generated run: site, height, orientation matrix, parent hash
+# from manifests import readManifest
+# print(readManifest("H2O/V-O0-OD"))
+# xys = getInitialXYfromDfAtoms(df, "O", key, slab, runDirectory="H/1stLayer")
+
+# EX 5.12 - data/H_adsorption_energy/index.html, 50 rows a page of lazy loaded thumbnails
+# linking to the full images, data/ can be zipped or copied as it is
+# from report import writeReport
+# writeReport(df, "H_adsorption_energy", formatters=format_dict, rowsPerPage=25)
+
+# EX 5.13 - structures drawn in the browser (drag to rotate), nothing rendered to PNG
+# df = addContcarStructuresToDf(df, post_contcar, "H", "name")
+# writeReport(df, "H_adsorption_energy", compressStructures=True)
+
+# EX 5.14 - a fake but well formed workspace (runs, POSTOUTPUT, slabs, templates) to try things at scale
+# from synthetic import syntheticWorkspace
+# syntheticWorkspace("/tmp/ws", nx=4, ny=4, sites=16, steps=200, unconverged=0.2, vasprun=True)
+# os.chdir("/tmp/ws")  # then generateH2OStuff(), convergenceTable("H2O"), ...
+
+# EX 5.15 - where the time goes: SWEEP_TRACE=1 python main.py (or =memory for tracemalloc peaks)
+# writes trace.json for chrome://tracing / ui.perfetto.dev and prints the per stage summary, or by hand:
+# from tracing import enableTracing, span, traceSummary, writeChromeTrace
+# enableTracing(memory=True)  # peaks of this thread's spans, ThreadExecutor workers are only timed
+# with span("H2O report"):
+#     df = generateH2OStuff()
+# print(traceSummary())  # render vs plot_atoms vs savefig vs parse, files/bytes/cache hits
+# writeChromeTrace("trace.json")
+
+# EX 5.16 - supercells tiled from the unit cell slab, the site discovery is done once on it
+# and broadcast, so the x2y2 / x3y3 sweeps don't need large_slab or its own site indices
+# from supercell import UnitSites
+# unit = UnitSites(slab)
+# for nx in (1, 2, 3):
+#     supercell = unit.supercell(nx, nx)
+#     for i in supercell.distinctSites("O"):
+#         fileName = add_h(supercell.atoms.copy(), h.copy(), height_above_slab, "O", i)
+#         generateSimulationFolders(
+#             fileName, f"H_{supercell.label}", templateFolderName=f"templates_W001_{supercell.label}"
+#         )
+# for configuration in unit.supercell(3, 3).iterVacancyConfigurations("O", 2, layers=(-1, -2)):
+#     print(configuration)
+
+# EX 5.17 - coverage: k N2 on k distinct O vacancies at least 3 Å apart, one per symmetry
+# orbit (EX 3 puts both on the same site), streamed so k = 4-8 on a 3x3 never sits in memory
+# from supercell import UnitSites
+# supercell = UnitSites(slab).supercell(3, 3)
+# for fileName in add_molecule_coverage(
+#     supercell, n2, "N2", height_above_slab_for_vacancies, "O", 4, "upright", minDistance=3.0
+# ):
+#     generateSimulationFolders(fileName, "4N2_x3y3", templateFolderName="templates_W001_x3y3")
+# from coverage import iterCoverageCombinations
+# for k in range(4, 9):
+#     print(k, sum(1 for _ in iterCoverageCombinations(supercell, k, "O", minDistance=3.0)))
+
+# EX 5.18 - every top/bridge/hollow site of the top O layer instead of triangle_1/triangle_2
+# index triples and dis_x/dis_y bridges, found once per slab (cached) or tiled from the unit cell
+# from sites import surfaceSites
+# sites = surfaceSites(slab, "O")
+# print(sites, sites.labels, sites.neighbors)
+# fileName = add_h(slab.copy(), h.copy(), height_above_slab, "O", 0, pos=sites.xy(sites.of("hollow")[0]))
+# for fileName in add_molecule_sites(slab, h, "H", height_above_slab, "O", kinds=("bridge", "hollow")):
+#     generateSimulationFolders(fileName)
+# from supercell import UnitSites
+# supercell = UnitSites(slab).supercell(2, 2)
+# for fileName in add_molecule_sites(supercell, h, "H", height_above_slab, "O", executor=getExecutor("process")):
+#     generateSimulationFolders(fileName, "H_x2y2", templateFolderName="templates_W001_x2y2")
+
 # EX 6
 # # ex 6.2
 # energy, _, _, _ = adsorptionEnergy("OSZICAR_H_WO3", "OSZICAR_WO3", "OSZICAR_H2")
@@ -186,24 +357,23 @@ def generateHStuff(layer: str):
             multi=0.5,
             name_label=key,
             energy_label=ENERGY_LABEL,
+            runDirectory=f"H/{layer}Layer",
+            convergence="exclude",
         )
     )
     df = df.sort_values(key)
     df = df.set_index(key)
-    # df = df.drop("O0")  # didn't converge yet...
-    df = df.drop("P0.0")
     df = df.reset_index()
 
-    df, format_dict = addContcarImagesToDf(df, post_contcar, f"H/{layer}Layer", key)
+    df = addContcarStructuresToDf(df, post_contcar, f"H/{layer}Layer", key)
+    format_dict = {}
 
     refKey = addShortestThreeBondLengthsToDf(df, key, "H", "O", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
     refKey = addShortestThreeBondLengthsToDf(df, key, "H", "W", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
 
-    df.to_html(
-        "data/H_atom_adsorption_energy.html", escape=False, formatters=format_dict
-    )
+    writeReport(df, "H_atom_adsorption_energy", formatters=format_dict)
     print(df)
     return df
 
@@ -220,6 +390,8 @@ def generateH2OStuff(mode: int = 1):
                 "OSZICAR_H2",
                 name_label=key,
                 energy_label=ENERGY_LABEL,
+                runDirectory="H2O",
+                convergence="flag",
             )
         )
     else:
@@ -230,14 +402,16 @@ def generateH2OStuff(mode: int = 1):
                 "OSZICAR_H2O",
                 name_label=key,
                 energy_label=ENERGY_LABEL,
+                runDirectory="H2O",
+                convergence="flag",
             )
         )
     df = df.sort_values(key)
     df = df.set_index(key)
-    # df = df.drop("V-O2-OD")  # didn't converge :(
     df = df.reset_index()
 
-    df, format_dict = addContcarImagesToDf(df, post_contcar, "H2O", key, override=False)
+    df = addContcarStructuresToDf(df, post_contcar, "H2O", key)
+    format_dict = {"Convergence": formatConvergence}
 
     refKey = addShortestThreeBondLengthsToDf(df, key, "H", "O", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
@@ -246,9 +420,7 @@ def generateH2OStuff(mode: int = 1):
     refKey = addShortestThreeBondLengthsToDf(df, key, "O", "W", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
 
-    df.to_html(
-        f"data/H2O_adsorption_energy_{mode}.html", escape=False, formatters=format_dict
-    )
+    writeReport(df, f"H2O_adsorption_energy_{mode}", formatters=format_dict)
     print(df)
     return df
 
@@ -270,14 +442,15 @@ def generateN2Stuff():
     df = df.set_index(key)
     df = df.reset_index()
 
-    df, format_dict = addContcarImagesToDf(df, post_contcar, "N2", key)
+    df = addContcarStructuresToDf(df, post_contcar, "N2", key)
+    format_dict = {}
 
     refKey = addShortestThreeBondLengthsToDf(df, key, "N", "O", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
     refKey = addShortestThreeBondLengthsToDf(df, key, "N", "W", post_contcar, "CONTCAR")
     df.insert(2, refKey, df.pop(refKey))
 
-    df.to_html("data/N2_adsorption_energy.html", escape=False, formatters=format_dict)
+    writeReport(df, "N2_adsorption_energy", formatters=format_dict)
     print(df)
     return df
 
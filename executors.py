@@ -0,0 +1,170 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from constants import *
+
+# launchers set one of these on every rank, used to pick the MPI backend automatically
+MPI_ENV_VARS = ("OMPI_COMM_WORLD_SIZE", "PMI_SIZE", "PMIX_RANK", "MPI_LOCALNRANKS")
+
+
+def chunked(items, chunkSize: int):
+    return [items[i : i + chunkSize] for i in range(0, len(items), chunkSize)]
+
+
+def _runChunk(fn, chunk):
+    # one task per chunk instead of per item, keeps the pickling/messaging overhead low
+    return [fn(item) for item in chunk]
+
+
+def _defaultChunkSize(nItems: int, nWorkers: int):
+    # ~4 chunks per worker so a slow chunk doesn't leave the others idle
+    return max(1, -(-nItems // (nWorkers * 4)))
+
+
+class SerialExecutor:
+    """Runs everything in this process, the default and what every stage did before"""
+
+    workers = 1
+
+    def map(self, fn, items, chunkSize: int = None):
+        return [fn(item) for item in items]
+
+    def barrier(self):
+        # only MPI ranks have anyone to wait for
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoolExecutor(SerialExecutor):
+    """
+    Chunked map over a concurrent.futures pool, results come back in the order of items.
+    fn and items have to be picklable for the process pool (top level functions, partials)
+    """
+
+    poolClass = None
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+
+    def map(self, fn, items, chunkSize: int = None):
+        items = list(items)
+        if len(items) == 0:
+            return []
+        if self.pool is None:
+            self.pool = self.poolClass(max_workers=self.workers)
+
+        chunkSize = chunkSize or _defaultChunkSize(len(items), self.workers)
+        futures = [
+            self.pool.submit(_runChunk, fn, chunk)
+            for chunk in chunked(items, chunkSize)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+class ThreadExecutor(PoolExecutor):
+    # good for file reads/zip members, numpy and file IO release the GIL
+    poolClass = ThreadPoolExecutor
+
+
+class ProcessExecutor(PoolExecutor):
+    # good for pymatgen parsing and matplotlib rendering
+    poolClass = ProcessPoolExecutor
+
+
+class MPIExecutor(SerialExecutor):
+    """
+    Every rank runs the same script (mpirun -np 4 python main.py, or srun in a SLURM job).
+    Chunks are dealt round robin to the ranks, gathered on rank 0 in order and broadcast
+    back, so every rank gets the full ordered list and can keep going the same way.
+    Everything outside map runs on every rank: side effects that should happen once
+    (cleanUp, prints, writing files) go under isRoot(executor), followed by
+    executor.barrier() when the other ranks depend on them, see main.py's __main__.
+    map is collective, every rank has to call it (never inside isRoot)
+    """
+
+    def __init__(self, comm=None):
+        try:
+            from mpi4py import MPI
+        except ImportError:
+            print(
+                f"{bcolors.FAIL}mpi4py is not installed, pip install mpi4py inside the MPI environment{bcolors.ENDC}"
+            )
+            raise
+        self.comm = comm or MPI.COMM_WORLD
+        self.rank = self.comm.Get_rank()
+        self.workers = self.comm.Get_size()
+
+    @property
+    def isRoot(self):
+        return self.rank == 0
+
+    def map(self, fn, items, chunkSize: int = None):
+        items = list(items)
+        chunkSize = chunkSize or _defaultChunkSize(len(items), self.workers)
+        chunks = chunked(items, chunkSize)
+
+        mine = {
+            i: _runChunk(fn, chunk)
+            for i, chunk in enumerate(chunks)
+            if i % self.workers == self.rank
+        }
+        gathered = self.comm.gather(mine, root=0)
+
+        results = None
+        if self.isRoot:
+            byChunk = {}
+            for part in gathered:
+                byChunk.update(part)
+            results = [result for i in range(len(chunks)) for result in byChunk[i]]
+        return self.comm.bcast(results, root=0)
+
+    def barrier(self):
+        self.comm.Barrier()
+
+
+EXECUTORS = {
+    "serial": SerialExecutor,
+    "thread": ThreadExecutor,
+    "process": ProcessExecutor,
+    "mpi": MPIExecutor,
+}
+
+
+def getExecutor(kind: str = None, **kwargs):
+    """
+    getExecutor("process", workers=8). Without a kind, $SWEEP_EXECUTOR is used, then
+    MPI if the script was started by mpirun/srun, else serial
+    """
+    if kind is None:
+        kind = os.environ.get("SWEEP_EXECUTOR")
+    if kind is None:
+        launchedByMpi = any(var in os.environ for var in MPI_ENV_VARS)
+        kind = "mpi" if launchedByMpi else "serial"
+    if kind not in EXECUTORS:
+        print(
+            f'{bcolors.FAIL}Unknown executor "{kind}", pick one of {list(EXECUTORS)}{bcolors.ENDC}'
+        )
+        raise ValueError
+    return EXECUTORS[kind](**kwargs)
+
+
+def isRoot(executor):
+    # True on every backend except the non zero MPI ranks
+    return getattr(executor, "isRoot", True)
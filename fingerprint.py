@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from constants import *
+
+
+def structureFingerprint(atoms, tolerance: float = 1e-2):
+    """
+    Canonical hash of a structure. Positions are wrapped into the cell, quantized
+    to `tolerance` (Å) and sorted by species then position, so the same
+    configuration gives the same hash no matter how it was built
+    (ex: add_h with pos=(x,y) vs add_h with an atom index)
+    """
+    numbers = np.asarray(atoms.numbers, dtype=np.int64)
+    cell = np.asarray(atoms.get_cell())
+
+    if atoms.cell.rank == 3:
+        frac = atoms.get_scaled_positions(wrap=True)
+        bins = np.maximum(np.rint(atoms.cell.lengths() / tolerance), 1).astype(np.int64)
+        # the modulo folds positions that round up to 1.0 back onto 0.0
+        quantized = np.rint(frac * bins).astype(np.int64) % bins
+    else:
+        # molecule without a cell, nothing to wrap into
+        quantized = np.rint(atoms.positions / tolerance).astype(np.int64)
+
+    order = np.lexsort((quantized[:, 2], quantized[:, 1], quantized[:, 0], numbers))
+
+    sha = hashlib.sha1()
+    sha.update(np.rint(cell / tolerance).astype(np.int64).tobytes())
+    sha.update(numbers[order].tobytes())
+    sha.update(np.ascontiguousarray(quantized[order]).tobytes())
+    return sha.hexdigest()
+
+
+class FingerprintIndex:
+    """
+    SQLite index of every structure fingerprint we have generated, shared across sweeps.
+    Lookups hit an in-memory dict loaded from the db, so checks are O(1).
+    """
+
+    def __init__(self, path: str = FINGERPRINT_DB, tolerance: float = 1e-2):
+        self.path = path
+        self.tolerance = tolerance
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS structures (
+                fingerprint TEXT PRIMARY KEY,
+                folder TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                created REAL
+            )
+            """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS structures_folder ON structures (folder)"
+        )
+        self.conn.commit()
+        self.known = dict(
+            self.conn.execute("SELECT fingerprint, folder FROM structures")
+        )
+
+    def fingerprint(self, atoms):
+        return structureFingerprint(atoms, self.tolerance)
+
+    def lookup(self, atoms):
+        """Folder of an already computed/queued copy of `atoms`, or None"""
+        return self.known.get(self.fingerprint(atoms))
+
+    def register(self, atoms, folder: str, status: str = "queued"):
+        """
+        Records `atoms` as living in `folder`.
+        Returns the folder of the existing run if the structure was already indexed, else None
+        """
+        key = self.fingerprint(atoms)
+        existing = self.known.get(key)
+        if existing is not None and os.path.normpath(existing) != os.path.normpath(
+            folder
+        ):
+            return existing
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO structures (fingerprint, folder, status, created) VALUES (?, ?, ?, ?)",
+            (key, folder, status, time.time()),
+        )
+        self.conn.commit()
+        self.known[key] = folder
+        return None
+
+    def setStatus(self, folder: str, status: str):
+        self.conn.execute(
+            "UPDATE structures SET status = ? WHERE folder = ?", (status, folder)
+        )
+        self.conn.commit()
+
+    def status(self, atoms):
+        row = self.conn.execute(
+            "SELECT folder, status FROM structures WHERE fingerprint = ?",
+            (self.fingerprint(atoms),),
+        ).fetchone()
+        return row
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return len(self.known)
+
+    def __contains__(self, atoms):
+        return self.lookup(atoms) is not None
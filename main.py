@@ -8,6 +8,7 @@ from scipy.spatial.distance import euclidean
 from ase.constraints import FixAtoms
 
 import os
+import threading
 from distutils.dir_util import copy_tree
 import shutil
 import pandas as pd
@@ -20,10 +21,44 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pymatgen.io.vasp import Vasprun
 
 from energies import *
 from constants import *
+from fingerprint import FingerprintIndex, structureFingerprint
+from selection import symbolLayerMask, symbolLayerIndices
+from vacancies import (
+    iterVacancyCombinations,
+    iterVacancyConfigurations,
+    iterVacancyStructures,
+)
+from orientations import (
+    namedOrientation,
+    orientationLibrary,
+    orientPositions,
+    orientedMolecule,
+)
+from clashes import filterClashes, placementPositions, printClashReport
+from coverage import iterCoverageConfigurations
+from sites import SITE_CODES, SITE_KINDS, surfaceSites
+from supercell import Supercell
+from poscar import writePoscar
+from pipeline import Stage, StagePipeline
+from archives import listResults, readResultAtoms
+from executors import SerialExecutor, getExecutor, isRoot
+from configurations import Configuration, materialize
+from convergence import CONVERGED, classifyRuns, formatConvergence
+from results import ResultsDatabase, poscarNameFields
+from manifests import (
+    popPendingManifest,
+    readManifest,
+    writeManifest,
+    writePendingManifest,
+)
+from report import writeReport
+from tracing import span, traced
 
 
 # Create the H2O molecule
@@ -55,25 +90,30 @@ def replacePOTCARfromHtoN(N_folder):
     os.chdir("..")
 
 
+@traced("generation")
 def generateSimulationFolders(
     fileName: str,
     customFolderName="",
     jobFileName="gpu.slurm",
     templateFolderName="templates_W001",
     trailString="",
+    fingerprintIndex: FingerprintIndex = None,
+    resultsDb: ResultsDatabase = None,
+    parent: str = None,
 ):
     # ex:f"POSCAR_H2O_Vac_{symbol}{index}"
     # ex:f"POSCAR_H2_above_{symbol}{index}"
     # ex:f"POSCAR_N2_Vac_{symbol}{index}_"
-    tmp = fileName.split("_")
-    idc = tmp[3]  # max 2 char
-    symbolRemovedorBelow = idc[0]  # max 1 char cuz its O or W
-    moleculeAbove = tmp[1]  # max 3 char
-    vac = tmp[2] == "Vac"
+    fields = poscarNameFields(fileName)
+    idc = fields["site"]  # max 2 char
+    symbolRemovedorBelow = fields["symbol"]  # max 1 char cuz its O or W
+    moleculeAbove = fields["molecule"]  # max 3 char
+    vac = fields["vacancy"]
+    orientation = fields["orientation"]  # max 3 char
 
-    orientation = ""  # max 3 char
-    if len(tmp) == 5:
-        orientation = tmp[4]
+    atoms = None
+    if fingerprintIndex is not None or resultsDb is not None:
+        atoms = read(fileName, format="vasp")
 
     if len(customFolderName) == 0:
         mainDirectoryName = moleculeAbove
@@ -96,6 +136,18 @@ def generateSimulationFolders(
         else:
             folderName = folderName + "-" + orientation
 
+    runFolder = f"{mainDirectoryName}/{folderName}"
+    if fingerprintIndex is not None:
+        existing = fingerprintIndex.register(atoms, runFolder)
+        if existing is not None:
+            print(
+                f"{bcolors.WARNING}{fileName} is the same structure as {existing}, skipping{bcolors.ENDC}"
+            )
+            os.chdir("..")
+            os.remove(fileName)
+            popPendingManifest(fileName)
+            return existing
+
     if os.path.exists(folderName):
         shutil.rmtree(folderName)
     os.mkdir(folderName)
@@ -140,7 +192,60 @@ def generateSimulationFolders(
     os.chdir("..")
     os.chdir("..")
 
+    # how the POSCAR was built (from the add_* functions) + where it went
+    manifest = popPendingManifest(fileName)
+    manifest.update(
+        poscar=fileName,
+        folder=runFolder,
+        template=templateFolderName,
+        job=replacementString,
+        parent=parent,
+        **fields,
+    )
+    if atoms is not None:
+        manifest["fingerprint"] = structureFingerprint(atoms)
+    writeManifest(to_directory, manifest)
+
+    if resultsDb is not None:
+        resultsDb.recordGenerated(
+            fileName,
+            runFolder,
+            atoms,
+            templateFolderName,
+            parent,
+            structureFingerprint(atoms),
+        )
+
+    return runFolder
 
+
+def chainStage(
+    name: str,
+    sourceTree: str,
+    transform,
+    jobFileName="gpu.slurm",
+    templateFolderName="templates_W001",
+    trailString="",
+    fingerprintIndex: FingerprintIndex = None,
+    resultsDb: ResultsDatabase = None,
+):
+    # children of each parent land in their own top folder, ex: 2H-1stLayer-O0/O0
+    def emit(fileName, parentName):
+        return generateSimulationFolders(
+            fileName,
+            f"{name}-{parentName}",
+            jobFileName=jobFileName,
+            templateFolderName=templateFolderName,
+            trailString=trailString,
+            fingerprintIndex=fingerprintIndex,
+            resultsDb=resultsDb,
+            parent=parentName,
+        )
+
+    return Stage(name, sourceTree, transform, emit)
+
+
+@traced("kpoints")
 def genKpoints(fileName: str):
     try:
         poscar = Poscar.from_file(fileName)
@@ -180,25 +285,19 @@ def find_average_of_symbol(symbol, idxs, slab, layer):
 
 
 def remove_atom_at_position_on_surface(slabb, x, y, atom_type):
-    atoms_to_remove = []
-    for atom in slabb:
-        if (
-            atom.symbol == atom_type
-            and abs(atom.position[0] - x) < 1e-1
-            and abs(atom.position[1] - y) < 1e-1
-        ):
-            atoms_to_remove.append(atom)
+    positions = slabb.positions
+    atoms_to_remove = np.flatnonzero(
+        (slabb.symbols == atom_type)
+        & (np.abs(positions[:, 0] - x) < 1e-1)
+        & (np.abs(positions[:, 1] - y) < 1e-1)
+    )
 
     if len(atoms_to_remove) == 0:
         print("Did not find atom")
         return
 
-    atom_selected = atoms_to_remove[0]
-    for atom_want in atoms_to_remove:
-        if atom_want.position[2] > atom_selected.position[2]:
-            atom_selected = atom_want
-
-    slabb.pop(atom_selected.index)
+    # highest atom at (x, y)
+    slabb.pop(atoms_to_remove[np.argmax(positions[atoms_to_remove, 2])])
 
 
 def getSurfaceAtoms(symbol: str, index: int, slab, layer: int = -1):
@@ -262,12 +361,49 @@ def generateSlabVac(slab, symbol, index):
     x = atom_list[index].position[0]
     y = atom_list[index].position[1]
     remove_atom_at_position_on_surface(slab, x, y, symbol)
-    write("POSCAR", slab, format="vasp")
+    writePoscar("POSCAR", slab)
     genKpoints("POSCAR")
 
 
+def generateSlabVacancies(
+    slab,
+    symbol,
+    maxVacancies: int,
+    layers=(-1,),
+    minDistance: float = 0.0,
+    name="WO3",
+    executor=None,
+):
+    # ex: f"POSCAR_WO3_Vac_O0-5" -> folder WO3/V-O0-5 in generateSimulationFolders
+    executor = executor or SerialExecutor()
+    candidates = list(symbolLayerIndices(slab, symbol, layers))
+    parentHash = structureFingerprint(slab)
+    configurations = []
+    for configuration in iterVacancyConfigurations(
+        slab, symbol, maxVacancies, layers, minDistance
+    ):
+        idc = "-".join(str(candidates.index(i)) for i in configuration.removed)
+        placement = {"removed": configuration.removed, "parentHash": parentHash}
+        configurations.append(
+            (f"POSCAR_{name}_Vac_{symbol}{idc}", configuration, placement)
+        )
+    return executor.map(writeConfiguration, configurations)
+
+
+def writeConfiguration(job):
+    # POSCAR + KPOINTS (+ pending run.json) of one generated structure, the unit of work
+    # handed to executors: (fileName, atoms) or (fileName, atoms, placement).
+    # Configurations are only turned into full Atoms here, inside the worker
+    fileName, atoms = job[:2]
+    writePoscar(fileName, materialize(atoms))
+    genKpoints(fileName)
+    if len(job) > 2:
+        writePendingManifest(fileName, job[2])
+    return fileName
+
+
 def generateSlab(slab):
-    write("POSCAR", slab, format="vasp")
+    writePoscar("POSCAR", slab)
     genKpoints("POSCAR")
 
 
@@ -283,7 +419,13 @@ def addAdsorbateCustom(
     idxs=[],
     overridePos=None,
     layer: int = -1,
+    clash=None,
+    clashOverrides=None,
 ):
+    # clash: None (no check), "reject" or "raise", see clashes.filterClashes
+    # returns how the adsorbate was placed, for the run.json manifest
+    parentHash = structureFingerprint(slab)
+    removedAt = None
 
     # Determine x,y
     override = not overridePos is None
@@ -298,10 +440,32 @@ def addAdsorbateCustom(
             y = atom_list[index].position[1]
             if vacancy:
                 remove_atom_at_position_on_surface(slab, x, y, "O")
+                removedAt = [x, y]
 
         else:
             x, y = find_average_of_symbol(symbol, idxs, slab, layer)
 
+    if clash is not None:
+        placed = placementPositions(
+            slab,
+            molecule.positions,
+            height,
+            [(x + displacement_x, y + displacement_y)],
+        )
+        keep, shifts, reasons = filterClashes(
+            slab, placed, molecule.numbers, clash, overrides=clashOverrides
+        )
+        if not keep[0]:
+            print(
+                f"{bcolors.FAIL}Adsorbate clashes with slab: {reasons[0]}{bcolors.ENDC}"
+            )
+            raise ValueError
+        if shifts[0] > 0:
+            print(
+                f"{bcolors.WARNING}Raised adsorbate by {shifts[0]:.2f} Å to clear the slab{bcolors.ENDC}"
+            )
+            height += shifts[0]
+
     add_adsorbate(
         slab,
         molecule,
@@ -312,6 +476,15 @@ def addAdsorbateCustom(
         ),
     )
 
+    return {
+        "adsorbate": molecule.get_chemical_formula(),
+        "xy": [x, y],
+        "displacement": [displacement_x, displacement_y],
+        "height": height,
+        "removedAt": removedAt,
+        "parentHash": parentHash,
+    }
+
 
 def add_h(
     slab, h, height, symbol, index, dis_x=0, dis_y=0, idxs=[], pos=None, layer=-1
@@ -326,7 +499,7 @@ def add_h(
             f"{bcolors.FAIL}Can only do average of three atoms' indices{bcolors.ENDC}"
         )
         return
-    addAdsorbateCustom(
+    placement = addAdsorbateCustom(
         slab,
         h,
         height,
@@ -338,24 +511,31 @@ def add_h(
         overridePos=pos,
         layer=layer,
     )
-    write(fileName, slab, format="vasp")
+    writePoscar(fileName, slab)
     genKpoints(fileName)
+    writePendingManifest(fileName, placement)
     return fileName
 
 
 def add_n(slab, n, height, symbol, index, dis_x=0, dis_y=0, pos=None):
     fileName = f"POSCAR_N_above_{symbol}{index}"
-    addAdsorbateCustom(slab, n, height, symbol, index, dis_x, dis_y, overridePos=pos)
-    write(fileName, slab, format="vasp")
+    placement = addAdsorbateCustom(
+        slab, n, height, symbol, index, dis_x, dis_y, overridePos=pos
+    )
+    writePoscar(fileName, slab)
     genKpoints(fileName)
+    writePendingManifest(fileName, placement)
     return fileName
 
 
 def add_h2(slab, h2, height, symbol, index, dis_x=0, dis_y=0, pos=None):
     fileName = f"POSCAR_H2_above_{symbol}{index}"
-    addAdsorbateCustom(slab, h2, height, symbol, index, dis_x, dis_y, overridePos=pos)
-    write(fileName, slab, format="vasp")
+    placement = addAdsorbateCustom(
+        slab, h2, height, symbol, index, dis_x, dis_y, overridePos=pos
+    )
+    writePoscar(fileName, slab)
     genKpoints(fileName)
+    writePendingManifest(fileName, placement)
     return fileName
 
 
@@ -376,52 +556,17 @@ def add_h2o_vacancy(
     pos=None,
     dis_x=0,
     dis_y=0,
+    clash=None,
 ):
     # 4 -> [4] is the orientation,  2-3 characters
-    fileName = f"POSCAR_H2O_Vac_{symbol}{index}_"
-    # Center the H2O molecule
-    h2o.center()
-
-    if orientation == "H2_down":
-        fileName += "H2D"
-        pass  # default orientation
-    elif orientation == "O_down":
-        fileName += "OD"
-        h2o.rotate(180, "x")
-    elif orientation == "H_down":
-        fileName += "HD"
-        h2o.rotate(90, "x")
-        h2o.rotate(rotation, "z")
-        if rotation == 0:
-            fileName += "U"
-        elif rotation == 90:
-            fileName += "L"
-        elif rotation == 180:
-            fileName += "D"
-        elif rotation == 270:
-            fileName += "R"
-        else:
-            fileName += "X"
-
-    elif orientation == "coplanar":
-        # add different rotations over here... like coplanar how many deg.
-        fileName += "C"
-        h2o.rotate(90, "y")
-        h2o.rotate(rotation, "z")
-        if rotation == 0:
-            fileName += "L"
-        elif rotation == 90:
-            fileName += "D"
-        elif rotation == 180:
-            fileName += "R"
-        elif rotation == 270:
-            fileName += "U"
-        else:
-            fileName += "X"
+    matrix, code = namedOrientation("H2O", orientation, rotation)
+    fileName = f"POSCAR_H2O_Vac_{symbol}{index}_{code}"
+    # rotate a centered copy so the caller's molecule is never touched
+    oriented = orientedMolecule(h2o, orientPositions(h2o, matrix[None])[0])
 
-    addAdsorbateCustom(
+    placement = addAdsorbateCustom(
         slab,
-        h2o,
+        oriented,
         height,
         symbol,
         index,
@@ -429,44 +574,211 @@ def add_h2o_vacancy(
         overridePos=pos,
         displacement_x=dis_x,
         displacement_y=dis_y,
+        clash=clash,
     )
-    write(fileName, slab, format="vasp")
+    placement.update(orientation=code, orientationMatrix=matrix)
+    writePoscar(fileName, slab)
     genKpoints(fileName)
+    writePendingManifest(fileName, placement)
     return fileName
 
 
 def add_n2_vacancy(
-    slab, n2, height, symbol, index, orientation="upright", rotation=0, pos=None
+    slab,
+    n2,
+    height,
+    symbol,
+    index,
+    orientation="upright",
+    rotation=0,
+    pos=None,
+    clash=None,
 ):
-    fileName = f"POSCAR_N2_Vac_{symbol}{index}_"
-    # Center the N2 molecule
-    n2.center()
-
-    if orientation == "upright":
-        fileName += "UPR"
-        n2.rotate(180, "x")
-        pass
-    elif orientation == "coplanar":
-        fileName += "C"
-        n2.rotate(90, "y")
-        n2.rotate(rotation, "z")
-        if rotation == 0:
-            fileName += "L"
-        elif rotation == 90:
-            fileName += "D"
-        elif rotation == 180:
-            fileName += "R"
-        elif rotation == 270:
-            fileName += "U"
-        else:
-            fileName += "X"
+    matrix, code = namedOrientation("N2", orientation, rotation)
+    fileName = f"POSCAR_N2_Vac_{symbol}{index}_{code}"
+    oriented = orientedMolecule(n2, orientPositions(n2, matrix[None])[0])
 
-    addAdsorbateCustom(slab, n2, height, symbol, index, vacancy=True, overridePos=pos)
-    write(fileName, slab, format="vasp")
+    placement = addAdsorbateCustom(
+        slab,
+        oriented,
+        height,
+        symbol,
+        index,
+        vacancy=True,
+        overridePos=pos,
+        clash=clash,
+    )
+    placement.update(orientation=code, orientationMatrix=matrix)
+    writePoscar(fileName, slab)
     genKpoints(fileName)
+    writePendingManifest(fileName, placement)
     return fileName
 
 
+def add_molecule_vacancy_orientations(
+    slab,
+    molecule,
+    name: str,
+    height,
+    symbol,
+    index,
+    nDirections: int,
+    nSpins: int = 1,
+    hemisphere=True,
+    pos=None,
+    clash="reject",
+    clashOverrides=None,
+    executor=None,
+):
+    # dense orientation scan, ex: f"POSCAR_H2O_Vac_{symbol}{index}_T90P45S0"
+    executor = executor or SerialExecutor()
+    matrices, codes = orientationLibrary(nDirections, nSpins, hemisphere)
+    allPositions = orientPositions(molecule, matrices)
+
+    vacantSlab = slab.copy()
+    if pos is None:
+        atom_list = getSurfaceAtoms(symbol, index, vacantSlab)
+        x = atom_list[index].position[0]
+        y = atom_list[index].position[1]
+        remove_atom_at_position_on_surface(vacantSlab, x, y, "O")
+    else:
+        x, y = pos
+
+    # where add_adsorbate would put every orientation
+    placed = placementPositions(
+        vacantSlab, allPositions, height, np.tile((x, y), (len(codes), 1))
+    )
+
+    # drop/raise every clashing orientation in one pass before writing anything
+    keep = np.ones(len(codes), dtype=bool)
+    shifts = np.zeros(len(codes))
+    if clash is not None:
+        keep, shifts, reasons = filterClashes(
+            vacantSlab, placed, molecule.numbers, clash, overrides=clashOverrides
+        )
+        printClashReport(codes, keep, shifts, reasons)
+
+    # every orientation shares vacantSlab, only the molecule positions are kept per file
+    placed[:, :, 2] += shifts[:, None]
+    parentHash = structureFingerprint(slab)
+    configurations = [
+        (
+            f"POSCAR_{name}_Vac_{symbol}{index}_{codes[i]}",
+            Configuration(vacantSlab, numbers=molecule.numbers, positions=placed[i]),
+            {
+                "adsorbate": molecule.get_chemical_formula(),
+                "xy": [x, y],
+                "displacement": [0, 0],
+                "height": height + shifts[i],
+                "removedAt": None if pos is not None else [x, y],
+                "parentHash": parentHash,
+                "orientation": codes[i],
+                "orientationMatrix": matrices[i],
+            },
+        )
+        for i in np.flatnonzero(keep)
+    ]
+    return executor.map(writeConfiguration, configurations)
+
+
+def add_molecule_coverage(
+    slab,
+    molecule,
+    name: str,
+    height,
+    symbol,
+    coverage: int,
+    orientation="upright",
+    rotation=0,
+    layers=(-1,),
+    minDistance: float = 0.0,
+    vacancy=True,
+    batchSize: int = 256,
+    executor=None,
+):
+    # `coverage` molecules on distinct sites, one POSCAR per symmetry distinct placement,
+    # ex: f"POSCAR_2N2_Vac_{symbol}0-4_UPR" -> 2N2/V-O0-4-UPR. slab can be a Supercell.
+    # Yields file names as they are written, batchSize placements at a time
+    executor = executor or SerialExecutor()
+    matrix, code = namedOrientation(name, orientation, rotation)
+    oriented = orientedMolecule(molecule, orientPositions(molecule, matrix[None])[0])
+    kind = "Vac" if vacancy else "above"
+    parent = getattr(slab, "atoms", slab)
+    parentHash = structureFingerprint(parent)
+
+    batch = []
+    for configuration in iterCoverageConfigurations(
+        slab, oriented, coverage, height, symbol, layers, minDistance, vacancy
+    ):
+        placement = {
+            "adsorbate": molecule.get_chemical_formula(),
+            "coverage": coverage,
+            "sites": configuration.name,
+            "removed": configuration.removed if vacancy else None,
+            "height": height,
+            "parentHash": parentHash,
+            "orientation": code,
+            "orientationMatrix": matrix,
+        }
+        fileName = f"POSCAR_{coverage}{name}_{kind}_{symbol}{configuration.name}_{code}"
+        batch.append((fileName, configuration, placement))
+        if len(batch) == batchSize:
+            yield from executor.map(writeConfiguration, batch)
+            batch = []
+    if batch:
+        yield from executor.map(writeConfiguration, batch)
+
+
+def add_molecule_sites(
+    slab,
+    molecule,
+    name: str,
+    height,
+    symbol="O",
+    kinds=SITE_KINDS,
+    layer=-1,
+    batchSize: int = 256,
+    executor=None,
+):
+    # one POSCAR per top/bridge/hollow site of the surface layer, sites found once per slab,
+    # ex: f"POSCAR_H_above_{symbol}5_HOL" -> H/O5-HOL. slab can be a Supercell.
+    # Yields file names as they are written, batchSize sites at a time
+    executor = executor or SerialExecutor()
+    if isinstance(slab, Supercell):
+        sites = slab.surfaceSites(symbol, layer)
+        slab = slab.atoms
+    else:
+        sites = surfaceSites(slab, symbol, layer)
+    parentHash = structureFingerprint(slab)
+
+    batch = []
+    for i in np.flatnonzero(np.isin(sites.kinds, kinds)):
+        code = SITE_CODES[sites.kinds[i]]
+        fileName = f"POSCAR_{name}_above_{symbol}{i}_{code}"
+        xy = sites.xy(i)
+        placed = placementPositions(slab, molecule.positions, height, [xy])
+        configuration = Configuration(
+            slab, numbers=molecule.numbers, positions=placed[0], name=f"{i}"
+        )
+        # what addAdsorbateCustom(..., overridePos=xy) records, plus the site
+        placement = {
+            "adsorbate": molecule.get_chemical_formula(),
+            "xy": list(xy),
+            "displacement": [0, 0],
+            "height": height,
+            "removedAt": None,
+            "parentHash": parentHash,
+            "siteKind": str(sites.kinds[i]),
+            "siteNeighbors": sites.neighborsOf(i),
+        }
+        batch.append((fileName, configuration, placement))
+        if len(batch) == batchSize:
+            yield from executor.map(writeConfiguration, batch)
+            batch = []
+    if batch:
+        yield from executor.map(writeConfiguration, batch)
+
+
 def generateAdsorbentInVacuum(empty, molecule_or_atom, symbol: str):
     fileName = f"POSCAR_{symbol}"
     # molecule_or_atom.center()
@@ -575,18 +887,55 @@ def adsorptionEnergiesOfFolder(
     multi=1,
     name_label="name",
     energy_label="energy",
+    executor=None,
+    runDirectory=None,
+    convergence=None,
 ):
+    """
+    runDirectory is where the runs behind POST_DIRECTORY live (ex: "H/1stLayer" for
+    POSTOUTPUT/H_1stLayer_OSZICAR). With it, convergence="flag" adds a "Convergence"
+    column and convergence="exclude" leaves out every run that isn't converged
+    """
+    executor = executor or SerialExecutor()
+    # the references are the same for every row, read them once
+    energySurf = readOszicarFileAndGetLastLineEnergy(f"{OUTPUT_DIR}/{OSZICAR_SURF}")
+    energyAds = multi * readOszicarFileAndGetLastLineEnergy(
+        f"{OUTPUT_DIR}/{OSZICAR_ADS}"
+    )
+
+    postFiles = listResults(POST_DIRECTORY)
+    labels = {}
+    if convergence is not None:
+        if runDirectory is None:
+            print(
+                f"{bcolors.FAIL}convergence needs the runDirectory of {POST_DIRECTORY}{bcolors.ENDC}"
+            )
+            raise ValueError
+        names = [postFile.replace("OSZICAR_", "") for postFile in postFiles]
+        runs = classifyRuns([f"{runDirectory}/{name}" for name in names], executor)
+        labels = {name: runs[f"{runDirectory}/{name}"] for name in names}
+        if convergence == "exclude":
+            for name, label in labels.items():
+                if label != CONVERGED:
+                    print(f"{bcolors.WARNING}Leaving out {name}: {label}{bcolors.ENDC}")
+            postFiles = [
+                postFile
+                for postFile, name in zip(postFiles, names)
+                if labels[name] == CONVERGED
+            ]
+
+    energiesBoth = executor.map(
+        readOszicarFileAndGetLastLineEnergy,
+        [f"{POST_DIRECTORY}/{postFile}" for postFile in postFiles],
+    )
+
     datas = []
-    for postFile in os.listdir(POST_DIRECTORY):
+    for postFile, energyBoth in zip(postFiles, energiesBoth):
         data = {}
         data[name_label] = postFile.replace("OSZICAR_", "")
-        data[energy_label], _, _, _ = adsorptionEnergy(
-            postFile,
-            OSZICAR_SURF,
-            OSZICAR_ADS,
-            customPathBoth=POST_DIRECTORY,
-            adsMulti=multi,
-        )
+        data[energy_label] = energyBoth - (energySurf + energyAds)
+        if convergence == "flag":
+            data["Convergence"] = labels[data[name_label]]
         datas.append(data)
     return datas
 
@@ -619,155 +968,89 @@ def calculateDistancesForEachAtomPair(slab, symbol1, symbol2, radius1=0.0, radiu
     return datas, dis
 
 
-def addContcarImagesToDf(
-    df, CONTCAR_DIRECTORY: str, POSCAR_DIRECTORY: str, key: str, override=False
-):
+IMAGE_ROTATIONS = [(135, 90, 225), (180, 180, 45), (225, 225, 35)]
 
-    def plotThenSaveAtoms(slab, x, y, z, ax, output_file):
-        plot_atoms(slab, ax, rotation=f"{x}x,{y}y,{z}z")
-        ax.set_axis_off()
-        plt.savefig(output_file, bbox_inches="tight", pad_inches=0.1, dpi=300)
-        plt.cla()
+_render = threading.local()
 
-    def path_to_image_html(path):
-        return '<img src="' + path + '" width="200" >'
 
-    images1 = []
-    images2 = []
-    images3 = []
-    initImages1 = []
-    initImages2 = []
-    initImages3 = []
-    if not os.path.exists("images"):
-        os.mkdir("images")
+def _renderAxes():
+    # one figure per thread, reused for every image it renders. Not pyplot: its current
+    # figure is shared, ThreadExecutor workers would draw into each other's images
+    if not hasattr(_render, "axes"):
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        _render.axes = figure.add_subplot()
+    return _render.axes
 
-    names = df[key]
-    fig, ax = plt.subplots()
-    for name in names:
-        initPoscar = f"{POSCAR_DIRECTORY}/{name}/POSCAR"
-        initSlab = read(initPoscar)
-
-        fileName = "CONTCAR_" + name
-        first_name = CONTCAR_DIRECTORY.split("/")[1]
-
-        slab = read(f"{CONTCAR_DIRECTORY}/{fileName}")
-
-        if not os.path.exists(f"images/{first_name}"):
-            os.makedirs(f"images/{first_name}")
-        if not os.path.exists(f"images/{POSCAR_DIRECTORY}_POSCAR"):
-            os.makedirs(f"images/{POSCAR_DIRECTORY}_POSCAR")
-
-        if os.path.exists(f"images/{first_name}/{name}"):
-            if override:
-                shutil.rmtree(f"images/{first_name}/{name}")
-                shutil.rmtree(f"images/{POSCAR_DIRECTORY}_POSCAR/{name}")
-            else:
-                if os.path.exists(f"images/{first_name}/{name}/slab_135x_90y_225z.png"):
-                    initImages1.append(
-                        os.path.abspath(
-                            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_135x_90y_225z.png"
-                        )
-                    )
-                    initImages2.append(
-                        os.path.abspath(
-                            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_180x_180y_45z.png"
-                        )
-                    )
-                    initImages3.append(
-                        os.path.abspath(
-                            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_225x_225y_35z.png"
-                        )
-                    )
-                    images1.append(
-                        os.path.abspath(
-                            f"images/{first_name}/{name}/slab_135x_90y_225z.png"
-                        )
-                    )
-                    images2.append(
-                        os.path.abspath(
-                            f"images/{first_name}/{name}/slab_180x_180y_45z.png"
-                        )
-                    )
-                    images3.append(
-                        os.path.abspath(
-                            f"images/{first_name}/{name}/slab_225x_225y_35z.png"
-                        )
-                    )
-                    continue
-
-        os.makedirs(f"images/{first_name}/{name}")
-        os.makedirs(f"images/{POSCAR_DIRECTORY}_POSCAR/{name}")
-
-        plotThenSaveAtoms(
-            initSlab,
-            135,
-            90,
-            225,
-            ax,
-            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_135x_90y_225z.png",
-        )
-        plotThenSaveAtoms(
-            initSlab,
-            180,
-            180,
-            45,
-            ax,
-            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_180x_180y_45z.png",
-        )
-        plotThenSaveAtoms(
-            initSlab,
-            225,
-            225,
-            35,
-            ax,
-            f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_225x_225y_35z.png",
-        )
-
-        plotThenSaveAtoms(
-            slab, 135, 90, 225, ax, f"images/{first_name}/{name}/slab_135x_90y_225z.png"
-        )
-        plotThenSaveAtoms(
-            slab, 180, 180, 45, ax, f"images/{first_name}/{name}/slab_180x_180y_45z.png"
-        )
-        plotThenSaveAtoms(
-            slab, 225, 225, 35, ax, f"images/{first_name}/{name}/slab_225x_225y_35z.png"
-        )
 
-        initImages1.append(
-            os.path.abspath(
-                f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_135x_90y_225z.png"
-            )
-        )
-        initImages2.append(
-            os.path.abspath(
-                f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_180x_180y_45z.png"
-            )
-        )
-        initImages3.append(
-            os.path.abspath(
-                f"images/{POSCAR_DIRECTORY}_POSCAR/{name}/slab_225x_225y_35z.png"
+def plotThenSaveAtoms(slab, x, y, z, output_file):
+    with span("render", file=output_file) as s:
+        axes = _renderAxes()
+        with span("plot_atoms"):
+            plot_atoms(slab, axes, rotation=f"{x}x,{y}y,{z}z")
+        axes.set_axis_off()
+        with span("savefig"):
+            axes.figure.savefig(
+                output_file, bbox_inches="tight", pad_inches=0.1, dpi=300
             )
-        )
+        axes.cla()
+        s.count("files")
 
-        images1.append(
-            os.path.abspath(f"images/{first_name}/{name}/slab_135x_90y_225z.png")
-        )
-        images2.append(
-            os.path.abspath(f"images/{first_name}/{name}/slab_180x_180y_45z.png")
-        )
-        images3.append(
-            os.path.abspath(f"images/{first_name}/{name}/slab_225x_225y_35z.png")
-        )
 
-    plt.close(fig)
+def renderContcarImages(job):
+    """
+    Initial (POSCAR) and final (CONTCAR) images of one run for addContcarImagesToDf,
+    returns the image paths as (initial..., final...) in IMAGE_ROTATIONS order
+    """
+    name, CONTCAR_DIRECTORY, POSCAR_DIRECTORY, override = job
+    first_name = CONTCAR_DIRECTORY.split("/")[1].replace(".zip", "")
+    initFolder = f"images/{POSCAR_DIRECTORY}_POSCAR/{name}"
+    finalFolder = f"images/{first_name}/{name}"
+    imageNames = [f"slab_{x}x_{y}y_{z}z.png" for x, y, z in IMAGE_ROTATIONS]
+
+    initImages = [os.path.abspath(f"{initFolder}/{image}") for image in imageNames]
+    finalImages = [os.path.abspath(f"{finalFolder}/{image}") for image in imageNames]
+
+    if os.path.exists(finalFolder):
+        if override:
+            shutil.rmtree(finalFolder)
+            shutil.rmtree(initFolder)
+        elif os.path.exists(f"{finalFolder}/{imageNames[0]}"):
+            return initImages + finalImages
+
+    initSlab = read(f"{POSCAR_DIRECTORY}/{name}/POSCAR")
+    slab = readResultAtoms(f"{CONTCAR_DIRECTORY}/CONTCAR_{name}")
+
+    os.makedirs(finalFolder, exist_ok=True)
+    os.makedirs(initFolder, exist_ok=True)
+    for (x, y, z), image in zip(IMAGE_ROTATIONS, imageNames):
+        plotThenSaveAtoms(initSlab, x, y, z, f"{initFolder}/{image}")
+    for (x, y, z), image in zip(IMAGE_ROTATIONS, imageNames):
+        plotThenSaveAtoms(slab, x, y, z, f"{finalFolder}/{image}")
+
+    return initImages + finalImages
+
+
+def addContcarImagesToDf(
+    df,
+    CONTCAR_DIRECTORY: str,
+    POSCAR_DIRECTORY: str,
+    key: str,
+    override=False,
+    executor=None,
+):
 
-    initImages1.sort()
-    initImages2.sort()
-    initImages3.sort()
+    def path_to_image_html(path):
+        return '<img src="' + path + '" width="200" loading="lazy" >'
 
-    images1.sort()
-    images2.sort()
-    images3.sort()
+    executor = executor or SerialExecutor()
+    jobs = [(name, CONTCAR_DIRECTORY, POSCAR_DIRECTORY, override) for name in df[key]]
+    rendered = executor.map(renderContcarImages, jobs)
+
+    # columns: (POSCAR images, CONTCAR images) x IMAGE_ROTATIONS
+    columns = [sorted(images) for images in zip(*rendered)] if rendered else [[]] * 6
+    initImages1, initImages2, initImages3 = columns[:3]
+    images1, images2, images3 = columns[3:]
 
     df["initialAngle1"] = initImages2
     df["initialAngle2"] = initImages1
@@ -793,11 +1076,29 @@ def addContcarImagesToDf(
     return df, format_dict
 
 
-def getInitialXYfromDfAtoms(df, symbol: str, key: str, slab):
+def addContcarStructuresToDf(
+    df, CONTCAR_DIRECTORY: str, POSCAR_DIRECTORY: str, key: str
+):
+    """
+    Initial (POSCAR) and final (CONTCAR) structure of every run as paths,
+    writeReport shows them in the interactive viewer instead of rendered images
+    """
+    df["initialStructure"] = [f"{POSCAR_DIRECTORY}/{name}/POSCAR" for name in df[key]]
+    df["finalStructure"] = [f"{CONTCAR_DIRECTORY}/CONTCAR_{name}" for name in df[key]]
+    return df
+
+
+def getInitialXYfromDfAtoms(df, symbol: str, key: str, slab, runDirectory=None):
+    # with runDirectory (ex: "H/1stLayer") the site is read from each run's run.json
     xypairs = []
     atoms = getSurfaceAtoms(symbol, 0, slab)
     for name in df[key]:
-        if len(name) == 2:
+        manifest = None
+        if runDirectory is not None:
+            manifest = readManifest(f"{runDirectory}/{name}")
+        if manifest is not None and manifest.get("xy") is not None:
+            x, y = manifest["xy"]
+        elif len(name) == 2:
             index = name[1]
             x = atoms[int(index)].position[0]
             y = atoms[int(index)].position[1]
@@ -818,7 +1119,7 @@ def addShortestThreeBondLengthsToDf(
     formatted_list = []
     for name in names:
         fileName = starting + "_" + name
-        slab = read(f"{directory}/{fileName}")
+        slab = readResultAtoms(f"{directory}/{fileName}")
         _, dis = calculateDistancesForEachAtomPair(slab.copy(), symbol1, symbol2)
         formatted = f"{dis[0]}<br>{dis[1]}<br>{dis[2]}"
         formatted_list.append(formatted)
@@ -828,12 +1129,6 @@ def addShortestThreeBondLengthsToDf(
     return refKey
 
 
-slab = read("CNST_CONTCAR_WO3_T")
-middle_slab = read("CNST_CONTCAR_WO3_M", format="vasp")
-large_slab = read("CNST_CONTCAR_WO3_L", format="vasp")
-backup_slab = read("backupPSCR", format="vasp")
-emptyCell = read("CNST_CONTCAR_EMPTY")
-
 old_height_above_slab = 2.2
 height_above_slab = 1.5
 height_above_slab_for_vacancies = 0.5
@@ -843,62 +1138,83 @@ height_above_slab_for_H2_second_layer = -0.35
 triangle_1 = [0, 1, 4]
 triangle_2 = [2, 3, 5]
 
-cleanUp()
-
-from energies import h2_wo3_energy, wo3_v_energy, h2o_energy
-
-# generateSlabVac(middle_slab.copy(), "O", 0)
-# add_h2o_vacancy(
-#     backup_slab.copy(), h2o.copy(), height_above_slab_for_vacancies, "O", 0, "O_down"
-# )
-# add_h2o_vacancy(
-#     backup_slab.copy(), h2o.copy(), height_above_slab_for_vacancies, "O", 1, "O_down"
-# )
-
-# print(h2o_3_amount_energy - (h2o_energy + h2o_3_1vac_O0_energy))
-# print(h2o_2_amount_energy - (h2o_energy + h2o_2_1vac_O0_energy))
-# print(h2_wo3_energy - (h2o_energy + wo3_v_energy))
-# print(h2_avg_o014_wo3_energy - (wo3_energy + h2_energy))
-# # print(h2_bridge_wo3_energy - (wo3_energy + h2_energy))
-
-# add_n2_vacancy(middle_slab.copy(), n2.copy(), height_above_slab_for_vacancies, "O", 0)
-
-# print(medium_n2_vac_energy - (n2_energy + medium_wo3_v_energy))
-# print(large_n2_vac_energy - (n2_energy + large_wo3_v_energy))
-# print(large_n2_vac_energy)
-# print(large_wo3_v_energy)
-
-# print(medium_n2_vac_energy)
-# print(medium_wo3_v_energy)
-
-# print(n2_energy)
-
-# import matplotlib.pyplot as plt
-# from pymatgen.io.vasp import Vasprun
+slab = middle_slab = large_slab = backup_slab = emptyCell = None
 
-# sigma = 0.1  # smooth out the DOS
-# vr = Vasprun("../001_WO3/vasprun.xml")
 
-# dos = vr.complete_dos
-# dos.densities = dos.get_smeared_densities(0.1)
-
-# x = dos.energies - dos.efermi
-# y = dos.get_densities()
-# plt.plot(x, y, color="k")
-# plt.xlabel("E - Ef (eV)")
-# plt.ylabel("DOS (a.u.)")
-# plt.show()
-
-
-data = parseACFdat(slab)
-print(data)
-
-avgs = {}
-for key in data.keys():
-    item = data[key]
-    avgs[key] = sum(item) / len(item)
-
-print(avgs)
-
-
-print("----done----")
+def setup(clean: bool = True):
+    """
+    Reads the slabs of the working folder into the module globals and (with `clean`) empties
+    the output folders. Not done on import: process pool workers import this module too
+    """
+    global slab, middle_slab, large_slab, backup_slab, emptyCell
+    slab = read("CNST_CONTCAR_WO3_T")
+    middle_slab = read("CNST_CONTCAR_WO3_M", format="vasp")
+    large_slab = read("CNST_CONTCAR_WO3_L", format="vasp")
+    backup_slab = read("backupPSCR", format="vasp")
+    emptyCell = read("CNST_CONTCAR_EMPTY")
+    if clean:
+        cleanUp()
+
+
+if __name__ == "__main__":
+    executor = getExecutor()
+    # every rank reads the slabs, only one empties the output folders under the others
+    setup(clean=isRoot(executor))
+    executor.barrier()
+
+    from energies import h2_wo3_energy, wo3_v_energy, h2o_energy
+
+    # generateSlabVac(middle_slab.copy(), "O", 0)
+    # add_h2o_vacancy(
+    #     backup_slab.copy(), h2o.copy(), height_above_slab_for_vacancies, "O", 0, "O_down"
+    # )
+    # add_h2o_vacancy(
+    #     backup_slab.copy(), h2o.copy(), height_above_slab_for_vacancies, "O", 1, "O_down"
+    # )
+
+    # print(h2o_3_amount_energy - (h2o_energy + h2o_3_1vac_O0_energy))
+    # print(h2o_2_amount_energy - (h2o_energy + h2o_2_1vac_O0_energy))
+    # print(h2_wo3_energy - (h2o_energy + wo3_v_energy))
+    # print(h2_avg_o014_wo3_energy - (wo3_energy + h2_energy))
+    # # print(h2_bridge_wo3_energy - (wo3_energy + h2_energy))
+
+    # add_n2_vacancy(middle_slab.copy(), n2.copy(), height_above_slab_for_vacancies, "O", 0)
+
+    # print(medium_n2_vac_energy - (n2_energy + medium_wo3_v_energy))
+    # print(large_n2_vac_energy - (n2_energy + large_wo3_v_energy))
+    # print(large_n2_vac_energy)
+    # print(large_wo3_v_energy)
+
+    # print(medium_n2_vac_energy)
+    # print(medium_wo3_v_energy)
+
+    # print(n2_energy)
+
+    # import matplotlib.pyplot as plt
+    # from pymatgen.io.vasp import Vasprun
+
+    # sigma = 0.1  # smooth out the DOS
+    # vr = Vasprun("../001_WO3/vasprun.xml")
+
+    # dos = vr.complete_dos
+    # dos.densities = dos.get_smeared_densities(0.1)
+
+    # x = dos.energies - dos.efermi
+    # y = dos.get_densities()
+    # plt.plot(x, y, color="k")
+    # plt.xlabel("E - Ef (eV)")
+    # plt.ylabel("DOS (a.u.)")
+    # plt.show()
+
+    if isRoot(executor):
+        data = parseACFdat(slab)
+        print(data)
+
+        avgs = {}
+        for key in data.keys():
+            item = data[key]
+            avgs[key] = sum(item) / len(item)
+
+        print(avgs)
+
+        print("----done----")
@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from constants import *
+
+MANIFEST_FILE = "run.json"
+MANIFEST_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def generatorVersion():
+    # commit of these scripts that generated the run, "unknown" outside a git checkout
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compact(value):
+    # numpy -> plain json, floats rounded so a manifest stays a few hundred bytes
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_compact(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items()}
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return round(float(value), 6)
+    return value
+
+
+def _writeJson(path: str, data: dict):
+    # tmp file + rename, a reader never sees half a manifest
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(_compact(data), f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def pendingManifestPath(fileName: str):
+    return f"{fileName}.json"
+
+
+def writePendingManifest(fileName: str, placement: dict):
+    """
+    Next to a generated POSCAR, ex: POSCAR_H2O_Vac_O0_OD.json, until generateSimulationFolders
+    moves both into the run folder
+    """
+    _writeJson(pendingManifestPath(fileName), placement)
+
+
+def popPendingManifest(fileName: str):
+    path = pendingManifestPath(fileName)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        placement = json.load(f)
+    os.remove(path)
+    return placement
+
+
+def writeManifest(runFolder: str, manifest: dict):
+    manifest = dict(manifest)
+    manifest.setdefault("version", MANIFEST_VERSION)
+    manifest.setdefault("generator", generatorVersion())
+    manifest.setdefault("created", time.time())
+    _writeJson(os.path.join(runFolder, MANIFEST_FILE), manifest)
+
+
+def readManifest(runFolder: str):
+    """The run's run.json as a dict, None for folders generated before manifests existed"""
+    path = os.path.join(runFolder, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,139 @@
+import numpy as np
+
+from constants import *
+
+AXES = {
+    "x": np.array([1.0, 0.0, 0.0]),
+    "y": np.array([0.0, 1.0, 0.0]),
+    "z": np.array([0.0, 0.0, 1.0]),
+}
+
+# rotation -> letter used in the folder names, ex: H2O "HD" + "U" = HDU
+H_DOWN_LETTERS = {0: "U", 90: "L", 180: "D", 270: "R"}
+COPLANAR_LETTERS = {0: "L", 90: "D", 180: "R", 270: "U"}
+
+
+def rotationMatrices(angles, axis):
+    """
+    (N, 3, 3) rotation matrices for `angles` (degrees) about `axis`.
+    Same convention as ase's Atoms.rotate(angle, axis), so R @ p matches a rotated atom
+    """
+    angles = np.radians(np.atleast_1d(np.asarray(angles, dtype=float)))
+    v = AXES[axis] if isinstance(axis, str) else np.asarray(axis, dtype=float)
+    v = v / np.linalg.norm(v)
+
+    cross = np.array(
+        [
+            [0.0, -v[2], v[1]],
+            [v[2], 0.0, -v[0]],
+            [-v[1], v[0], 0.0],
+        ]
+    )
+    c = np.cos(angles)[:, None, None]
+    s = np.sin(angles)[:, None, None]
+    return c * np.eye(3) + s * cross + (1 - c) * np.outer(v, v)
+
+
+def rotationMatrix(angle, axis):
+    return rotationMatrices(angle, axis)[0]
+
+
+def eulerMatrices(theta, phi, psi):
+    """
+    Rz(phi) @ Ry(theta) @ Rz(psi): spins the molecule by psi about its own z axis,
+    then points that axis along (theta, phi). All in degrees, broadcast to (N, 3, 3)
+    """
+    theta, phi, psi = np.broadcast_arrays(
+        np.atleast_1d(theta), np.atleast_1d(phi), np.atleast_1d(psi)
+    )
+    return np.einsum(
+        "nij,njk,nkl->nil",
+        rotationMatrices(phi, "z"),
+        rotationMatrices(theta, "y"),
+        rotationMatrices(psi, "z"),
+    )
+
+
+def fibonacciSphere(n: int, hemisphere=False):
+    """
+    (theta, phi) in degrees of n nearly uniform directions on the sphere (golden spiral).
+    `hemisphere` only keeps directions with z >= 0
+    """
+    i = np.arange(n) + 0.5
+    z = 1 - i / n if hemisphere else 1 - 2 * i / n
+    theta = np.degrees(np.arccos(z))
+    phi = np.degrees(np.pi * (1 + 5**0.5) * i) % 360
+    return theta, phi
+
+
+def so3Grid(nDirections: int, nSpins: int = 1, hemisphere=False):
+    """
+    Orientation grid: nDirections fibonacci directions for the molecule's z axis
+    times nSpins evenly spaced spins about it. Returns (theta, phi, psi), each nDirections * nSpins long
+    """
+    theta, phi = fibonacciSphere(nDirections, hemisphere)
+    psi = np.arange(nSpins) * 360.0 / nSpins
+    return (
+        np.repeat(theta, nSpins),
+        np.repeat(phi, nSpins),
+        np.tile(psi, nDirections),
+    )
+
+
+def orientationCodes(theta, phi, psi):
+    # ex: T90P45S0, no "_" so generateSimulationFolders can still split the file name
+    return [
+        f"T{t:.0f}P{p:.0f}S{s:.0f}"
+        for t, p, s in zip(np.rint(theta), np.rint(phi) % 360, np.rint(psi) % 360)
+    ]
+
+
+def orientationLibrary(nDirections: int, nSpins: int = 1, hemisphere=False):
+    """(N, 3, 3) matrices and their codes for a dense orientation scan"""
+    theta, phi, psi = so3Grid(nDirections, nSpins, hemisphere)
+    return eulerMatrices(theta, phi, psi), orientationCodes(theta, phi, psi)
+
+
+def namedOrientation(molecule: str, orientation: str, rotation=0):
+    """
+    Matrix and folder code of the hand picked orientations
+    H2O: H2_down, O_down, H_down, coplanar
+    N2: upright, coplanar
+    """
+    identity = np.eye(3)
+    molecule = molecule.upper()
+
+    if molecule == "H2O" and orientation == "H2_down":
+        return identity, "H2D"
+    if molecule == "H2O" and orientation == "O_down":
+        return rotationMatrix(180, "x"), "OD"
+    if molecule == "H2O" and orientation == "H_down":
+        matrix = rotationMatrix(rotation, "z") @ rotationMatrix(90, "x")
+        return matrix, "HD" + H_DOWN_LETTERS.get(rotation, "X")
+    if molecule == "N2" and orientation == "upright":
+        return rotationMatrix(180, "x"), "UPR"
+    if orientation == "coplanar":
+        matrix = rotationMatrix(rotation, "z") @ rotationMatrix(90, "y")
+        return matrix, "C" + COPLANAR_LETTERS.get(rotation, "X")
+
+    print(
+        f'{bcolors.FAIL}Unknown orientation "{orientation}" for {molecule}{bcolors.ENDC}'
+    )
+    raise ValueError
+
+
+def centeredPositions(template):
+    # same as Atoms.center() on a molecule without a cell: bounding box centered on the origin
+    positions = template.get_positions()
+    return positions - 0.5 * (positions.min(axis=0) + positions.max(axis=0))
+
+
+def orientPositions(template, matrices):
+    """Rotates the centered template by every matrix at once -> (N, natoms, 3)"""
+    return np.einsum("nij,aj->nai", matrices, centeredPositions(template))
+
+
+def orientedMolecule(template, positions):
+    molecule = template.copy()
+    molecule.set_positions(positions)
+    return molecule
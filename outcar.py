@@ -0,0 +1,219 @@
+import mmap
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from ase.constraints import FixAtoms
+from ase.io import read
+
+from constants import *
+from executors import SerialExecutor
+from tracing import count, traced
+
+# every pattern is matched on the raw bytes of the mmap, nothing is decoded except the
+# matched numbers and the (small) force blocks. They all start with a literal so re can
+# skip ahead with a fast substring search instead of trying every position
+NIONS_RE = re.compile(rb"NIONS\s*=\s*(\d+)")
+TOTEN_RE = re.compile(rb"TOTEN\s*=\s*([-+\d.Ee]+)")
+E0_RE = re.compile(rb"energy\(sigma->0\)\s*=\s*([-+\d.Ee]+)")
+# "number of electron  384.0000000 magnetization  2.0000000", matched from "magnetization"
+MAG_RE = re.compile(rb"magnetization\s+([-+\d.Ee]+)")
+LOOP_RE = re.compile(rb"LOOP:")
+LOOP_PLUS_RE = re.compile(
+    rb"LOOP\+:\s+\w+ time\s+([-+\d.Ee]+):\s+\w+ time\s+([-+\d.Ee]+)"
+)
+FORCE_RE = re.compile(rb"TOTAL-FORCE \(eV/Angst\)[^\n]*\n[^\n]*\n")
+WARNING_LINE_RE = re.compile(rb"WARNING:?[ \t]*([^\n]*)")
+WARNING_BOX_RE = re.compile(rb"W    W    AA    RRRRR[^\n]*\n((?:\|[^\n]*\n)+)")
+ACCURACY = b"reached required accuracy"
+FINISHED = b"General timing and accounting"
+
+STEP_COLUMNS = [
+    "Step",
+    "TOTEN (eV)",
+    "E0 (eV)",
+    "Max force (eV/Å)",
+    "Magnetization",
+    "Electronic steps",
+    "LOOP+ cpu (s)",
+    "LOOP+ real (s)",
+]
+
+
+def _lastBefore(pattern, literal: bytes, data, ends):
+    """
+    Value of the last match of pattern in every ionic step (between two LOOP+ lines).
+    Searching backwards from the LOOP+ line for the literal only touches the end of the
+    step, the electronic steps before it are never matched or converted
+    """
+    out = np.full(len(ends), np.nan)
+    start = 0
+    for k, end in enumerate(ends):
+        pos = data.rfind(literal, start, end)
+        while pos != -1:
+            m = pattern.match(data, pos)
+            if m:
+                out[k] = float(m.group(1))
+                break
+            # ex: the "magnetization (x)" table, keep going back
+            pos = data.rfind(literal, start, pos)
+        start = end
+    return out
+
+
+def _warnings(data):
+    messages = [m.group(1).strip() for m in WARNING_LINE_RE.finditer(data)]
+    for m in WARNING_BOX_RE.finditer(data):
+        # 5 more lines of | ascii art |, then the message in | ... | lines
+        text = []
+        for line in m.group(1).split(b"\n")[5:]:
+            line = line.strip().strip(b"|").strip()
+            if line:
+                text.append(line)
+        messages.append(b" ".join(text))
+    return [message.decode(errors="replace") for message in messages if message]
+
+
+def _maxForces(data, nions: int, ends, free=None):
+    """Largest force norm on the (free) atoms of the last force block before every end"""
+    blocks = np.array([m.end() for m in FORCE_RE.finditer(data)], dtype=np.int64)
+    which = np.searchsorted(blocks, ends) - 1
+    out = np.full(len(ends), np.nan)
+    for k, b in enumerate(which):
+        if b < 0 or (k > 0 and which[k - 1] == b):
+            continue
+        start = blocks[b]
+        # nions lines of "x y z fx fy fz", stop at the next line of dashes
+        block = data[start : data.find(b"---", start)]
+        table = np.array(block.split(), dtype=float)
+        if len(table) != nions * 6:
+            continue
+        forces = table.reshape(nions, 6)[:, 3:]
+        if free is not None:
+            forces = forces[free]
+        out[k] = np.sqrt((forces**2).sum(axis=1)).max() if len(forces) else 0.0
+    return out
+
+
+@traced("parse")
+def scanOutcar(path: str, free=None):
+    """
+    One pass over an OUTCAR through mmap. Returns (steps, summary):
+    steps has one row per finished ionic step (one LOOP+ line) with STEP_COLUMNS,
+    summary has nions, steps, reachedAccuracy, finished and warnings.
+    free is an optional (nions,) bool mask, selective dynamics fixed atoms are
+    left out of the max force like VASP does for EDIFFG < 0
+    """
+    size = os.path.getsize(path)
+    count("files")
+    count("bytes", size)
+    summary = {"path": path, "nions": 0, "steps": 0}
+    if size == 0:
+        summary.update(reachedAccuracy=False, finished=False, warnings=[])
+        return pd.DataFrame(columns=STEP_COLUMNS), summary
+
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        nions = NIONS_RE.search(data)
+        nions = int(nions.group(1)) if nions else 0
+
+        loopPlus = list(LOOP_PLUS_RE.finditer(data))
+        ends = np.array([m.start() for m in loopPlus], dtype=np.int64)
+        starts = np.r_[0, ends[:-1]]
+
+        steps = pd.DataFrame(
+            {
+                "Step": np.arange(1, len(ends) + 1),
+                "TOTEN (eV)": _lastBefore(TOTEN_RE, b"TOTEN", data, ends),
+                "E0 (eV)": _lastBefore(E0_RE, b"energy(sigma->0)", data, ends),
+                "Max force (eV/Å)": _maxForces(data, nions, ends, free),
+                "Magnetization": _lastBefore(MAG_RE, b"magnetization", data, ends),
+                # LOOP: lines between two LOOP+ lines = electronic steps of that ionic step
+                "Electronic steps": [
+                    len(LOOP_RE.findall(data, start, end))
+                    for start, end in zip(starts, ends)
+                ],
+                "LOOP+ cpu (s)": [float(m.group(1)) for m in loopPlus],
+                "LOOP+ real (s)": [float(m.group(2)) for m in loopPlus],
+            },
+            columns=STEP_COLUMNS,
+        )
+
+        tail = data[max(0, size - (1 << 16)) :]
+        summary.update(
+            nions=nions,
+            steps=len(ends),
+            reachedAccuracy=data.rfind(ACCURACY) != -1,
+            finished=FINISHED in tail,
+            warnings=_warnings(data),
+        )
+    return steps, summary
+
+
+def freeAtomsMask(runFolder: str):
+    # selective dynamics from the run's POSCAR, None if every atom is free
+    poscar = os.path.join(runFolder, "POSCAR")
+    if not os.path.exists(poscar):
+        return None
+    atoms = read(poscar, format="vasp")
+    free = np.ones(len(atoms), dtype=bool)
+    for constraint in atoms.constraints:
+        if isinstance(constraint, FixAtoms):
+            free[constraint.index] = False
+    return None if free.all() else free
+
+
+def findOutcars(tree: str, fileName: str = "OUTCAR"):
+    outcars = []
+    for root, dirs, files in os.walk(tree):
+        dirs.sort()
+        if fileName in files:
+            outcars.append(os.path.join(root, fileName))
+    return outcars
+
+
+def _scanRun(path: str):
+    return scanOutcar(path, freeAtomsMask(os.path.dirname(path)))
+
+
+def scanOutcarTree(tree: str, executor=None, fileName: str = "OUTCAR"):
+    """
+    Scans every OUTCAR under tree (ex: "H" or "H2O"), in parallel with executor.
+    Returns (steps, summary) DataFrames: steps has every ionic step of every run with a
+    "Run" column (folder relative to tree), summary one row per run
+    """
+    executor = executor or SerialExecutor()
+    paths = findOutcars(tree, fileName)
+    results = executor.map(_scanRun, paths)
+
+    runs = [os.path.relpath(os.path.dirname(path), tree) for path in paths]
+    tables = []
+    rows = []
+    for run, (steps, summary) in zip(runs, results):
+        steps.insert(0, "Run", run)
+        tables.append(steps)
+
+        last = steps.iloc[-1] if len(steps) else {}
+        rows.append(
+            {
+                "Run": run,
+                "Ionic steps": summary["steps"],
+                "Reached accuracy": summary["reachedAccuracy"],
+                "Finished": summary["finished"],
+                "E0 (eV)": last.get("E0 (eV)", np.nan),
+                "Max force (eV/Å)": last.get("Max force (eV/Å)", np.nan),
+                "Magnetization": last.get("Magnetization", np.nan),
+                "Real time (s)": steps["LOOP+ real (s)"].sum(),
+                "Warnings": len(summary["warnings"]),
+                "Warning messages": "<br>".join(sorted(set(summary["warnings"]))),
+            }
+        )
+
+    steps = (
+        pd.concat(tables, ignore_index=True)
+        if tables
+        else pd.DataFrame(columns=["Run"] + STEP_COLUMNS)
+    )
+    return steps, pd.DataFrame(rows)
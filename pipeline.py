@@ -0,0 +1,138 @@
+import json
+import os
+import time
+
+from ase.io import read
+
+from constants import *
+
+LINEAGE_FILE = "lineage.json"
+
+
+def convergedRuns(runFolders, executor=None, cachePath: str = CONVERGENCE_CACHE):
+    """
+    The runs with a CONTCAR to start from that convergence.classifyRuns labels CONVERGED,
+    classified in one call through its size/mtime stamped cache
+    """
+    # imported here, convergence imports findRuns from this module
+    from convergence import CONVERGED, classifyRuns
+
+    ready = [
+        run
+        for run in runFolders
+        if os.path.exists(os.path.join(run, "CONTCAR"))
+        and os.path.getsize(os.path.join(run, "CONTCAR")) > 0
+    ]
+    labels = classifyRuns(ready, executor, cachePath)
+    return [run for run in ready if labels[run] == CONVERGED]
+
+
+def isConverged(runFolder: str, cachePath: str = CONVERGENCE_CACHE):
+    # one run, a StagePipeline pass classifies all of its pending runs at once
+    return bool(convergedRuns([runFolder], cachePath=cachePath))
+
+
+def findRuns(sourceTree: str):
+    # every folder under sourceTree that looks like a VASP run (has a POSCAR)
+    runs = []
+    for root, dirs, files in os.walk(sourceTree):
+        dirs.sort()
+        if "POSCAR" in files:
+            runs.append(root)
+    return runs
+
+
+class Stage:
+    """
+    One link of a multi step study, ex: converged H/1stLayer runs -> add a second H.
+    transform(atoms) takes the final CONTCAR and writes POSCAR file(s) the same way the
+    add_* functions do, returning the file name or a list of them.
+    emit(fileName, parentName) turns a POSCAR file into a run folder (generateSimulationFolders)
+    and returns the folder.
+    converged(run) -> bool replaces the default check, convergedRuns over every pending
+    run of the stage at once
+    """
+
+    def __init__(self, name: str, sourceTree: str, transform, emit, converged=None):
+        self.name = name
+        self.sourceTree = sourceTree
+        self.transform = transform
+        self.emit = emit
+        self.converged = converged
+
+
+class StagePipeline:
+    """
+    Runs stages over their source trees, only touching runs that finished since the last pass.
+    Convergence goes through the classifyRuns cache (cachePath), spread over `executor`.
+    Which parent produced which folders is kept in lineage.json:
+    {stage name: {parent run: [child folders]}}
+    """
+
+    def __init__(
+        self,
+        stages,
+        lineagePath: str = LINEAGE_FILE,
+        executor=None,
+        cachePath: str = CONVERGENCE_CACHE,
+    ):
+        self.stages = stages
+        self.lineagePath = lineagePath
+        self.executor = executor
+        self.cachePath = cachePath
+        self.lineage = {}
+        if os.path.exists(lineagePath):
+            with open(lineagePath) as f:
+                self.lineage = json.load(f)
+
+    def _save(self):
+        tmp = self.lineagePath + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.lineage, f, indent=2)
+        os.replace(tmp, self.lineagePath)
+
+    def runOnce(self):
+        """One pass over every stage, returns the folders that were created"""
+        created = []
+        for stage in self.stages:
+            done = self.lineage.setdefault(stage.name, {})
+            pending = [run for run in findRuns(stage.sourceTree) if run not in done]
+            if stage.converged is None:
+                # unchanged runs come from the cache, only new OUTCARs are scanned
+                ready = convergedRuns(pending, self.executor, self.cachePath)
+            else:
+                ready = [run for run in pending if stage.converged(run)]
+            for run in ready:
+                contcar = read(os.path.join(run, "CONTCAR"), format="vasp")
+                fileNames = stage.transform(contcar)
+                if isinstance(fileNames, str):
+                    fileNames = [fileNames]
+
+                parentName = os.path.relpath(run, stage.sourceTree).replace(os.sep, "-")
+                children = [stage.emit(fileName, parentName) for fileName in fileNames]
+                print(
+                    f"{bcolors.OKGREEN}[{stage.name}] {run} -> {', '.join(map(str, children))}{bcolors.ENDC}"
+                )
+
+                # saved per parent so a crash mid pass doesn't redo finished parents
+                done[run] = children
+                self._save()
+                created.extend(children)
+        return created
+
+    def watch(self, interval: float = 300):
+        """Keeps running passes every `interval` seconds, stop with ctrl+c"""
+        try:
+            while True:
+                created = self.runOnce()
+                print(f"{len(created)} new folders, sleeping {interval}s")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("stopped")
+
+    def parentOf(self, folder: str):
+        for stage, parents in self.lineage.items():
+            for parent, children in parents.items():
+                if folder in children:
+                    return stage, parent
+        return None
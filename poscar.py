@@ -0,0 +1,102 @@
+from functools import lru_cache
+
+import numpy as np
+from ase.constraints import FixAtoms
+from ase.data import chemical_symbols
+from ase.io import write
+
+from tracing import span
+
+COORD_FORMAT = " %19.16f %19.16f %19.16f"
+FLAG_FORMAT = "%4s%4s%4s"
+
+
+@lru_cache(maxsize=256)
+def _header(cellBytes: bytes, symbolCount: tuple, selective: bool):
+    cell = np.frombuffer(cellBytes).reshape(3, 3)
+
+    lines = [" ".join(f"{sym:2s}" for sym, _ in symbolCount)]
+    lines.append(f"{1.0:19.16f}")
+    for vec in cell:
+        lines.append("  " + " ".join(f"{el:21.16f}" for el in vec))
+    lines.append(" " + " ".join(f"{sym:3s}" for sym, _ in symbolCount))
+    lines.append(" " + " ".join(f"{count:3d}" for _, count in symbolCount))
+    if selective:
+        lines.append("Selective dynamics")
+    lines.append("Cartesian")
+    return "\n".join(lines) + "\n"
+
+
+def symbolCount(atoms):
+    # runs of the same species, ex: O O W W O -> (("O", 2), ("W", 2), ("O", 1))
+    numbers = atoms.numbers
+    starts = np.flatnonzero(np.r_[True, numbers[1:] != numbers[:-1]])
+    counts = np.diff(np.r_[starts, len(numbers)])
+    return tuple(
+        (chemical_symbols[numbers[start]], int(count))
+        for start, count in zip(starts, counts)
+    )
+
+
+def fastPath(atoms):
+    # anything other than FixAtoms (FixScaled, FixedLine...) goes through ase
+    return atoms.cell.rank == 3 and all(
+        isinstance(constraint, FixAtoms) for constraint in atoms.constraints
+    )
+
+
+def poscarString(atoms):
+    """
+    Same text as ase.io.write(..., format="vasp") for cartesian POSCARs. The header is cached
+    per cell/species layout so placements on the same parent slab reuse it, and the
+    coordinate block is formatted with a single % call
+    """
+    selective = len(atoms.constraints) > 0
+    header = _header(
+        np.ascontiguousarray(atoms.get_cell(), dtype=float).tobytes(),
+        symbolCount(atoms),
+        selective,
+    )
+
+    positions = atoms.positions
+    if not selective:
+        values = positions.ravel().tolist()
+        return header + ((COORD_FORMAT + "\n") * len(atoms)) % tuple(values)
+
+    fixed = np.zeros(len(atoms), dtype=bool)
+    for constraint in atoms.constraints:
+        fixed[constraint.index] = True
+    flags = np.where(fixed, "F", "T")
+
+    values = np.empty((len(atoms), 6), dtype=object)
+    values[:, :3] = positions
+    values[:, 3:] = flags[:, None]
+    return header + ((COORD_FORMAT + FLAG_FORMAT + "\n") * len(atoms)) % tuple(
+        values.ravel()
+    )
+
+
+def writePoscar(fileName: str, atoms):
+    with span("write", file=fileName) as s:
+        s.count("files")
+        if not fastPath(atoms):
+            write(fileName, atoms, format="vasp")
+            return
+
+        text = poscarString(atoms)
+        s.count("bytes", len(text))
+        with open(fileName, "w", buffering=1 << 16) as f:
+            f.write(text)
+
+
+def _writePoscarItem(fileNameAndAtoms):
+    writePoscar(*fileNameAndAtoms)
+
+
+def writePoscars(fileNamesAndAtoms, executor=None):
+    """ex: writePoscars(zip(fileNames, slabs)), executor from executors.getExecutor"""
+    if executor is None:
+        for fileName, atoms in fileNamesAndAtoms:
+            writePoscar(fileName, atoms)
+        return
+    executor.map(_writePoscarItem, list(fileNamesAndAtoms))
@@ -0,0 +1,270 @@
+import hashlib
+import html
+import os
+import re
+import shutil
+
+from PIL import Image, features
+
+from constants import *
+from executors import SerialExecutor, isRoot
+from tracing import count, span, traced
+from viewer import VIEWER_SCRIPT, writeStructurePayload
+
+ROWS_PER_PAGE = 50
+THUMBNAIL_WIDTH = 300  # px, shown at 200 so it stays sharp on hidpi screens
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+THUMBNAIL_FORMAT = "webp" if features.check("webp") else "png"
+# POSCAR/CONTCAR paths, ex: the initialStructure/finalStructure columns of addContcarStructuresToDf
+STRUCTURE_RE = re.compile(r"(^|[/\\])(POSCAR|CONTCAR)(_[^/\\]*)?$")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{head}<style>
+body {{ font-family: sans-serif; margin: 1em; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px; vertical-align: top; }}
+nav a {{ margin-right: 0.4em; }}
+nav .current {{ font-weight: bold; }}
+canvas.structure {{ cursor: grab; }}
+</style>
+</head>
+<body>
+<h2>{title}</h2>
+{nav}
+{table}
+{nav}
+</body>
+</html>
+"""
+
+
+def _upToDate(src: str, dst: str):
+    return os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src)
+
+
+def _relativeName(src: str):
+    # images/H_CONTCAR/O0/slab_135x_90y_225z.png -> H_CONTCAR/O0/slab_135x_90y_225z
+    rel = os.path.relpath(src)
+    if rel.startswith(".."):
+        # outside the workspace, keep names unique without the absolute path
+        return hashlib.sha1(src.encode()).hexdigest()[:12] + "_" + os.path.basename(src)
+    parts = rel.replace(os.sep, "/").split("/")
+    if parts[0] == "images":
+        parts = parts[1:]
+    return os.path.splitext("/".join(parts))[0]
+
+
+def copyImage(job):
+    """Full size image into the report (hard link when possible), skipped when up to date"""
+    src, dst = job
+    if _upToDate(src, dst):
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+@traced("thumbnail")
+def makeThumbnail(job):
+    """Downsized copy of src, skipped when it's newer than src"""
+    src, dst, width = job
+    if _upToDate(src, dst):
+        count("cache hits")
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with Image.open(src) as image:
+        image.thumbnail((width, width * 10))
+        if THUMBNAIL_FORMAT == "webp":
+            image.save(dst, "WEBP", quality=80, method=4)
+        else:
+            image.save(dst, "PNG", optimize=True)
+    return dst
+
+
+def _writeIfChanged(path: str, text: str):
+    # untouched pages keep their mtime, so syncing data/ only moves what changed
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return True
+
+
+def imageColumnsOf(df):
+    # columns holding image paths, ex: the initialAngle/finalAngle columns of addContcarImagesToDf
+    return [
+        column
+        for column in df.columns
+        if len(df)
+        and all(
+            isinstance(value, str) and value.lower().endswith(IMAGE_EXTENSIONS)
+            for value in df[column]
+        )
+    ]
+
+
+def structureColumnsOf(df):
+    return [
+        column
+        for column in df.columns
+        if len(df)
+        and all(
+            isinstance(value, str) and STRUCTURE_RE.search(value)
+            for value in df[column]
+        )
+    ]
+
+
+def pageName(page: int):
+    return "index.html" if page == 0 else f"page-{page + 1:03d}.html"
+
+
+def _nav(page: int, pages: int):
+    if pages <= 1:
+        return ""
+    links = []
+    if page > 0:
+        links.append(f'<a href="{pageName(page - 1)}">&laquo; prev</a>')
+    for i in range(pages):
+        css = ' class="current"' if i == page else ""
+        links.append(f'<a href="{pageName(i)}"{css}>{i + 1}</a>')
+    if page < pages - 1:
+        links.append(f'<a href="{pageName(page + 1)}">next &raquo;</a>')
+    return f"<nav>{' '.join(links)}</nav>"
+
+
+@traced("report")
+def writeReport(
+    df,
+    name: str,
+    formatters=None,
+    imageColumns=None,
+    rowsPerPage: int = ROWS_PER_PAGE,
+    reportDirectory: str = "data",
+    executor=None,
+    title: str = None,
+    structureColumns=None,
+    compressStructures: bool = False,
+):
+    """
+    Paginated version of df.to_html(..., escape=False, formatters=format_dict) in
+    {reportDirectory}/{name}/ (index.html, page-002.html, ...).
+    Image columns (absolute paths from addContcarImagesToDf) become lazy loaded thumbnails
+    linking to the full image, both copied inside the report folder with relative links,
+    so the folder can be moved or zipped on its own.
+    Structure columns (POSCAR/CONTCAR paths) become viewer.js canvases holding the
+    structure itself, rotated and zoomed in the browser (compressStructures gzips them).
+    Only images, structures and pages that changed are written again. Under MPI call it
+    on every rank, the pages are only written by rank 0
+    """
+    executor = executor or SerialExecutor()
+    reportFolder = os.path.join(reportDirectory, name)
+    os.makedirs(reportFolder, exist_ok=True)
+    if imageColumns is None:
+        imageColumns = imageColumnsOf(df)
+    if structureColumns is None:
+        structureColumns = structureColumnsOf(df)
+    formatters = dict(formatters or {})
+
+    # every image once, even if it shows up in several rows
+    sources = sorted({path for column in imageColumns for path in df[column]})
+    full = {
+        src: f"full/{_relativeName(src)}{os.path.splitext(src)[1]}" for src in sources
+    }
+    thumbs = {src: f"thumbs/{_relativeName(src)}.{THUMBNAIL_FORMAT}" for src in sources}
+    executor.map(
+        copyImage,
+        [(src, os.path.join(reportFolder, full[src])) for src in sources],
+    )
+    executor.map(
+        makeThumbnail,
+        [
+            (src, os.path.join(reportFolder, thumbs[src]), THUMBNAIL_WIDTH)
+            for src in sources
+        ],
+    )
+
+    def imageCell(path):
+        return (
+            f'<a href="{html.escape(full[path])}"><img src="{html.escape(thumbs[path])}"'
+            f' width="200" loading="lazy" decoding="async"></a>'
+        )
+
+    for column in imageColumns:
+        formatters[column] = imageCell
+
+    # payloads are cached in structures/, an unchanged geometry is never parsed again
+    structures = sorted({path for column in structureColumns for path in df[column]})
+    payloadPaths = executor.map(
+        writeStructurePayload,
+        [
+            (
+                src,
+                os.path.join(reportFolder, f"structures/{_relativeName(src)}.json"),
+                compressStructures,
+            )
+            for src in structures
+        ],
+    )
+    payloads = {}
+    for src, path in zip(structures, payloadPaths):
+        with open(path) as f:
+            payloads[src] = f.read()
+
+    def structureCell(path):
+        return (
+            f'<canvas class="structure" width="200" height="200"'
+            f' data-structure="{html.escape(payloads[path])}"></canvas>'
+        )
+
+    for column in structureColumns:
+        formatters[column] = structureCell
+
+    # under MPI every rank copied/rendered its share above, the pages are written once
+    if not isRoot(executor):
+        return os.path.join(reportFolder, "index.html")
+
+    head = ""
+    if structureColumns:
+        with open(VIEWER_SCRIPT) as f:
+            _writeIfChanged(os.path.join(reportFolder, "viewer.js"), f.read())
+        head = '<script src="viewer.js" defer></script>\n'
+
+    pages = max(1, -(-len(df) // rowsPerPage))
+    title = title or name
+    written = 0
+    for page in range(pages):
+        rows = df.iloc[page * rowsPerPage : (page + 1) * rowsPerPage]
+        table = rows.to_html(escape=False, formatters=formatters)
+        text = PAGE_TEMPLATE.format(
+            title=html.escape(f"{title} ({page + 1}/{pages})" if pages > 1 else title),
+            head=head,
+            nav=_nav(page, pages),
+            table=table,
+        )
+        written += _writeIfChanged(os.path.join(reportFolder, pageName(page)), text)
+
+    # pages left over from a longer run of the report
+    page = pages
+    while os.path.exists(os.path.join(reportFolder, pageName(page))):
+        os.remove(os.path.join(reportFolder, pageName(page)))
+        page += 1
+
+    count("pages written", written)
+    print(
+        f"{bcolors.OKGREEN}{reportFolder}/index.html: {len(df)} rows, {pages} pages, {written} written{bcolors.ENDC}"
+    )
+    return os.path.join(reportFolder, "index.html")
@@ -0,0 +1,250 @@
+import os
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from archives import tailResult
+from constants import *
+from convergence import classifyRuns
+from executors import SerialExecutor
+from pipeline import findRuns
+
+# columns that can be passed to query(), everything else is data
+FIELDS = (
+    "folder",
+    "molecule",
+    "vacancy",
+    "symbol",
+    "site",
+    "orientation",
+    "cell",
+    "parent",
+    "template",
+    "status",
+    "fingerprint",
+)
+
+CELL_RE = re.compile(r"x\d+y\d+")
+OSZICAR_ENERGY_RE = re.compile(r"F=\s*([-+\d.Ee]+)")
+
+
+def poscarNameFields(fileName: str):
+    """
+    Structured fields of a generated POSCAR name, the same split generateSimulationFolders does
+    ex: "POSCAR_N2_Vac_O1_UPR" -> molecule N2, vacancy, site O1, symbol O, orientation UPR
+    """
+    tmp = os.path.basename(fileName).split("_")
+    site = tmp[3]
+    return {
+        "molecule": tmp[1],
+        "vacancy": tmp[2] == "Vac",
+        "site": site,
+        "symbol": site[0],
+        "orientation": tmp[4] if len(tmp) == 5 else "",
+    }
+
+
+def folderNameFields(folder: str):
+    """
+    Same fields from an existing run folder, ex: H2O/V-O0-OD, H/1stLayer/Avg-O014, H/1stLayer/O0.
+    Only needed once, to import trees generated before the database existed
+    """
+    parts = folder.replace(os.sep, "/").strip("/").split("/")
+    name = parts[-1].split("-")
+    fields = {"molecule": parts[0], "vacancy": False, "orientation": ""}
+    if name[0] == "V":
+        fields["vacancy"] = True
+        name = name[1:]
+    elif name[0] == "Avg":
+        fields["orientation"] = "avg"
+        name = name[1:]
+    fields["site"] = name[0]
+    fields["symbol"] = name[0][0]
+    if len(name) > 1:
+        fields["orientation"] = "-".join(name[1:])
+    return fields
+
+
+def cellLabel(*names):
+    # "x2y2" from a template/folder name like templates_W001_x2y2, the unit cell otherwise
+    for name in names:
+        m = CELL_RE.search(name or "")
+        if m:
+            return m.group(0)
+    return "x1y1"
+
+
+def finalEnergy(oszicarPath: str):
+    # F= of the last ionic step, same number readOszicarFileAndGetLastLineEnergy reads
+    for line in reversed(tailResult(oszicarPath, 3)):
+        m = OSZICAR_ENERGY_RE.search(line)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+class ResultsDatabase:
+    """
+    SQLite table of every generated run: structured fields instead of the ones encoded in
+    the POSCAR/folder names, its parent, template and status, then its energy once harvested.
+    ex: db.query(molecule="N2", vacancy=True, orientation="UPR", cell="x2y2")
+    """
+
+    def __init__(self, path: str = RESULTS_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                folder TEXT PRIMARY KEY,
+                molecule TEXT,
+                vacancy INTEGER,
+                symbol TEXT,
+                site TEXT,
+                orientation TEXT,
+                cell TEXT,
+                natoms INTEGER,
+                parent TEXT,
+                template TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                fingerprint TEXT,
+                energy REAL,
+                adsorption_energy REAL,
+                created REAL,
+                updated REAL
+            )
+            """)
+        for columns in (
+            "molecule, vacancy, orientation, cell",
+            "site",
+            "status",
+            "parent",
+            "fingerprint",
+        ):
+            name = "runs_" + columns.replace(", ", "_")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON runs ({columns})")
+        self.conn.commit()
+
+    def record(self, folder: str, commit=True, **fields):
+        """Adds or updates the run in folder, fields are columns of the runs table"""
+        fields["updated"] = time.time()
+        columns = ["folder"] + list(fields)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+        self.conn.execute(
+            f"INSERT INTO runs ({', '.join(columns)}, created) "
+            f"VALUES ({', '.join('?' * len(columns))}, ?) "
+            f"ON CONFLICT(folder) DO UPDATE SET {updates}",
+            [folder] + list(fields.values()) + [fields["updated"]],
+        )
+        if commit:
+            self.conn.commit()
+
+    def recordGenerated(
+        self,
+        fileName: str,
+        folder: str,
+        atoms=None,
+        template: str = "",
+        parent: str = None,
+        fingerprint: str = None,
+    ):
+        """Called by generateSimulationFolders with the POSCAR it just moved into folder"""
+        self.record(
+            folder,
+            status="queued",
+            cell=cellLabel(template, folder),
+            natoms=None if atoms is None else len(atoms),
+            template=template,
+            parent=parent,
+            fingerprint=fingerprint,
+            **poscarNameFields(fileName),
+        )
+
+    def importTree(self, tree: str, template: str = ""):
+        """
+        Records every run under tree that isn't in the database yet, from its folder name.
+        tree is relative to the workspace (ex: "H", "H2O"), its first folder is the molecule
+        """
+        known = {row["folder"] for row in self.conn.execute("SELECT folder FROM runs")}
+        added = 0
+        for run in findRuns(tree):
+            folder = os.path.normpath(run).replace(os.sep, "/")
+            if folder in known:
+                continue
+            self.record(
+                folder,
+                commit=False,
+                cell=cellLabel(template, folder),
+                template=template,
+                **folderNameFields(folder),
+            )
+            added += 1
+        self.conn.commit()
+        return added
+
+    def setStatus(self, folder: str, status: str):
+        self.record(folder, status=status)
+
+    def harvest(self, folders=None, executor=None):
+        """
+        Convergence label as status and the final OSZICAR energy of every run
+        (or only `folders`), read through the convergence cache
+        """
+        executor = executor or SerialExecutor()
+        if folders is None:
+            folders = [
+                row["folder"] for row in self.conn.execute("SELECT folder FROM runs")
+            ]
+        # runs that haven't written anything yet stay queued
+        folders = [
+            folder
+            for folder in folders
+            if os.path.exists(os.path.join(folder, "OSZICAR"))
+            or os.path.exists(os.path.join(folder, "OUTCAR"))
+        ]
+        labels = classifyRuns(folders, executor)
+
+        oszicars = [os.path.join(folder, "OSZICAR") for folder in folders]
+        present = [path for path in oszicars if os.path.exists(path)]
+        energies = dict(zip(present, executor.map(finalEnergy, present)))
+        for folder, path in zip(folders, oszicars):
+            self.record(
+                folder, commit=False, status=labels[folder], energy=energies.get(path)
+            )
+        self.conn.commit()
+        return len(folders)
+
+    def setAdsorptionEnergy(self, folder: str, energy: float):
+        self.record(folder, adsorption_energy=energy)
+
+    def _where(self, filters: dict):
+        for field in filters:
+            if field not in FIELDS:
+                print(
+                    f'{bcolors.FAIL}Can\'t query on "{field}", pick from {FIELDS}{bcolors.ENDC}'
+                )
+                raise ValueError
+        where = " AND ".join(f"{field} = ?" for field in filters)
+        return (f" WHERE {where}" if where else ""), list(filters.values())
+
+    def query(self, **filters):
+        """Rows (as dicts) matching every filter, ex: query(molecule="H2O", status="converged")"""
+        where, params = self._where(filters)
+        rows = self.conn.execute(f"SELECT * FROM runs{where}", params)
+        return [dict(row) for row in rows]
+
+    def dataFrame(self, **filters):
+        where, params = self._where(filters)
+        return pd.read_sql_query(f"SELECT * FROM runs{where}", self.conn, params=params)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def __contains__(self, folder):
+        row = self.conn.execute("SELECT 1 FROM runs WHERE folder = ?", (folder,))
+        return row.fetchone() is not None
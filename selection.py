@@ -0,0 +1,30 @@
+import numpy as np
+
+from constants import *
+
+
+def symbolLayerMask(slab, symbol: str, layers=(-1,), tolerance: float = 1e-1):
+    """
+    Boolean mask over `slab` for atoms of `symbol` sitting in the given z layers.
+    Layers are counted the same way as getSurfaceAtoms (-1 is the top layer of that symbol),
+    and np.flatnonzero(mask)[i] is the atom getSurfaceAtoms(symbol, i, slab, layer)[i] refers to
+    """
+    if isinstance(layers, int):
+        layers = (layers,)
+
+    of_symbol = np.asarray(slab.symbols == symbol)
+    if not of_symbol.any():
+        print(f'{bcolors.FAIL}Requested symbol: "{symbol}", is not found{bcolors.ENDC}')
+        raise ValueError
+
+    z = slab.positions[:, 2]
+    z_layers = np.unique(np.round(z[of_symbol], 3))
+
+    mask = np.zeros(len(slab), dtype=bool)
+    for layer in layers:
+        mask |= of_symbol & (np.abs(z - z_layers[layer]) < tolerance)
+    return mask
+
+
+def symbolLayerIndices(slab, symbol: str, layers=(-1,), tolerance: float = 1e-1):
+    return np.flatnonzero(symbolLayerMask(slab, symbol, layers, tolerance))
@@ -0,0 +1,197 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import Delaunay
+
+from constants import *
+from selection import symbolLayerIndices
+from tracing import count
+
+SITE_KINDS = ("top", "bridge", "hollow")
+SITE_CODES = {"top": "TOP", "bridge": "BRI", "hollow": "HOL"}
+# decimals of fractional coordinates, a site on a cell edge lands in one cell only
+ROUNDING = 6
+
+# least recently used slabs are dropped past this, a sweep over many relaxed CONTCARs
+# would otherwise keep the sites of every one of them
+MAX_CACHED_SLABS = 64
+
+_sites = OrderedDict()  # {(slab key, symbol, layer, tolerance): SurfaceSites}
+
+
+class SurfaceSites:
+    """
+    Adsorption sites of one surface layer, as arrays:
+    positions (n, 3): x, y and the mean z of the neighbours, xy is what overridePos takes
+    kinds (n,): "top", "bridge" or "hollow"
+    neighbors (n, 4): slab indices of the atoms the site sits on, -1 padded
+    (1 for top, 2 for bridge, 3 or 4 for hollow, 4 on a square lattice)
+    offsets (n, 4, 2): lattice vectors (a, b) of those neighbours, the atom a site sits on
+    can be the periodic image across the cell edge
+    """
+
+    __slots__ = ("positions", "kinds", "neighbors", "offsets")
+
+    def __init__(self, positions, kinds, neighbors, offsets):
+        self.positions = positions
+        self.kinds = kinds
+        self.neighbors = neighbors
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def labels(self):
+        # T0, T1, B0..., H0... numbered by kind in site order
+        counts = {kind: 0 for kind in SITE_KINDS}
+        labels = []
+        for kind in self.kinds:
+            labels.append(f"{kind[0].upper()}{counts[kind]}")
+            counts[kind] += 1
+        return np.array(labels)
+
+    def of(self, kind: str):
+        """Site indices of one kind"""
+        return np.flatnonzero(self.kinds == kind)
+
+    def xy(self, i: int):
+        """(x, y) of site i, ex: addAdsorbateCustom(..., overridePos=sites.xy(i))"""
+        return tuple(float(v) for v in self.positions[i, :2])
+
+    def neighborsOf(self, i: int):
+        return self.neighbors[i][self.neighbors[i] >= 0]
+
+    def __repr__(self):
+        counts = ", ".join(f"{len(self.of(kind))} {kind}" for kind in SITE_KINDS)
+        return f"SurfaceSites({counts})"
+
+
+def _circumcenters(points):
+    # (m, 3, 2) triangles -> (m, 2)
+    a, b, c = points[:, 0], points[:, 1], points[:, 2]
+    d = 2 * (
+        a[:, 0] * (b[:, 1] - c[:, 1])
+        + b[:, 0] * (c[:, 1] - a[:, 1])
+        + c[:, 0] * (a[:, 1] - b[:, 1])
+    )
+    a2, b2, c2 = (a**2).sum(1), (b**2).sum(1), (c**2).sum(1)
+    x = a2 * (b[:, 1] - c[:, 1]) + b2 * (c[:, 1] - a[:, 1]) + c2 * (a[:, 1] - b[:, 1])
+    y = a2 * (c[:, 0] - b[:, 0]) + b2 * (a[:, 0] - c[:, 0]) + c2 * (b[:, 0] - a[:, 0])
+    return np.column_stack([x / d, y / d])
+
+
+def findSurfaceSites(
+    slab, symbol: str = "O", layer: int = -1, tolerance: float = 1e-1, precision=1e-2
+):
+    """
+    Every top, bridge and hollow site of the `symbol` atoms in `layer` (counted like
+    getSurfaceAtoms). The layer and its 8 periodic images are Delaunay triangulated,
+    triangles sharing a circumcircle (within `precision` Å) are one hollow, so a square
+    lattice gives 4-fold hollows and its diagonals aren't bridges, and only the sites
+    inside the cell are kept. Not cached, see surfaceSites
+    """
+    indices = symbolLayerIndices(slab, symbol, (layer,), tolerance)
+    plane = np.asarray(slab.get_cell())[:2, :2]
+    frac = slab.get_scaled_positions(wrap=False)[indices, :2]
+    wrapShift = np.floor(np.round(frac, ROUNDING))
+
+    shifts = np.array([(a, b) for a in (-1, 0, 1) for b in (-1, 0, 1)])
+    points = ((frac - wrapShift)[None] + shifts[:, None]).reshape(-1, 2)
+    atomOf = np.tile(np.arange(len(indices)), len(shifts))
+    # lattice vector of every point relative to the slab atom it is an image of
+    offsetOf = np.repeat(shifts, len(indices), axis=0) - wrapShift[atomOf]
+    xy = points @ plane
+
+    triangulation = Delaunay(xy)
+    simplices = triangulation.simplices
+    centers = _circumcenters(xy[simplices])
+    # neighbouring triangles with the same circumcircle are one polygon
+    first = np.repeat(np.arange(len(simplices)), 3)
+    second = triangulation.neighbors.ravel()
+    same = second >= 0
+    same[same] = (
+        np.linalg.norm(centers[first[same]] - centers[second[same]], axis=1) < precision
+    )
+    graph = coo_matrix(
+        (np.ones(same.sum()), (first[same], second[same])),
+        shape=(len(simplices), len(simplices)),
+    )
+    _, group = connected_components(graph, directed=False)
+
+    candidates = [[i] for i in range(len(points))]
+    kinds = ["top"] * len(points)
+    bridges = {}
+    for g in range(group.max() + 1):
+        triangles = simplices[group == g]
+        candidates.append(sorted(set(triangles.ravel().tolist())))
+        kinds.append("hollow")
+        # edges shared by two triangles of the same hollow are its diagonals
+        edges = {}
+        for triangle in triangles.tolist():
+            for i, j in ((0, 1), (1, 2), (0, 2)):
+                edge = tuple(sorted((triangle[i], triangle[j])))
+                edges[edge] = edges.get(edge, 0) + 1
+        for edge, n in edges.items():
+            if n == 1:
+                bridges[edge] = True
+    for edge in bridges:
+        candidates.append(list(edge))
+        kinds.append("bridge")
+
+    width = max(len(c) for c in candidates)
+    rows = []
+    for kind, vertices in zip(kinds, candidates):
+        siteFrac = points[vertices].mean(axis=0)
+        cellShift = np.floor(np.round(siteFrac, ROUNDING))
+        if cellShift.any():
+            continue
+        rows.append((kind, vertices, siteFrac))
+
+    # top, bridge, hollow, then by position
+    rows.sort(
+        key=lambda row: (
+            SITE_KINDS.index(row[0]),
+            round(row[2][1], 4),
+            round(row[2][0], 4),
+        )
+    )
+    neighbors = np.full((len(rows), width), -1, dtype=np.int64)
+    offsets = np.zeros((len(rows), width, 2), dtype=np.int64)
+    positions = np.zeros((len(rows), 3))
+    for n, (kind, vertices, siteFrac) in enumerate(rows):
+        atoms = indices[atomOf[vertices]]
+        neighbors[n, : len(vertices)] = atoms
+        offsets[n, : len(vertices)] = offsetOf[vertices]
+        positions[n, :2] = siteFrac @ plane
+        positions[n, 2] = slab.positions[atoms, 2].mean()
+    kinds = np.array([row[0] for row in rows])
+    return SurfaceSites(positions, kinds, neighbors, offsets)
+
+
+def _slabKey(slab):
+    # exact geometry and order, neighbour indices depend on both
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(slab.get_cell()).tobytes())
+    sha.update(np.ascontiguousarray(slab.numbers).tobytes())
+    sha.update(np.ascontiguousarray(slab.positions).tobytes())
+    return sha.hexdigest()
+
+
+def surfaceSites(slab, symbol: str = "O", layer: int = -1, tolerance: float = 1e-1):
+    """
+    findSurfaceSites computed once per slab geometry, later calls reuse it. Keeps the
+    MAX_CACHED_SLABS most recently used ones
+    """
+    key = (_slabKey(slab), symbol, layer, tolerance)
+    if key in _sites:
+        count("site cache hits")
+        _sites.move_to_end(key)
+    else:
+        _sites[key] = findSurfaceSites(slab, symbol, layer, tolerance)
+        if len(_sites) > MAX_CACHED_SLABS:
+            _sites.popitem(last=False)
+    return _sites[key]
@@ -0,0 +1,250 @@
+import numpy as np
+from ase.constraints import FixAtoms
+
+from configurations import Configuration
+from constants import *
+from selection import symbolLayerIndices
+from sites import SurfaceSites, surfaceSites
+from vacancies import candidateSymmetryOps, iterVacancyCombinations
+
+
+def fixedMask(slab):
+    """Boolean mask of the atoms a FixAtoms constraint of `slab` holds in place"""
+    mask = np.zeros(len(slab), dtype=bool)
+    for constraint in slab.constraints:
+        if isinstance(constraint, FixAtoms):
+            mask[constraint.get_indices()] = True
+    return mask
+
+
+class UnitSites:
+    """
+    Site discovery on the unit cell slab, done once per (symbol, layers) and shared by
+    every supercell built from it: surface layer indices, symmetry operations/orbits of
+    those sites and the fixed atoms. supercell(3, 3) only tiles and broadcasts them
+    """
+
+    def __init__(self, slab, symprec: float = 1e-3):
+        self.slab = slab
+        self.symprec = symprec
+        self.fixed = fixedMask(slab)
+        self._layers = {}
+        self._ops = {}
+        self._supercells = {}
+
+    @staticmethod
+    def _key(symbol, layers):
+        return symbol, (layers,) if isinstance(layers, int) else tuple(layers)
+
+    def layerIndices(self, symbol: str = "O", layers=(-1,)):
+        """Unit cell indices of `symbol` atoms in `layers`, same as symbolLayerIndices"""
+        key = self._key(symbol, layers)
+        if key not in self._layers:
+            self._layers[key] = symbolLayerIndices(self.slab, symbol, key[1])
+        return self._layers[key]
+
+    def symmetryOps(self, symbol: str = "O", layers=(-1,)):
+        """(rotations, permutations, offsets) of the layer sites, see candidateSymmetryOps"""
+        key = self._key(symbol, layers)
+        if key not in self._ops:
+            self._ops[key] = candidateSymmetryOps(
+                self.slab, self.layerIndices(symbol, layers), self.symprec
+            )
+        return self._ops[key]
+
+    def orbits(self, symbol: str = "O", layers=(-1,)):
+        # orbit of every layer site, labelled by its smallest member
+        _, permutations, _ = self.symmetryOps(symbol, layers)
+        return permutations.min(axis=0)
+
+    def distinctSites(self, symbol: str = "O", layers=(-1,)):
+        """
+        One layer position per symmetry orbit, ex: the `index` of add_h/getSurfaceAtoms.
+        Supercells can lose some of these symmetries, see Supercell.distinctSites
+        """
+        return np.unique(self.orbits(symbol, layers))
+
+    def surfaceSites(self, symbol: str = "O", layer: int = -1):
+        """Top/bridge/hollow sites of the unit cell, see sites.surfaceSites"""
+        return surfaceSites(self.slab, symbol, layer)
+
+    def supercell(self, nx: int, ny: int):
+        if (nx, ny) not in self._supercells:
+            self._supercells[(nx, ny)] = Supercell(self, nx, ny)
+        return self._supercells[(nx, ny)]
+
+
+class Supercell:
+    """
+    The unit cell slab tiled nx x ny by ase (Atoms.repeat, tile by tile) with the map
+    between the two: siteMap[i, t] is the supercell index of unit atom i in tile t,
+    tile t = a * ny + b sits at a * cell[0] + b * cell[1]. Tile 0 keeps the unit cell
+    indices, so indices and getSurfaceAtoms positions of the unit cell stay valid
+    """
+
+    def __init__(self, unitSites: UnitSites, nx: int, ny: int):
+        if nx < 1 or ny < 1:
+            print(
+                f"{bcolors.FAIL}Supercell needs nx, ny >= 1, got {nx}, {ny}{bcolors.ENDC}"
+            )
+            raise ValueError
+        self.unitSites = unitSites
+        self.nx = nx
+        self.ny = ny
+        self.tiles = nx * ny
+        natoms = len(unitSites.slab)
+        self.siteMap = np.arange(natoms * self.tiles).reshape(self.tiles, natoms).T
+        self.unitIndex = np.tile(np.arange(natoms), self.tiles)
+        self.tileIndex = np.repeat(np.arange(self.tiles), natoms)
+        self.tileOffsets = np.stack(
+            np.divmod(np.arange(self.tiles), ny), axis=1
+        )  # (a, b) of every tile
+        self._atoms = None
+        self._permutations = {}
+
+    @property
+    def label(self):
+        # same "x2y2" cellLabel reads back from templates_W001_x2y2 / folder names
+        return f"x{self.nx}y{self.ny}"
+
+    @property
+    def atoms(self):
+        if self._atoms is None:
+            unit = self.unitSites.slab.copy()
+            unit.set_constraint()
+            atoms = unit.repeat((self.nx, self.ny, 1))
+            fixed = np.tile(self.unitSites.fixed, self.tiles)
+            if fixed.any():
+                atoms.set_constraint(FixAtoms(mask=fixed))
+            self._atoms = atoms
+        return self._atoms
+
+    def supercellIndices(self, unitIndices, tiles=None):
+        """Supercell indices of unit atoms in every tile (or `tiles`), tile by tile"""
+        columns = self.siteMap[np.asarray(unitIndices, dtype=int)]
+        if tiles is not None:
+            columns = columns[:, np.asarray(tiles, dtype=int)]
+        return columns.T.ravel()
+
+    def layerIndices(self, symbol: str = "O", layers=(-1,)):
+        """symbolLayerIndices of the supercell, from the unit cell ones"""
+        return self.supercellIndices(self.unitSites.layerIndices(symbol, layers))
+
+    def layerPosition(self, symbol: str, site: int, tile: int = 0, layers=(-1,)):
+        """Position in the supercell layer (the `index` of add_h) of unit layer `site` in `tile`"""
+        return tile * len(self.unitSites.layerIndices(symbol, layers)) + site
+
+    def keepsLattice(self, rotation):
+        # ex: a 90 degree rotation isn't a symmetry of a 2x1 supercell
+        size = np.array([self.nx, self.ny, 1])
+        return not np.any((rotation * size) % size[:, None])
+
+    def distinctSites(self, symbol: str = "O", layers=(-1,)):
+        """
+        One layer position per symmetry orbit of the supercell, all in the first tile.
+        The unit cell orbits when every unit cell operation keeps the nx x ny lattice,
+        else (ex: 2x1 of a square cell) from candidatePermutations, which can split them
+        """
+        rotations, _, _ = self.unitSites.symmetryOps(symbol, layers)
+        if all(self.keepsLattice(rotation) for rotation in rotations):
+            return self.unitSites.distinctSites(symbol, layers)
+        sites = len(self.unitSites.layerIndices(symbol, layers))
+        # the smallest image of a site is in the first tile, the translations get it there
+        permutations = self.candidatePermutations(symbol, layers)
+        return np.unique(permutations[:, :sites].min(axis=0))
+
+    def surfaceSites(self, symbol: str = "O", layer: int = -1):
+        """
+        The unit cell top/bridge/hollow sites repeated in every tile, tile by tile, with
+        their neighbours mapped to supercell atoms instead of triangulating the supercell
+        """
+        unit = self.unitSites.surfaceSites(symbol, layer)
+        plane = np.asarray(self.unitSites.slab.get_cell())[:2]
+        size = np.array([self.nx, self.ny])
+        present = unit.neighbors >= 0
+
+        positions, neighbors, offsets = [], [], []
+        for tile, shift in enumerate(self.tileOffsets):
+            moved = unit.positions.copy()
+            moved[:, :2] += shift @ plane[:, :2]
+            positions.append(moved)
+            # the tile a neighbour sits in, and the supercell image when it wraps around
+            cells = shift + unit.offsets
+            tiles = (cells[..., 0] % self.nx) * self.ny + cells[..., 1] % self.ny
+            mapped = self.siteMap[np.where(present, unit.neighbors, 0), tiles]
+            neighbors.append(np.where(present, mapped, -1))
+            offsets.append(np.where(present[..., None], cells // size, 0))
+
+        return SurfaceSites(
+            np.concatenate(positions),
+            np.tile(unit.kinds, self.tiles),
+            np.concatenate(neighbors),
+            np.concatenate(offsets),
+        )
+
+    def candidatePermutations(self, symbol: str = "O", layers=(-1,)):
+        """
+        candidateSymmetryPermutations of the supercell layer sites without running spglib
+        on the supercell: every unit cell operation that keeps the nx x ny lattice, composed
+        with every tile translation. Shape (n_ops, n_sites)
+        """
+        key = self.unitSites._key(symbol, layers)
+        if key in self._permutations:
+            return self._permutations[key]
+
+        rotations, permutations, offsets = self.unitSites.symmetryOps(symbol, layers)
+        sites = permutations.shape[1]
+        size = np.array([self.nx, self.ny, 1])
+        tiles = np.column_stack([self.tileOffsets, np.zeros(self.tiles, dtype=int)])
+        broadcast = []
+        for rotation, permutation, offset in zip(rotations, permutations, offsets):
+            if not self.keepsLattice(rotation):
+                continue
+            moved = tiles @ rotation.T
+            for shift in self.tileOffsets:
+                target = (moved[:, None, :2] + offset[None, :, :2] + shift) % size[:2]
+                tile = target[..., 0] * self.ny + target[..., 1]
+                broadcast.append((tile * sites + permutation[None, :]).ravel())
+
+        self._permutations[key] = np.unique(np.array(broadcast), axis=0)
+        return self._permutations[key]
+
+    def iterVacancyCombinations(
+        self,
+        symbol: str = "O",
+        maxVacancies: int = 1,
+        layers=(-1,),
+        minDistance: float = 0.0,
+        symmetry=True,
+    ):
+        """iterVacancyCombinations of the supercell with the broadcast sites and symmetry"""
+        return iterVacancyCombinations(
+            self.atoms,
+            symbol,
+            maxVacancies,
+            layers,
+            minDistance,
+            symmetry,
+            candidates=self.layerIndices(symbol, layers),
+            permutations=(
+                self.candidatePermutations(symbol, layers) if symmetry else None
+            ),
+        )
+
+    def iterVacancyConfigurations(
+        self,
+        symbol: str = "O",
+        maxVacancies: int = 1,
+        layers=(-1,),
+        minDistance: float = 0.0,
+        symmetry=True,
+    ):
+        for removed in self.iterVacancyCombinations(
+            symbol, maxVacancies, layers, minDistance, symmetry
+        ):
+            yield Configuration(self.atoms, removed)
+
+
+def buildSupercell(slab, nx: int, ny: int, symprec: float = 1e-3):
+    """Supercell of a unit cell slab, ex: buildSupercell(slab, 2, 2).atoms ~ large_slab"""
+    return UnitSites(slab, symprec).supercell(nx, ny)
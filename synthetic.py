@@ -0,0 +1,680 @@
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+from ase import Atoms
+from ase.build import molecule
+from ase.constraints import FixAtoms
+from ase.io import write
+
+from constants import *
+
+WO3_A = 3.79  # Å, cubic WO3
+# rough per atom/molecule energies (eV) so every adsorption energy lands in a sane range
+ATOM_ENERGY = {"W": -13.0, "O": -7.1, "H": -3.4, "N": -8.3}
+REFERENCE_ENERGY = {
+    "O": -1.5,
+    "O2": -9.86,
+    "NO": -12.2,
+    "N2O": -20.8,
+    "N": -3.12,
+    "N2": -16.63,
+    "H2O": -14.22,
+    "H2": -6.77,
+    "H": -1.11,
+}
+VALENCE = {"W": 14.0, "O": 6.0, "H": 1.0, "N": 5.0}  # same ZVALs as energies.py
+BADER_TRANSFER = {"W": -2.9, "O": 1.0, "H": -0.6, "N": 0.3}
+ORBITALS = ["s", "py", "pz", "px", "dxy", "dyz", "dz2", "dxz", "x2-y2"]
+
+SLAB_FILES = {
+    # file main.setup() reads: supercell multiple of the workspace slab
+    "CNST_CONTCAR_WO3_T": 1,
+    "CNST_CONTCAR_WO3_M": 2,
+    "CNST_CONTCAR_WO3_L": 3,
+    "backupPSCR": 1,
+}
+
+INCAR_TEMPLATE = """SYSTEM = synthetic WO3
+ENCUT = 520
+ISMEAR = 0
+SIGMA = 0.05
+EDIFF = 1E-5
+EDIFFG = -0.05
+IBRION = 2
+ISIF = 2
+NSW = {nsw}
+NELM = 60
+LORBIT = 11
+"""
+
+
+def wo3Slab(nx: int, ny: int, layers: int = 4, vacuum: float = 15.0):
+    """
+    WO3(001)-like slab, nx x ny cubic cells with layers WO2 + O layers, O terminated,
+    bottom two layers fixed like the slabs of the real sweeps
+    """
+    a = WO3_A
+    cell = [
+        (0, 0, 0, "W"),
+        (0.5, 0, 0, "O"),
+        (0, 0.5, 0, "O"),
+        (0, 0, 0.5, "O"),
+    ]
+    symbols = []
+    positions = []
+    for k in range(layers):
+        for i in range(nx):
+            for j in range(ny):
+                for x, y, z, symbol in cell:
+                    symbols.append(symbol)
+                    positions.append(((i + x) * a, (j + y) * a, (k + z) * a))
+    # periodic in plane, the spglib orbits and minimum image distances rely on it
+    slab = Atoms(
+        symbols,
+        positions=positions,
+        cell=[nx * a, ny * a, layers * a + vacuum],
+        pbc=(True, True, False),
+    )
+    slab.center(vacuum / 2, axis=2)
+    z = slab.positions[:, 2]
+    bottom = np.unique(np.round(z, 3))[:2]
+    slab.set_constraint(FixAtoms(mask=np.isin(np.round(z, 3), bottom)))
+    return slab
+
+
+def layerSites(slab, symbol: str = "O", layer: int = -1):
+    # indices of symbol in one z layer (-1 = top), same 1e-1 tolerance as getSurfaceAtoms
+    indices = np.where(slab.symbols == symbol)[0]
+    z = slab.positions[indices, 2]
+    layers = np.unique(np.round(z, 3))
+    return indices[np.abs(z - layers[layer]) < 1e-1]
+
+
+def slabEnergy(atoms):
+    return float(sum(ATOM_ENERGY[symbol] for symbol in atoms.get_chemical_symbols()))
+
+
+def writeOszicar(
+    path: str, steps: int, electronicSteps: int = 5, final: float = None, seed: int = 0
+):
+    """
+    OSZICAR of a relaxation: steps ionic steps of electronicSteps DAV: lines each,
+    F going down to final (random if None). Returns final
+    """
+    rng = np.random.default_rng(seed)
+    if final is None:
+        final = -400.0 - 10 * rng.random()
+    # relaxes like 1/x towards final, a bit of noise on top
+    energies = final + 0.5 / np.arange(1, steps + 1) - 0.5 / steps
+    energies[:-1] += 1e-4 * rng.random(steps - 1)
+    with open(path, "w") as f:
+        f.write(
+            "       N       E                     dE             d eps       ncg     rms          rms(c)\n"
+        )
+        for step, energy in enumerate(energies, 1):
+            for n in range(1, electronicSteps + 1):
+                f.write(
+                    f"DAV: {n:3d}   {energy + 1e-2 / n:.12E}   {-1e-3 / n:.5E}   {-1e-4 / n:.5E}  1024   {1e-2 / n:.3E}\n"
+                )
+            f.write(
+                f"{step:4d} F= {energy:.8E} E0= {energy + 1e-3:.8E}  d E ={-1e-3:.6E}  mag=     0.0000\n"
+            )
+    return final
+
+
+def writeOutcar(
+    path: str,
+    atoms,
+    steps: int,
+    electronicSteps: int = 5,
+    final: float = 0.0,
+    converged: bool = True,
+    seed: int = 0,
+):
+    """
+    The parts of an OUTCAR outcar.scanOutcar reads: NIONS, LOOP:/LOOP+ lines (LOOP+ times
+    12 + step / 2 cpu, 0.5 s more real), magnetization lines (step / 10 + 0.1 / electronic
+    step), a force block, TOTEN and energy(sigma->0) per ionic step, then the accuracy
+    message (converged only) and the timing footer. The free atoms' max force goes down to 0.02 eV/Å, 0.2 when not
+    converged, against EDIFFG = -0.05 of INCAR_TEMPLATE. Fixed atoms keep 1 eV/Å
+    """
+    rng = np.random.default_rng(seed)
+    free = np.ones(len(atoms), dtype=bool)
+    for constraint in atoms.constraints:
+        if isinstance(constraint, FixAtoms):
+            free[constraint.index] = False
+    directions = rng.standard_normal((len(atoms), 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    target = 0.02 if converged else 0.2
+    energies = final + 0.5 / np.arange(1, steps + 1) - 0.5 / steps
+    magnetization = np.arange(1, steps + 1) / 10
+    electrons = sum(VALENCE[symbol] for symbol in atoms.get_chemical_symbols())
+    with open(path, "w") as f:
+        f.write(
+            f"   number of dos      NEDOS =    301   number of ions     NIONS = {len(atoms):6d}\n"
+        )
+        for step, energy in enumerate(energies, 1):
+            for n in range(1, electronicSteps + 1):
+                f.write(
+                    f" number of electron     {electrons:.7f} magnetization {magnetization[step - 1] + 0.1 / n:12.7f}\n"
+                )
+                f.write(f"      LOOP:  cpu time      1.0{n}: real time      1.1{n}\n")
+            norms = np.where(free, target + 1.0 / step - 1.0 / steps, 1.0)
+            norms[free] *= 1 - 0.5 * rng.random(free.sum())
+            norms[np.flatnonzero(free)[:1]] = target + 1.0 / step - 1.0 / steps
+            forces = directions * norms[:, None]
+            f.write(
+                " POSITION                                       TOTAL-FORCE (eV/Angst)\n"
+            )
+            f.write(" " + "-" * 83 + "\n")
+            for position, force in zip(atoms.positions, forces):
+                f.write(
+                    "".join(f"{v:13.5f}" for v in position)
+                    + "    "
+                    + "".join(f"{v:14.6f}" for v in force)
+                    + "\n"
+                )
+            f.write(" " + "-" * 83 + "\n")
+            f.write(f"  free  energy   TOTEN  =     {energy:.8f} eV\n\n")
+            f.write(
+                f"  energy  without entropy=     {energy:.8f}  energy(sigma->0) =     {energy + 1e-3:.8f}\n"
+            )
+            # the per ion table the magnetization search has to skip
+            f.write(
+                " magnetization (x)\n\n# of ion       s       p       d       tot\n"
+            )
+            f.write("    1        0.000   0.000   0.010   0.010\n")
+            f.write(
+                f"     LOOP+:  cpu time {12 + 0.5 * step:9.2f}: real time {12.5 + 0.5 * step:9.2f}\n"
+            )
+        if converged:
+            f.write(
+                " reached required accuracy - stopping structural energy minimisation\n"
+            )
+        f.write(" General timing and accounting informations for this job:\n")
+
+
+def writeAcf(path: str, atoms, seed: int = 0):
+    """Bader ACF.dat of atoms, charges = valence + a typical transfer + noise"""
+    rng = np.random.default_rng(seed)
+    rule = " " + "-" * 80 + "\n"
+    with open(path, "w") as f:
+        f.write(
+            "    #         X           Y           Z       CHARGE      MIN DIST   ATOMIC VOL\n"
+        )
+        f.write(rule)
+        total = 0.0
+        for i, atom in enumerate(atoms, 1):
+            charge = (
+                VALENCE[atom.symbol]
+                + BADER_TRANSFER[atom.symbol]
+                + 0.05 * rng.standard_normal()
+            )
+            total += charge
+            x, y, z = atom.position
+            f.write(
+                f" {i:4d} {x:11.4f} {y:11.4f} {z:11.4f} {charge:11.4f} {0.8 + 0.4 * rng.random():11.4f} {10 + 5 * rng.random():11.4f}\n"
+            )
+        f.write(rule)
+        f.write("    VACUUM CHARGE:               0.0000\n")
+        f.write("    VACUUM VOLUME:               0.0000\n")
+        f.write(f"    NUMBER OF ELECTRONS:       {total:10.4f}\n")
+
+
+def _varray(name: str, rows, fmt: str = "{:16.8f}", type: str = None):
+    kind = f' type="{type}"' if type else ""
+    lines = [f'   <varray name="{name}"{kind} >']
+    for row in rows:
+        lines.append("    <v>" + " ".join(fmt.format(v) for v in row) + " </v>")
+    lines.append("   </varray>")
+    return "\n".join(lines)
+
+
+def _structureXml(name: str, atoms):
+    fixed = np.zeros(len(atoms), dtype=bool)
+    for constraint in atoms.constraints:
+        if isinstance(constraint, FixAtoms):
+            fixed[constraint.index] = True
+    selective = [["F" if f else "T"] * 3 for f in fixed]
+    return "\n".join(
+        [
+            f' <structure name="{name}" >',
+            "  <crystal>",
+            _varray("basis", atoms.cell.array),
+            f'   <i name="volume">{atoms.get_volume():16.8f} </i>',
+            "  </crystal>",
+            _varray("positions", atoms.get_scaled_positions(wrap=False)),
+            _varray("selective", selective, "{:>2}", "logical"),
+            " </structure>",
+        ]
+    )
+
+
+def _bands(energies, symbol: str, rng):
+    # pdos of one atom (9 lm orbitals): O 2p below the gap, W 5d split around it
+    gauss = lambda center, width, weight: weight * np.exp(
+        -(((energies - center) / width) ** 2)
+    )
+    pdos = np.zeros((len(energies), len(ORBITALS)))
+    shift = 0.1 * rng.standard_normal()
+    if symbol == "O":
+        pdos[:, 1:4] = gauss(-3.5 + shift, 1.2, 0.3)[:, None]
+    elif symbol == "W":
+        pdos[:, 4:9] = (gauss(-4.0 + shift, 1.0, 0.05) + gauss(2.5 + shift, 1.0, 0.4))[
+            :, None
+        ]
+    else:
+        pdos[:, 0] = gauss(-6.0 + shift, 0.8, 0.3)
+        pdos[:, 1:4] = gauss(-2.0 + shift, 1.0, 0.1)[:, None]
+    return pdos
+
+
+def writeVasprun(
+    path: str, atoms, energy: float, efermi: float = 0.0, nedos: int = 301, seed=0
+):
+    """
+    vasprun.xml with one ionic step and an lm decomposed (LORBIT = 11) DOS, enough for
+    pymatgen's Vasprun and loadProjectedDos. nedos sets the size, ~20 kB per atom at 301
+    """
+    rng = np.random.default_rng(seed)
+    symbols = atoms.get_chemical_symbols()
+    species = list(dict.fromkeys(symbols))
+    energies = np.linspace(efermi - 10, efermi + 6, nedos)
+
+    pdos = [_bands(energies, symbol, rng) for symbol in symbols]
+    total = np.sum(pdos, axis=0).sum(axis=1)
+    integrated = np.cumsum(total) * (energies[1] - energies[0])
+
+    out = [
+        '<?xml version="1.0" encoding="ISO-8859-1"?>',
+        "<modeling>",
+        " <generator>",
+        '  <i name="program" type="string">vasp </i>',
+        '  <i name="version" type="string">6.3.0  </i>',
+        " </generator>",
+        " <incar>",
+        '  <i type="string" name="SYSTEM">synthetic WO3</i>',
+        '  <i type="int" name="ISPIN">     1</i>',
+        '  <i type="int" name="LORBIT">    11</i>',
+        '  <i type="int" name="NEDOS">   ' + str(nedos) + "</i>",
+        " </incar>",
+        " <kpoints>",
+        '  <generation param="Gamma">',
+        '   <v type="int" name="divisions">       1        1        1 </v>',
+        " </generation>",
+        _varray("kpointlist", [[0, 0, 0]]),
+        _varray("weights", [[1]]),
+        " </kpoints>",
+        " <parameters>",
+        '  <separator name="electronic" >',
+        '   <i type="int" name="ISPIN">     1</i>',
+        '   <i name="NELECT">' + f"{sum(VALENCE[s] for s in symbols):16.8f}" + "</i>",
+        '   <i type="int" name="NELM">    60</i>',
+        '   <i name="EDIFF">      0.00001000</i>',
+        "  </separator>",
+        '  <separator name="ionic" >',
+        '   <i type="int" name="NSW">     1</i>',
+        '   <i type="int" name="IBRION">     2</i>',
+        '   <i name="EDIFFG">     -0.05000000</i>',
+        "  </separator>",
+        '  <i type="int" name="NEDOS">   ' + str(nedos) + "</i>",
+        '  <i type="int" name="LORBIT">    11</i>',
+        " </parameters>",
+        " <atominfo>",
+        f"  <atoms>{len(atoms)}</atoms>",
+        f"  <types>{len(species)}</types>",
+        '  <array name="atoms" >',
+        '   <dimension dim="1">ion</dimension>',
+        '   <field type="string">element</field>',
+        '   <field type="int">atomtype</field>',
+        "   <set>",
+    ]
+    for symbol in symbols:
+        out.append(
+            f"    <rc><c>{symbol:2s}</c><c>{species.index(symbol) + 1:4d}</c></rc>"
+        )
+    out += [
+        "   </set>",
+        "  </array>",
+        '  <array name="atomtypes" >',
+        '   <dimension dim="1">type</dimension>',
+        '   <field type="int">atomspertype</field>',
+        '   <field type="string">element</field>',
+        "   <field>mass</field>",
+        "   <field>valence</field>",
+        '   <field type="string">pseudopotential</field>',
+        "   <set>",
+    ]
+    for symbol in species:
+        out.append(
+            f"    <rc><c>{symbols.count(symbol):4d}</c><c>{symbol:2s}</c><c>1.0</c>"
+            f"<c>{VALENCE[symbol]:.1f}</c><c>  PAW_PBE {escape(symbol)} 08Apr2002</c></rc>"
+        )
+    out += [
+        "   </set>",
+        "  </array>",
+        " </atominfo>",
+        _structureXml("initialpos", atoms),
+        " <calculation>",
+        "  <scstep>",
+        "   <energy>",
+        f'    <i name="e_fr_energy">{energy:16.8f} </i>',
+        f'    <i name="e_0_energy">{energy:16.8f} </i>',
+        "   </energy>",
+        "  </scstep>",
+        _structureXml("", atoms).replace(' name=""', ""),
+        _varray("forces", np.zeros((len(atoms), 3))),
+        "  <energy>",
+        f'   <i name="e_fr_energy">{energy:16.8f} </i>',
+        f'   <i name="e_wo_entrp">{energy:16.8f} </i>',
+        f'   <i name="e_0_energy">{energy:16.8f} </i>',
+        "  </energy>",
+        "  <dos>",
+        f'   <i name="efermi">{efermi:16.8f} </i>',
+        "   <total>",
+        "    <array>",
+        '     <dimension dim="1">gridpoints</dimension>',
+        '     <dimension dim="2">spin</dimension>',
+        "     <field>energy</field>",
+        "     <field>total</field>",
+        "     <field>integrated</field>",
+        "     <set>",
+        '      <set comment="spin 1">',
+    ]
+    for e, t, i in zip(energies, total, integrated):
+        out.append(f"       <r> {e:10.4f} {t:10.4f} {i:10.4f} </r>")
+    out += [
+        "      </set>",
+        "     </set>",
+        "    </array>",
+        "   </total>",
+        "   <partial>",
+        "    <array>",
+        '     <dimension dim="1">gridpoints</dimension>',
+        '     <dimension dim="2">spin</dimension>',
+        '     <dimension dim="3">ion</dimension>',
+        "     <field>energy</field>",
+    ]
+    out += [f"     <field>{orbital:>6s}</field>" for orbital in ORBITALS]
+    out.append("     <set>")
+    for i, atomDos in enumerate(pdos, 1):
+        out += [f'      <set comment="ion {i}">', '       <set comment="spin 1">']
+        for e, row in zip(energies, atomDos):
+            out.append(
+                f"        <r> {e:10.4f} " + " ".join(f"{v:7.4f}" for v in row) + " </r>"
+            )
+        out += ["       </set>", "      </set>"]
+    out += [
+        "     </set>",
+        "    </array>",
+        "   </partial>",
+        "  </dos>",
+        " </calculation>",
+        _structureXml("finalpos", atoms),
+        "</modeling>",
+        "",
+    ]
+    with open(path, "w") as f:
+        f.write("\n".join(out))
+
+
+def relaxed(atoms, seed: int = 0, amplitude: float = 0.05):
+    # "CONTCAR": free atoms moved a little, fixed ones left where they are
+    rng = np.random.default_rng(seed)
+    final = atoms.copy()
+    free = np.ones(len(atoms), dtype=bool)
+    for constraint in atoms.constraints:
+        if isinstance(constraint, FixAtoms):
+            free[constraint.index] = False
+    positions = final.get_positions()
+    positions[free] += amplitude * rng.standard_normal((free.sum(), 3))
+    final.set_positions(positions)
+    return final
+
+
+def writeRun(
+    folder: str,
+    atoms,
+    energy: float,
+    steps: int = 20,
+    converged: bool = True,
+    vasprun: bool = False,
+    nedos: int = 301,
+    outcar: bool = True,
+    seed: int = 0,
+):
+    """
+    One run folder as VASP leaves it: INCAR, POSCAR, CONTCAR, OSZICAR, OUTCAR, ACF.dat and
+    optionally vasprun.xml. Unconverged runs stop at NSW, ionically unconverged for
+    convergence.classifyRun (without the OUTCAR it can only say unverified)
+    """
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "INCAR"), "w") as f:
+        f.write(INCAR_TEMPLATE.format(nsw=steps + 50 if converged else steps))
+    final = relaxed(atoms, seed)
+    write(os.path.join(folder, "POSCAR"), atoms, format="vasp", direct=True)
+    write(os.path.join(folder, "CONTCAR"), final, format="vasp", direct=True)
+    writeOszicar(os.path.join(folder, "OSZICAR"), steps, final=energy, seed=seed)
+    if outcar:
+        outcarPath = os.path.join(folder, "OUTCAR")
+        writeOutcar(
+            outcarPath, atoms, steps, final=energy, converged=converged, seed=seed
+        )
+    writeAcf(os.path.join(folder, "ACF.dat"), final, seed)
+    if vasprun:
+        writeVasprun(
+            os.path.join(folder, "vasprun.xml"), final, energy, nedos=nedos, seed=seed
+        )
+
+
+def adsorb(slab, adsorbate: str, index: int, height: float, vacancy: bool = False):
+    """
+    slab with adsorbate height Å above top layer O number index, or in its place
+    (vacancy=True, the O is removed first) like add_h2o_vacancy/add_n2_vacancy
+    """
+    slab = slab.copy()
+    sites = layerSites(slab, "O")
+    site = slab.positions[sites[index % len(sites)]].copy()
+    if vacancy:
+        del slab[int(sites[index % len(sites)])]
+    mol = Atoms(adsorbate) if len(adsorbate) == 1 else molecule(adsorbate)
+    mol.translate(site + [0, 0, height] - mol.positions[np.argmin(mol.positions[:, 2])])
+    constraints = slab.constraints
+    slab.set_constraint()
+    slab += mol
+    slab.set_constraint(constraints)
+    return slab
+
+
+def referenceOszicars():
+    """Every OSZICAR of energies.REFERENCE_RUNS, relative to POSTOUTPUT"""
+    with open(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "energies.py")
+    ) as f:
+        return sorted(set(re.findall(r'f"\{OUTPUT_DIR\}/([^"]+)"', f.read())))
+
+
+def _referenceEnergy(name: str, slabE: float):
+    # POSTOUTPUT/OSZICAR_H2O -> H2O molecule, OSZICAR_WO3_V_O0 -> slab - O, the rest slab + ...
+    base = os.path.basename(name).replace("OSZICAR_", "")
+    if base in REFERENCE_ENERGY:
+        return REFERENCE_ENERGY[base]
+    if base == "WO3":
+        return slabE
+    if base.startswith("WO3_V"):
+        return slabE - ATOM_ENERGY["O"] + 2.0
+    return slabE - 5.0
+
+
+def _collect(root: str, kind: str, trees, archive: bool):
+    """
+    POSTOUTPUT/POSTCONTCAR/POSTVASPRUN the way the examples read them:
+    {POSTx}/{tree}_{KIND}/{KIND}_{run} flattened, or cp_util.sh zips of {tree}_{KIND}/{run}/{KIND}
+    """
+    post = {
+        "OSZICAR": "POSTOUTPUT",
+        "CONTCAR": "POSTCONTCAR",
+        "vasprun.xml": "POSTVASPRUN",
+    }
+    label = {"OSZICAR": "OSZICAR", "CONTCAR": "CONTCAR", "vasprun.xml": "VASPRUN"}[kind]
+    prefix = {"OSZICAR": "OSZICAR", "CONTCAR": "CONTCAR", "vasprun.xml": "vasprun"}[
+        kind
+    ]
+    written = set()
+    for tree, runs in trees.items():
+        name = tree.replace("/", "_")
+        if archive:
+            # one zip per top folder, ex: H_OSZICAR.zip with H_OSZICAR/1stLayer/O0/OSZICAR
+            top = tree.split("/")[0]
+            zipPath = os.path.join(root, post[kind], f"{top}_{label}.zip")
+            os.makedirs(os.path.dirname(zipPath), exist_ok=True)
+            mode = "a" if zipPath in written else "w"
+            written.add(zipPath)
+            with zipfile.ZipFile(zipPath, mode, zipfile.ZIP_DEFLATED) as z:
+                for run in runs:
+                    src = os.path.join(root, tree, run, kind)
+                    if os.path.exists(src):
+                        inner = os.path.relpath(os.path.join(tree, run), top)
+                        z.write(src, f"{top}_{label}/{inner}/{kind}")
+            continue
+        folder = os.path.join(root, post[kind], f"{name}_{label}")
+        os.makedirs(folder, exist_ok=True)
+        for run in runs:
+            src = os.path.join(root, tree, run, kind)
+            if os.path.exists(src):
+                dst = os.path.join(folder, f"{prefix}_{run}")
+                if os.path.exists(dst):
+                    os.remove(dst)
+                os.link(src, dst)
+
+
+def syntheticWorkspace(
+    root: str,
+    nx: int = 2,
+    ny: int = 2,
+    layers: int = 4,
+    sites: int = 3,
+    hLayers: int = 2,
+    steps: int = 20,
+    unconverged: float = 0.0,
+    vasprun: bool = False,
+    nedos: int = 301,
+    archive: bool = False,
+    outcar: bool = True,
+    seed: int = 0,
+):
+    """
+    The README's "Local Workspace" with fake but well formed VASP output, ex:
+    syntheticWorkspace("/tmp/ws", nx=4, ny=4, sites=16, steps=200) -> os.chdir("/tmp/ws")
+    - H/{1st,2nd,...}Layer/O{i}, H2O/V-O{i}-OD, N2/V-O{i}-UPR, surface_v/O{i} runs
+      (sites runs per folder, hLayers H layer folders deep)
+    - the POSTOUTPUT reference OSZICARs energies.py reads, POSTOUTPUT/POSTCONTCAR
+      (and POSTVASPRUN with vasprun=True) collections of every tree, flat or zipped
+    - the slabs, acf.dat and templates main.setup() reads / generation needs
+    unconverged is the fraction of runs stopped at NSW, outcar=False leaves the OUTCARs
+    out (convergence labels are then unverified). Returns {tree: [run folders]}
+    """
+    rng = np.random.default_rng(seed)
+    # the energies.py references average the O0-O2 runs of H/1stLayer, H2O and N2
+    sites = max(sites, 3)
+    slab = wo3Slab(nx, ny, layers)
+    slabE = slabEnergy(slab)
+    os.makedirs(root, exist_ok=True)
+
+    ordinal = (
+        lambda n: f"{n}{'st' if n == 1 else 'nd' if n == 2 else 'rd' if n == 3 else 'th'}"
+    )
+    trees = {}
+    for layer in range(1, hLayers + 1):
+        trees[f"H/{ordinal(layer)}Layer"] = [
+            (f"O{i}", adsorb(slab, "H", i, 1.0), "H", False) for i in range(sites)
+        ]
+    trees["H2O"] = [
+        (f"V-O{i}-OD", adsorb(slab, "H2O", i, 0.5, vacancy=True), "H2O", True)
+        for i in range(sites)
+    ]
+    trees["N2"] = [
+        (f"V-O{i}-UPR", adsorb(slab, "N2", i, 0.5, vacancy=True), "N2", True)
+        for i in range(sites)
+    ]
+    trees["surface_v"] = []
+    for i in range(sites):
+        vacant = slab.copy()
+        del vacant[int(layerSites(vacant, "O")[i % len(layerSites(vacant, "O"))])]
+        trees["surface_v"].append((f"O{i}", vacant, None, True))
+
+    runs = {}
+    for tree, items in trees.items():
+        runs[tree] = []
+        for name, atoms, adsorbate, vacancy in items:
+            reference = slabE - ATOM_ENERGY["O"] + 2.0 if vacancy else slabE
+            energy = reference + rng.uniform(-1.5, 0.5)
+            if adsorbate:
+                energy += REFERENCE_ENERGY[adsorbate]
+            writeRun(
+                os.path.join(root, tree, name),
+                atoms,
+                energy,
+                steps=steps,
+                converged=rng.random() >= unconverged,
+                vasprun=vasprun,
+                nedos=nedos,
+                outcar=outcar,
+                seed=int(rng.integers(1 << 31)),
+            )
+            runs[tree].append(name)
+
+    for kind in ("OSZICAR", "CONTCAR") + (("vasprun.xml",) if vasprun else ()):
+        _collect(root, kind, runs, archive)
+
+    # reference runs of energies.py, the ones that are runs of a tree are there already
+    for name in referenceOszicars():
+        path = os.path.join(root, OUTPUT_DIR, name)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writeOszicar(
+            path,
+            3,
+            final=_referenceEnergy(name, slabE),
+            seed=int(rng.integers(1 << 31)),
+        )
+
+    # slabs main.setup() reads, with the acf.dat of the first one
+    for fileName, multiple in SLAB_FILES.items():
+        big = wo3Slab(nx * multiple, ny * multiple, layers)
+        write(os.path.join(root, fileName), big, format="vasp", direct=True)
+    write(
+        os.path.join(root, "CNST_CONTCAR_EMPTY"),
+        # one placeholder atom, generateAdsorbentInVacuum pops it
+        Atoms("H", positions=[slab.cell.sum(axis=0) / 2], cell=slab.cell, pbc=True),
+        format="vasp",
+    )
+    writeAcf(os.path.join(root, "acf.dat"), slab, seed)
+
+    # templates generateSimulationFolders copies, and the rest of the README tree
+    for template, multiple in (
+        ("templates_W001", 1),
+        ("templates_W001_x2y2", 2),
+        ("templates_adsorbate", 4),
+    ):
+        folder = os.path.join(root, template)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "INCAR"), "w") as f:
+            f.write(INCAR_TEMPLATE.format(nsw=500))
+        with open(os.path.join(folder, "KPOINTS"), "w") as f:
+            f.write(f"Automatic\n0\nGamma\n{4 // multiple} {4 // multiple} 1\n0 0 0\n")
+        with open(os.path.join(folder, "POTCAR"), "w") as f:
+            f.write("synthetic POTCAR placeholder\n")
+        with open(os.path.join(folder, "gpu.slurm"), "w") as f:
+            f.write("#!/bin/bash\n#SBATCH --job-name=synthetic\nsrun vasp_std\n")
+    for folder in ("adsorbates", "data", "images", "notebooks", "surface"):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    return {
+        tree: [os.path.join(root, tree, name) for name in names]
+        for tree, names in runs.items()
+    }
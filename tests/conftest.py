@@ -0,0 +1,11 @@
+import os
+import sys
+
+# the modules are top level scripts next to main.py, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "mpi: runs scripts under mpirun, skipped without mpirun/mpi4py"
+    )
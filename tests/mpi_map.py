@@ -0,0 +1,37 @@
+"""
+Run under mpirun, not collected by pytest: mpirun -np 4 python tests/mpi_map.py <folder>
+MPIExecutor.map has to give every rank the same, ordered results, with the work spread
+over all ranks, and isRoot/barrier have to make once-only side effects visible to all
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from executors import MPIExecutor, isRoot
+
+
+def square(item):
+    return item * item, MPIExecutor().rank
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1]
+    executor = MPIExecutor()
+    results = executor.map(square, range(37), chunkSize=3)
+
+    assert [value for value, _ in results] == [item * item for item in range(37)]
+    assert {rank for _, rank in results} == set(range(executor.workers))
+    # the broadcast: every rank holds the same list
+    assert all(other == results for other in executor.comm.allgather(results))
+
+    marker = os.path.join(folder, "root")
+    if isRoot(executor):
+        with open(marker, "w") as f:
+            f.write(str(executor.rank))
+    executor.barrier()
+    with open(marker) as f:
+        assert f.read() == "0"
+
+    print(f"ok {executor.rank}/{executor.workers}")
@@ -0,0 +1,81 @@
+import os
+import zipfile
+
+import pytest
+from ase.io import write
+
+from archives import listResults, readResultAtoms, tailResult
+from energies import readOszicarFileAndGetLastLineEnergy
+from results import finalEnergy
+from synthetic import wo3Slab, writeOszicar
+
+# run: ionic steps of its OSZICAR, O1 is shorter than most of the tails asked for
+RUNS = {"O0": 100, "O1": 1}
+
+
+def _cpUtil(root, source="H", fileType="OSZICAR"):
+    # same layout as `bash cp_util.sh`: {source}_{fileType}.zip holding
+    # {source}_{fileType}/{relative run folder}/{fileType}, folders listed too (zip -r)
+    dest = f"{source}_{fileType}"
+    zipPath = os.path.join(root, f"{dest}.zip")
+    with zipfile.ZipFile(zipPath, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(f"{dest}/", "")
+        for dirpath, dirnames, filenames in sorted(os.walk(os.path.join(root, source))):
+            rel = os.path.relpath(dirpath, os.path.join(root, source))
+            if rel != ".":
+                z.writestr(f"{dest}/{rel}/", "")
+            if fileType in filenames:
+                z.write(os.path.join(dirpath, fileType), f"{dest}/{rel}/{fileType}")
+    return zipPath
+
+
+@pytest.fixture
+def archived(tmp_path):
+    finals = {}
+    for run, steps in RUNS.items():
+        folder = tmp_path / "H" / "1stLayer" / run
+        os.makedirs(folder)
+        finals[run] = writeOszicar(str(folder / "OSZICAR"), steps, seed=steps)
+        write(str(folder / "CONTCAR"), wo3Slab(1, 1), format="vasp", direct=True)
+    zipPath = _cpUtil(str(tmp_path))
+    _cpUtil(str(tmp_path), fileType="CONTCAR")
+    return tmp_path, zipPath, finals
+
+
+@pytest.mark.parametrize("run", list(RUNS))
+@pytest.mark.parametrize("n", [1, 3, 50, 100, 1000])
+def test_tail_matches_plain_file(archived, run, n):
+    root, zipPath, _ = archived
+    plain = str(root / "H" / "1stLayer" / run / "OSZICAR")
+    with open(plain) as f:
+        expected = f.readlines()[-n:]
+
+    assert tailResult(plain, n) == expected
+    assert tailResult(f"{zipPath}/1stLayer/{run}/OSZICAR", n) == expected
+    assert tailResult(f"{zipPath}/1stLayer/OSZICAR_{run}", n) == expected
+
+
+@pytest.mark.parametrize("run", list(RUNS))
+def test_energy_matches_plain_file(archived, run):
+    root, zipPath, finals = archived
+    plain = str(root / "H" / "1stLayer" / run / "OSZICAR")
+    archivedPath = f"{zipPath}/1stLayer/OSZICAR_{run}"
+
+    energy = readOszicarFileAndGetLastLineEnergy(plain)
+    assert energy == pytest.approx(finals[run])
+    assert readOszicarFileAndGetLastLineEnergy(archivedPath) == energy
+    assert finalEnergy(archivedPath) == finalEnergy(plain) == energy
+
+
+def test_listing_and_contcar(archived):
+    root, zipPath, _ = archived
+    # the folder entries zip -r adds are not results
+    assert listResults(f"{zipPath}/1stLayer") == [f"OSZICAR_{run}" for run in RUNS]
+    assert listResults(f"{zipPath}/1stLayer/O0") == ["OSZICAR"]
+
+    contcar = str(root / "H" / "1stLayer" / "O1" / "CONTCAR")
+    atoms = readResultAtoms(f"{root}/H_CONTCAR.zip/1stLayer/CONTCAR_O1")
+    assert atoms == readResultAtoms(contcar)
+
+    with pytest.raises(FileNotFoundError):
+        tailResult(f"{zipPath}/1stLayer/OSZICAR_O7")
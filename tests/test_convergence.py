@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from convergence import (
+    CONVERGED,
+    CRASHED,
+    IONIC,
+    UNVERIFIED,
+    classifyRun,
+    incarSettings,
+)
+import convergence
+from pipeline import Stage, StagePipeline, isConverged
+from synthetic import wo3Slab, writeRun
+
+
+def run(tmp_path, converged=True, outcar=True, steps=8):
+    folder = str(tmp_path / "run")
+    writeRun(folder, wo3Slab(1, 1), -100.0, steps, converged, outcar=outcar)
+    return folder
+
+
+def setIncar(folder, tag, value):
+    path = os.path.join(folder, "INCAR")
+    with open(path) as f:
+        lines = [line for line in f if not line.startswith(f"{tag} =")]
+    with open(path, "w") as f:
+        f.writelines(lines + [f"{tag} = {value}\n"])
+
+
+@pytest.mark.parametrize(
+    "tags, ibrion",
+    [({}, -1), ({"NSW": "0"}, -1), ({"NSW": "-1"}, -1), ({"NSW": "1"}, 0)],
+)
+def test_ibrion_default(tags, ibrion):
+    assert incarSettings(tags)["IBRION"] == ibrion
+
+
+def test_converged_and_ionic(tmp_path):
+    assert classifyRun(run(tmp_path / "a"))[0] == CONVERGED
+    assert classifyRun(run(tmp_path / "b", converged=False))[0] == IONIC
+
+
+def test_without_outcar_is_unverified(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the convergence.json cache of isConverged
+    # killed after 8 of NSW = 58 steps, the OSZICAR alone looks like a finished relaxation
+    folder = run(tmp_path, outcar=False)
+    assert classifyRun(folder)[0] == UNVERIFIED
+    assert not isConverged(folder)
+
+
+def test_ediffg_forces(tmp_path):
+    # the last max force is 0.02 eV/Å, the message is there either way
+    folder = run(tmp_path)
+    label, details = classifyRun(folder)
+    assert label == CONVERGED
+    assert details["Max force (eV/Å)"] == pytest.approx(0.02, abs=1e-5)
+    setIncar(folder, "EDIFFG", "-0.01")
+    assert classifyRun(folder)[0] == IONIC
+    # energy criterion, the accuracy message decides
+    setIncar(folder, "EDIFFG", "1E-4")
+    assert classifyRun(folder)[0] == CONVERGED
+
+
+def test_killed_run(tmp_path):
+    folder = run(tmp_path)
+    outcar = os.path.join(folder, "OUTCAR")
+    with open(outcar) as f:
+        text = f.read()
+    with open(outcar, "w") as f:
+        f.write(text[: text.index(" reached required accuracy")])
+    assert classifyRun(folder)[0] == CRASHED
+
+
+def test_pipeline_uses_classify_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folder = run(tmp_path)
+    assert isConverged(folder)
+    setIncar(folder, "EDIFFG", "-0.01")
+    assert not isConverged(folder)
+
+
+def test_stage_pipeline_classifies_through_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for i, converged in enumerate([True, False, True]):
+        writeRun(f"H/O{i}", wo3Slab(1, 1), -100.0, 8, converged, seed=i)
+    scanned = []
+    classify = convergence.classifyRun
+    monkeypatch.setattr(
+        convergence, "classifyRun", lambda run: scanned.append(run) or classify(run)
+    )
+    parents = []
+    stage = Stage("2H", "H", lambda atoms: "POSCAR_2H", lambda f, p: parents.append(p))
+    pipeline = StagePipeline([stage])
+
+    pipeline.runOnce()
+    assert parents == ["O0", "O2"]
+    assert sorted(scanned) == ["H/O0", "H/O1", "H/O2"]
+    # nothing changed: the pending run is answered by the cache, no OUTCAR is read
+    pipeline.runOnce()
+    assert len(scanned) == 3 and parents == ["O0", "O2"]
+    # O1 finishes
+    writeRun("H/O1", wo3Slab(1, 1), -100.0, 8, True, seed=1)
+    pipeline.runOnce()
+    assert scanned[3:] == ["H/O1"] and parents == ["O0", "O2", "O1"]
@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pytest
+from ase.build import fcc111
+
+from coverage import iterCoverageCombinations, siteDistanceMatrix
+from supercell import UnitSites
+from synthetic import wo3Slab
+from vacancies import iterVacancyCombinations
+
+
+def bruteForce(supercell, k, minDistance, symbol, layers=(-1,)):
+    # every k-subset of the sites, filtered, then the smallest member of every orbit
+    atoms = supercell.atoms
+    candidates = supercell.layerIndices(symbol, layers)
+    permutations = supercell.candidatePermutations(symbol, layers)
+    distances = siteDistanceMatrix(atoms, atoms.positions[candidates])
+    orbits = set()
+    for chosen in itertools.combinations(range(len(candidates)), k):
+        pairs = distances[np.ix_(chosen, chosen)][np.triu_indices(k, 1)]
+        if len(pairs) and pairs.min() < minDistance:
+            continue
+        orbits.add(min(tuple(sorted(p[list(chosen)])) for p in permutations))
+    return sorted(orbits)
+
+
+def unitCells(pbc):
+    wo3 = wo3Slab(1, 1)
+    pt = fcc111("Pt", (1, 1, 3), vacuum=6.0, periodic=True)
+    if not pbc:
+        wo3.pbc = pt.pbc = False
+    return {"WO3": (wo3, "O"), "fcc111": (pt, "Pt")}
+
+
+@pytest.mark.parametrize("pbc", [True, False])
+@pytest.mark.parametrize("name", ["WO3", "fcc111"])
+@pytest.mark.parametrize("nx, ny", [(2, 2), (3, 2), (3, 3)])
+@pytest.mark.parametrize("minDistance", [0.0, 4.0])
+def test_engine_matches_brute_force(pbc, name, nx, ny, minDistance):
+    unit, symbol = unitCells(pbc)[name]
+    supercell = UnitSites(unit).supercell(nx, ny)
+    for k in range(1, 5):
+        engine = [
+            tuple(chosen)
+            for chosen, _ in iterCoverageCombinations(
+                supercell, k, symbol, minDistance=minDistance
+            )
+        ]
+        assert engine == bruteForce(supercell, k, minDistance, symbol)
+
+
+def test_pbc_false_slab_is_periodic_in_plane():
+    # the symmetry is periodic, so the distances have to be too: with open boundaries two
+    # sites 2 cells apart pass minDistance but their image 1 cell apart doesn't
+    counts = {}
+    for pbc in (True, False):
+        unit, symbol = unitCells(pbc)["WO3"]
+        supercell = UnitSites(unit).supercell(3, 3)
+        counts[pbc] = [
+            sum(1 for _ in iterCoverageCombinations(supercell, k, minDistance=4.0))
+            for k in (2, 4)
+        ]
+        vacancies = supercell.iterVacancyCombinations(maxVacancies=2, minDistance=4.0)
+        plain = iterVacancyCombinations(
+            supercell.atoms, maxVacancies=2, minDistance=4.0
+        )
+        assert [c.tolist() for c in vacancies] == [c.tolist() for c in plain]
+    assert counts[True] == counts[False] == [1, 0]
+
+
+def test_wide_coverage_count():
+    # the benchmark case: 27 O sites of the top two layers of a 3x3 WO3 slab
+    supercell = UnitSites(wo3Slab(1, 1)).supercell(3, 3)
+    counts = [
+        sum(1 for _ in iterCoverageCombinations(supercell, k, layers=(-1, -2)))
+        for k in (2, 4, 6)
+    ]
+    assert counts == [12, 307, 4422]
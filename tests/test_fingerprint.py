@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+from ase import Atoms
+
+from fingerprint import FingerprintIndex, structureFingerprint
+from main import addAdsorbateCustom, add_h, generateSimulationFolders, getSurfaceAtoms
+from synthetic import wo3Slab
+
+
+def _placed(slab, index=0, pos=None):
+    slab = slab.copy()
+    addAdsorbateCustom(slab, Atoms("H"), 1.0, "O", index, overridePos=pos)
+    return slab
+
+
+def _sitePos(slab, index):
+    return getSurfaceAtoms("O", index, slab)[index].position[:2]
+
+
+def test_same_structure_same_fingerprint():
+    slab = wo3Slab(2, 2)
+    byIndex = _placed(slab, 2)
+    byPos = _placed(slab, pos=_sitePos(slab, 2))
+    permuted = byIndex[np.random.default_rng(0).permutation(len(byIndex))]
+
+    assert structureFingerprint(byPos) == structureFingerprint(byIndex)
+    assert structureFingerprint(permuted) == structureFingerprint(byIndex)
+    assert structureFingerprint(_placed(slab, 3)) != structureFingerprint(byIndex)
+
+
+def test_generation_skips_duplicates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("templates_W001")
+    for name in ("INCAR", "KPOINTS", "POTCAR", "gpu.slurm"):
+        with open(os.path.join("templates_W001", name), "w") as f:
+            f.write("#SBATCH --job-name=JOBNAME\n" if name == "gpu.slurm" else "\n")
+
+    slab = wo3Slab(2, 2)
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+
+    fileName = add_h(slab.copy(), Atoms("H"), 1.0, "O", 2)
+    assert generateSimulationFolders(fileName, fingerprintIndex=index) == "H/O2"
+
+    # the same H through pos=, named after another site, lands on the O2 run
+    fileName = add_h(slab.copy(), Atoms("H"), 1.0, "O", 0, pos=_sitePos(slab, 2))
+    assert generateSimulationFolders(fileName, fingerprintIndex=index) == "H/O2"
+    assert not os.path.exists(fileName)
+    assert not os.path.exists("H/O0")
+
+    fileName = add_h(slab.copy(), Atoms("H"), 1.0, "O", 3)
+    assert generateSimulationFolders(fileName, fingerprintIndex=index) == "H/O3"
+    assert os.path.exists("H/O3/POSCAR")
+    assert len(index) == 2
+    index.close()
@@ -0,0 +1,52 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+pytestmark = [
+    pytest.mark.mpi,
+    pytest.mark.skipif(shutil.which("mpirun") is None, reason="no mpirun"),
+]
+pytest.importorskip("mpi4py")
+
+
+def mpirun(np, args, cwd):
+    env = dict(os.environ)
+    # Open MPI refuses root and more ranks than cores unless told otherwise (CI containers)
+    env.setdefault("OMPI_ALLOW_RUN_AS_ROOT", "1")
+    env.setdefault("OMPI_ALLOW_RUN_AS_ROOT_CONFIRM", "1")
+    env.setdefault("OMPI_MCA_rmaps_base_oversubscribe", "1")
+    env.pop("SWEEP_EXECUTOR", None)
+    return subprocess.run(
+        ["mpirun", "-np", str(np), sys.executable, *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+
+@pytest.mark.parametrize("np", [2, 4])
+def test_map_order_and_broadcast(tmp_path, np):
+    run = mpirun(np, [os.path.join(HERE, "mpi_map.py"), str(tmp_path)], tmp_path)
+    assert run.returncode == 0, run.stderr
+    # rank outputs can interleave on one line
+    ranks = sorted(re.findall(r"ok (\d+)/(\d+)", run.stdout))
+    assert ranks == [(str(rank), str(np)) for rank in range(np)]
+
+
+def test_main_under_mpirun(tmp_path):
+    # every rank runs main.py, cleanUp and the prints happen on rank 0 only
+    from synthetic import syntheticWorkspace
+
+    syntheticWorkspace(str(tmp_path))
+    run = mpirun(2, [os.path.join(ROOT, "main.py")], tmp_path)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.count("----done----") == 1
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from outcar import freeAtomsMask, scanOutcar
+from synthetic import wo3Slab, writeOutcar, writeRun
+
+
+def parseLines(path, free=None):
+    """The same numbers as scanOutcar, the slow obvious way: one line at a time"""
+    steps, current, nions = [], {"loops": 0}, 0
+    with open(path) as f:
+        lines = f.read().split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if "NIONS =" in line:
+            nions = int(line.split("NIONS =")[1])
+        elif "magnetization" in line and "number of electron" in line:
+            current["mag"] = float(line.split("magnetization")[1])
+        elif "LOOP:" in line:
+            current["loops"] += 1
+        elif "TOTAL-FORCE" in line:
+            rows = [lines[i + 2 + k].split() for k in range(nions)]
+            forces = np.array(rows, dtype=float)[:, 3:]
+            if free is not None:
+                forces = forces[free]
+            current["force"] = np.linalg.norm(forces, axis=1).max()
+            i += 2 + nions
+        elif "TOTEN" in line:
+            current["toten"] = float(line.split("=")[1].split()[0])
+        elif "energy(sigma->0)" in line:
+            current["e0"] = float(line.split("energy(sigma->0) =")[1])
+        elif "LOOP+:" in line:
+            parts = line.replace(":", " ").split()
+            current["cpu"], current["real"] = float(parts[3]), float(parts[6])
+            steps.append(current)
+            current = {"loops": 0}
+        i += 1
+    return steps
+
+
+def assertMatches(steps, expected):
+    assert len(steps) == len(expected)
+    columns = {
+        "TOTEN (eV)": "toten",
+        "E0 (eV)": "e0",
+        "Max force (eV/Å)": "force",
+        "Magnetization": "mag",
+        "Electronic steps": "loops",
+        "LOOP+ cpu (s)": "cpu",
+        "LOOP+ real (s)": "real",
+    }
+    for column, key in columns.items():
+        assert steps[column].tolist() == pytest.approx([e[key] for e in expected])
+
+
+@pytest.fixture
+def runFolder(tmp_path):
+    folder = tmp_path / "run"
+    writeRun(str(folder), wo3Slab(2, 1), -200.0, steps=12, seed=3)
+    return folder
+
+
+def test_scan_matches_line_parse(runFolder):
+    path = str(runFolder / "OUTCAR")
+    free = freeAtomsMask(str(runFolder))
+    assert free is not None and not free.all()
+    for mask in (None, free):
+        steps, summary = scanOutcar(path, mask)
+        assertMatches(steps, parseLines(path, mask))
+    assert summary["nions"] == 32 and summary["steps"] == 12
+    assert summary["finished"] and summary["reachedAccuracy"]
+    # what writeOutcar put in: the last step of the free atoms, timings, magnetization
+    assert steps["Max force (eV/Å)"].iloc[-1] == pytest.approx(0.02, abs=1e-5)
+    assert steps["Magnetization"].tolist() == pytest.approx(
+        [s / 10 + 0.1 / 5 for s in range(1, 13)]
+    )
+    assert steps["LOOP+ cpu (s)"].tolist() == pytest.approx(
+        [12 + 0.5 * s for s in range(1, 13)]
+    )
+    assert (steps["LOOP+ real (s)"] - steps["LOOP+ cpu (s)"]).tolist() == pytest.approx(
+        [0.5] * 12
+    )
+
+
+@pytest.mark.parametrize("cut", ["TOTAL-FORCE", "TOTEN", "LOOP+", "LOOP:"])
+def test_still_running(tmp_path, cut):
+    # the run is writing step 8: only the finished steps count, no footer yet
+    full = str(tmp_path / "OUTCAR_full")
+    writeOutcar(full, wo3Slab(1, 1), steps=10, electronicSteps=4, seed=1)
+    with open(full) as f:
+        text = f.read()
+    seventh = 0
+    for _ in range(7):
+        seventh = text.index("LOOP+:", seventh) + 1
+    path = str(tmp_path / "OUTCAR")
+    with open(path, "w") as f:
+        f.write(text[: text.index(cut, seventh) + 3])
+
+    steps, summary = scanOutcar(path)
+    assert summary["steps"] == 7
+    assert not summary["finished"] and not summary["reachedAccuracy"]
+    assertMatches(steps, parseLines(path))
+    full, _ = scanOutcar(full)
+    assert steps.equals(full.iloc[: len(steps)].reset_index(drop=True))
+
+
+def test_empty_outcar(tmp_path):
+    path = tmp_path / "OUTCAR"
+    path.write_text("")
+    steps, summary = scanOutcar(str(path))
+    assert len(steps) == 0 and not summary["finished"]
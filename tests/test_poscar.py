@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+import pytest
+from ase import Atoms
+from ase.build import add_adsorbate, fcc111, molecule
+from ase.constraints import FixAtoms
+from ase.io import write
+
+from poscar import poscarString, writePoscar
+
+
+def aseText(atoms):
+    buffer = io.StringIO()
+    write(buffer, atoms, format="vasp")
+    return buffer.getvalue()
+
+
+def plain():
+    return fcc111("Pt", (3, 3, 4), vacuum=10.0)
+
+
+def fixed():
+    slab = plain()
+    slab.set_constraint(FixAtoms(indices=range(18)))
+    return slab
+
+
+def multipleFixed():
+    slab = plain()
+    slab.set_constraint([FixAtoms(indices=[0, 1, 2]), FixAtoms(indices=[9, 10, 20])])
+    return slab
+
+
+def withAdsorbate():
+    slab = fixed()
+    add_adsorbate(slab, molecule("H2O"), 2.0, "ontop")
+    add_adsorbate(slab, Atoms("N"), 1.5, "fcc")
+    return slab
+
+
+SLABS = {
+    "fcc111": plain,
+    "FixAtoms": fixed,
+    "multiple FixAtoms": multipleFixed,
+    "adsorbate": withAdsorbate,
+}
+
+
+@pytest.mark.parametrize("name", SLABS)
+def test_poscarString_matches_ase(name):
+    atoms = SLABS[name]()
+    assert poscarString(atoms) == aseText(atoms)
+
+
+@pytest.mark.parametrize("name", SLABS)
+def test_writePoscar_matches_ase_bytes(name, tmp_path):
+    atoms = SLABS[name]()
+    ours, theirs = tmp_path / "POSCAR", tmp_path / "POSCAR_ase"
+    writePoscar(str(ours), atoms)
+    write(str(theirs), atoms, format="vasp")
+    assert ours.read_bytes() == theirs.read_bytes()
+
+
+def test_cached_header_follows_the_cell():
+    # same species layout, different cell: the cached header must not be reused
+    atoms = plain()
+    first = poscarString(atoms)
+    atoms.set_cell(atoms.cell * 1.01, scale_atoms=True)
+    assert poscarString(atoms) == aseText(atoms) != first
+    atoms.positions += np.array([0.1, -0.2, 0.3])
+    assert poscarString(atoms) == aseText(atoms)
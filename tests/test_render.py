@@ -0,0 +1,32 @@
+import os
+
+from ase.build import fcc111, molecule, add_adsorbate
+
+from executors import ThreadExecutor
+from main import IMAGE_ROTATIONS, plotThenSaveAtoms
+
+
+def _jobs(folder):
+    slabs = [fcc111("Pt", (2, 2, 3), vacuum=6.0), fcc111("Cu", (3, 2, 2), vacuum=6.0)]
+    add_adsorbate(slabs[1], molecule("H2O"), 2.0, "ontop")
+    return [
+        (slab, x, y, z, os.path.join(folder, f"slab{i}_{x}x_{y}y_{z}z.png"))
+        for i, slab in enumerate(slabs)
+        for x, y, z in IMAGE_ROTATIONS
+    ]
+
+
+def _render(job):
+    plotThenSaveAtoms(*job)
+    with open(job[-1], "rb") as f:
+        return f.read()
+
+
+def test_thread_renders_match_serial(tmp_path):
+    # every thread draws on its own figure, nothing of another image leaks in
+    os.makedirs(tmp_path / "serial", exist_ok=True)
+    os.makedirs(tmp_path / "thread", exist_ok=True)
+    serial = [_render(job) for job in _jobs(tmp_path / "serial")]
+    with ThreadExecutor(workers=4) as executor:
+        threaded = executor.map(_render, _jobs(tmp_path / "thread"), chunkSize=1)
+    assert threaded == serial
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+from ase.build import add_adsorbate, fcc111, molecule
+
+import sites
+from executors import ThreadExecutor
+from main import add_molecule_sites
+from poscar import poscarString
+from sites import findSurfaceSites, surfaceSites
+from supercell import UnitSites
+from synthetic import wo3Slab
+
+UNIT_SLABS = {
+    "WO3": (lambda: wo3Slab(1, 1), "O"),
+    "fcc111": (lambda: fcc111("Pt", (1, 1, 3), vacuum=6.0, periodic=True), "Pt"),
+}
+
+
+def siteSet(found, atoms):
+    # order free: (kind, x, y, sorted neighbours) of every site, xy wrapped into the cell
+    cell = np.asarray(atoms.get_cell())[:2, :2]
+    frac = np.linalg.solve(cell.T, found.positions[:, :2].T).T
+    frac = np.round(frac, 6) % 1
+    return sorted(
+        (str(kind), *np.round(f @ cell, 4), tuple(sorted(found.neighborsOf(i))))
+        for i, (kind, f) in enumerate(zip(found.kinds, frac))
+    )
+
+
+@pytest.mark.parametrize("name", UNIT_SLABS)
+@pytest.mark.parametrize("nx, ny", [(1, 1), (2, 2), (3, 2), (3, 3)])
+def test_supercell_sites_match_triangulation(name, nx, ny):
+    build, symbol = UNIT_SLABS[name]
+    supercell = UnitSites(build()).supercell(nx, ny)
+    tiled = supercell.surfaceSites(symbol)
+    direct = findSurfaceSites(supercell.atoms, symbol)
+    assert len(tiled) == len(direct)
+    assert siteSet(tiled, supercell.atoms) == siteSet(direct, supercell.atoms)
+
+
+def test_site_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(sites, "MAX_CACHED_SLABS", 3)
+    sites._sites.clear()
+    slabs = [wo3Slab(n, 1) for n in range(1, 6)]
+    for slab in slabs:
+        surfaceSites(slab)
+    assert len(sites._sites) == 3
+    # the most recently used entries are the ones kept
+    surfaceSites(slabs[2])
+    surfaceSites(wo3Slab(6, 1))
+    assert surfaceSites(slabs[2]) is sites._sites[next(reversed(sites._sites))]
+    assert len(sites._sites) == 3
+    sites._sites.clear()
+
+
+def test_add_molecule_sites_matches_add_adsorbate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    slab = wo3Slab(2, 2)
+    h2o = molecule("H2O")
+    found = surfaceSites(slab, "O")
+    with ThreadExecutor(workers=4) as executor:
+        fileNames = list(
+            add_molecule_sites(slab, h2o, "H2O", 1.5, batchSize=5, executor=executor)
+        )
+    assert len(fileNames) == len(found)
+    for i, fileName in enumerate(fileNames):
+        expected = slab.copy()
+        add_adsorbate(expected, h2o.copy(), 1.5, found.xy(i))
+        with open(fileName) as f:
+            assert f.read() == poscarString(expected)
+        assert os.path.exists(fileName.replace("POSCAR", "KPOINTS"))
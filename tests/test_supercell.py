@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import spglib
+from ase.build import bcc100, fcc111
+
+from supercell import UnitSites
+from synthetic import wo3Slab
+from vacancies import candidateSymmetryPermutations, iterVacancyCombinations
+
+UNIT_SLABS = {
+    "WO3": (lambda: wo3Slab(1, 1), "O"),
+    "fcc111": (lambda: fcc111("Pt", (1, 1, 3), vacuum=6.0, periodic=True), "Pt"),
+    "bcc100": (lambda: bcc100("Fe", (1, 1, 3), vacuum=6.0, periodic=True), "Fe"),
+}
+SIZES = [(nx, ny) for nx in (1, 2, 3) for ny in (1, 2, 3)]
+
+
+@pytest.fixture(scope="module")
+def unitSites():
+    return {name: UnitSites(build()) for name, (build, _) in UNIT_SLABS.items()}
+
+
+@pytest.mark.parametrize("name", UNIT_SLABS)
+@pytest.mark.parametrize("nx, ny", SIZES)
+def test_broadcast_permutations_match_spglib(unitSites, name, nx, ny):
+    symbol = UNIT_SLABS[name][1]
+    supercell = unitSites[name].supercell(nx, ny)
+    broadcast = supercell.candidatePermutations(symbol)
+    direct = candidateSymmetryPermutations(
+        supercell.atoms, supercell.layerIndices(symbol)
+    )
+    assert np.array_equal(broadcast, direct)
+
+
+@pytest.mark.parametrize("name", UNIT_SLABS)
+@pytest.mark.parametrize("nx, ny", [(2, 2), (3, 2), (3, 3)])
+def test_vacancy_orbits_match_spglib(unitSites, name, nx, ny):
+    symbol = UNIT_SLABS[name][1]
+    supercell = unitSites[name].supercell(nx, ny)
+    broadcast = supercell.iterVacancyCombinations(symbol, 3)
+    direct = iterVacancyCombinations(supercell.atoms, symbol, 3)
+    assert [c.tolist() for c in broadcast] == [c.tolist() for c in direct]
+
+
+@pytest.mark.parametrize("name", UNIT_SLABS)
+@pytest.mark.parametrize("nx, ny", [(1, 1), (2, 1), (1, 2), (3, 1), (2, 2), (3, 2)])
+@pytest.mark.parametrize("layers", [(-1,), (-2,), (-1, -2)])
+def test_distinct_sites_match_spglib(unitSites, name, nx, ny, layers):
+    symbol = UNIT_SLABS[name][1]
+    supercell = unitSites[name].supercell(nx, ny)
+    atoms = supercell.atoms
+    indices = supercell.layerIndices(symbol, layers)
+    dataset = spglib.get_symmetry_dataset(
+        (np.asarray(atoms.get_cell()), atoms.get_scaled_positions(), atoms.numbers),
+        symprec=1e-3,
+    )
+    # layer position of the first atom of every orbit
+    orbits = dataset.equivalent_atoms[indices]
+    expected = np.unique([np.flatnonzero(orbits == orbit)[0] for orbit in orbits])
+    assert supercell.distinctSites(symbol, layers).tolist() == expected.tolist()
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import tracing
+from executors import ThreadExecutor
+from tracing import disableTracing, enableTracing, resetTrace, span, traceSummary
+
+
+@pytest.fixture
+def memoryTracing():
+    resetTrace()
+    enableTracing(memory=True)
+    yield
+    disableTracing()
+    resetTrace()
+
+
+def allocate(size):
+    with span("worker"):
+        return np.ones(size, dtype=np.uint8).sum()
+
+
+def test_thread_spans_leave_the_peak_alone(memoryTracing):
+    size = 8 << 20
+    with span("map"):
+        with ThreadExecutor(workers=4) as executor:
+            executor.map(allocate, [size] * 8, chunkSize=1)
+    summary = traceSummary().set_index("Stage")
+    assert summary.loc["worker", "calls"] == 8
+    # the workers are timed only, their buffers show up in the span around the map
+    assert np.isnan(summary.loc["worker", "peak bytes"])
+    assert summary.loc["map", "peak bytes"] >= size
+    assert all(
+        "peak bytes" not in e["args"] for e in tracing._events if e["name"] == "worker"
+    )
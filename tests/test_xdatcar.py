@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+from xdatcar import Xdatcar
+
+HEADER = "run\n1.0\n 4.0 0.0 0.0\n 0.0 4.0 0.0\n 0.0 0.0 9.0\n W O\n 1 2\n"
+
+
+def writeXdatcar(path, frames, width=8):
+    # width changes where every frame starts, like a rerun with other formatting
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for i, frame in enumerate(frames, 1):
+            f.write(f"Direct configuration={i:6d}\n")
+            for row in frame:
+                f.write("".join(f"{v:{width}.5f}" for v in row) + "\n")
+
+
+def frames(n, seed):
+    return np.random.default_rng(seed).random((n, 3, 3)).astype(np.float32)
+
+
+def test_growing_file_reuses_index(tmp_path):
+    path = str(tmp_path / "XDATCAR")
+    data = frames(200, 0)
+    writeXdatcar(path, data[:50])
+    with Xdatcar(path) as xd:
+        assert len(xd) == 50
+    writeXdatcar(path, data)
+    with Xdatcar(path) as xd:
+        assert len(xd) == 200
+        np.testing.assert_allclose(xd[::7], data[::7], atol=1e-5)
+
+
+def test_longer_rerun_over_the_same_file_rebuilds_index(tmp_path):
+    path = str(tmp_path / "XDATCAR")
+    writeXdatcar(path, frames(300, 0), width=8)
+    with Xdatcar(path) as xd:
+        assert len(xd) == 300
+    rerun = frames(400, 1)
+    writeXdatcar(path, rerun, width=10)
+    os.utime(path, (0, os.path.getmtime(path) + 1))
+    with Xdatcar(path) as xd:
+        assert len(xd) == 400
+        np.testing.assert_allclose(xd[:], rerun, atol=1e-5)
@@ -0,0 +1,247 @@
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+import pandas as pd
+
+from constants import *
+
+# SWEEP_TRACE=1 python main.py -> trace.json (chrome://tracing, ui.perfetto.dev) + summary
+# SWEEP_TRACE=memory also records the tracemalloc peak of every span
+TRACE_ENV = "SWEEP_TRACE"
+TRACE_FILE = "trace.json"
+
+_enabled = False
+_memory = False
+# tracemalloc and its peak are process wide, only spans of this thread measure them
+_memoryThread = None
+_events = []
+_totals = {}  # {span name: {"calls", "seconds", "peak", counters...}}
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class _NullSpan:
+    # what span() returns while tracing is off, entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, name, value=1):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage, ex: with span("parse", file=path) as s: ... s.count("bytes", n)"""
+
+    __slots__ = (
+        "name",
+        "category",
+        "args",
+        "counters",
+        "start",
+        "children",
+        "startMemory",
+        "peak",
+    )
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.counters = {}
+        self.children = 0  # ns spent in nested spans
+        self.startMemory = 0
+        self.peak = 0
+
+    def count(self, name: str, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def __enter__(self):
+        stack = _stack()
+        if _memory and threading.get_ident() == _memoryThread:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.startMemory = current
+            self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        stack = _stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += end - self.start
+        args = dict(self.args)
+        args.update(self.counters)
+        peak = None
+        if _memory and threading.get_ident() == _memoryThread:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            peak = self.peak - self.startMemory
+            args["peak bytes"] = peak
+        _record(self, end, args, peak)
+        return False
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record(span: Span, end: int, args: dict, peak):
+    seconds = (end - span.start) / 1e9
+    event = {
+        "name": span.name,
+        "cat": span.category,
+        "ph": "X",
+        "ts": span.start / 1e3,
+        "dur": (end - span.start) / 1e3,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _lock:
+        _events.append(event)
+        total = _totals.setdefault(span.name, {"calls": 0, "seconds": 0.0})
+        total["calls"] += 1
+        total["seconds"] += seconds
+        # without the nested spans, what the stage itself costs
+        total["self seconds"] = (
+            total.get("self seconds", 0.0) + seconds - span.children / 1e9
+        )
+        total["max seconds"] = max(total.get("max seconds", 0.0), seconds)
+        if peak is not None:
+            total["peak bytes"] = max(total.get("peak bytes", 0), peak)
+        for name, value in span.counters.items():
+            total[name] = total.get(name, 0) + value
+
+
+def span(name: str, category: str = "sweep", **args):
+    """
+    Context manager around one stage (generation, write, kpoints, parse, render, report...).
+    Returns a shared no-op object while tracing is off, the cost is one global check
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, category, args)
+
+
+def count(name: str, value=1):
+    """Adds to a counter (files, bytes, cache hits...) of the innermost open span"""
+    if not _enabled:
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].count(name, value)
+
+
+def traced(name: str = None, category: str = "sweep"):
+    """Decorator version of span, ex: @traced("parse")"""
+
+    def decorator(fn):
+        spanName = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(spanName, category, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enableTracing(memory: bool = False):
+    """
+    Starts recording spans in this process (threads included). Process pools and MPI
+    ranks only record what runs in them, the span around executor.map still times it.
+    memory peaks are only recorded for spans of the calling thread: reset_peak is process
+    wide, ThreadExecutor workers would reset each other's. Their allocations still count
+    towards the span around executor.map
+    """
+    global _enabled, _memory, _memoryThread
+    _enabled = True
+    _memory = memory
+    _memoryThread = threading.get_ident()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disableTracing():
+    global _enabled, _memory
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = False
+    _memory = False
+
+
+def isTracing():
+    return _enabled
+
+
+def resetTrace():
+    with _lock:
+        _events.clear()
+        _totals.clear()
+
+
+def writeChromeTrace(path: str = TRACE_FILE):
+    """Every recorded span as a Chrome trace (chrome://tracing or ui.perfetto.dev)"""
+    with _lock:
+        events = list(_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def traceSummary():
+    """
+    One row per span name: calls, total/self/mean/max seconds, peak bytes and counters.
+    seconds includes nested spans, self seconds doesn't and sums to the traced time
+    """
+    with _lock:
+        rows = [{"Stage": name, **total} for name, total in _totals.items()]
+    df = pd.DataFrame(rows)
+    if len(df):
+        df.insert(3, "mean seconds", df["seconds"] / df["calls"])
+        df = df.sort_values("self seconds", ascending=False, ignore_index=True)
+    return df
+
+
+def printTraceSummary():
+    df = traceSummary()
+    if len(df):
+        print(f"{bcolors.OKCYAN}{df.to_string(index=False)}{bcolors.ENDC}")
+
+
+def _writeAtExit():
+    if _events:
+        writeChromeTrace(TRACE_FILE)
+        printTraceSummary()
+        print(f"{bcolors.OKGREEN}Trace written to {TRACE_FILE}{bcolors.ENDC}")
+
+
+if os.environ.get(TRACE_ENV, "").lower() not in ("", "0", "false", "no"):
+    enableTracing(memory=os.environ[TRACE_ENV].lower() == "memory")
+    atexit.register(_writeAtExit)
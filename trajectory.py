@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from constants import *
+from xdatcar import Xdatcar
+
+
+def _indices(xd, symbol: str):
+    if xd.symbols is None:
+        print(f"{bcolors.FAIL}{xd.path} has no symbols line (VASP 4){bcolors.ENDC}")
+        raise ValueError
+    idx = np.flatnonzero(np.array(xd.symbols) == symbol)
+    if len(idx) == 0:
+        print(f'{bcolors.FAIL}Requested symbol: "{symbol}", is not found{bcolors.ENDC}')
+        raise ValueError
+    return idx
+
+
+def _chunks(xd, chunkSize: int, stride: int):
+    # yields (ionic steps, direct coordinates) so only chunkSize frames are in memory at once
+    frames = np.arange(0, len(xd), stride)
+    for start in range(0, len(frames), chunkSize):
+        steps = frames[start : start + chunkSize]
+        yield steps + 1, xd[steps[0] : steps[-1] + 1 : stride]
+
+
+def pairDistances(frac, idx1, idx2, cell):
+    """
+    (nframes, len(idx1), len(idx2)) minimum image distances from direct coordinates.
+    Wrapping in direct coordinates is exact for the near orthogonal WO3 cells
+    """
+    diff = frac[:, idx1, None, :] - frac[:, None, idx2, :]
+    diff -= np.rint(diff)
+    return np.linalg.norm(diff @ cell.astype(np.float32), axis=-1)
+
+
+def shortestDistanceSeries(
+    xdatcar,
+    symbol1: str,
+    symbol2: str,
+    n: int = 3,
+    chunkSize: int = 500,
+    stride: int = 1,
+):
+    """
+    Shortest n symbol1-symbol2 distances at every ionic step, the per step version of
+    addShortestThreeBondLengthsToDf. Columns "H-O 1", "H-O 2", ...
+    """
+    xd = xdatcar if isinstance(xdatcar, Xdatcar) else Xdatcar(xdatcar)
+    idx1, idx2 = _indices(xd, symbol1), _indices(xd, symbol2)
+    same = symbol1 == symbol2
+
+    steps, series = [], []
+    for chunkSteps, frac in _chunks(xd, chunkSize, stride):
+        distances = pairDistances(frac, idx1, idx2, xd.cell)
+        if same:
+            # each pair once, no self distances
+            upper = np.triu_indices(len(idx1), k=1)
+            distances = distances[:, upper[0], upper[1]]
+        else:
+            distances = distances.reshape(len(frac), -1)
+        series.append(np.sort(distances, axis=1)[:, :n])
+        steps.append(chunkSteps)
+
+    columns = [f"{symbol1}-{symbol2} {i + 1}" for i in range(series[0].shape[1])]
+    return pd.DataFrame(
+        np.concatenate(series),
+        index=pd.Index(np.concatenate(steps), name="Step"),
+        columns=columns,
+    )
+
+
+def coordinationSeries(
+    xdatcar,
+    centerSymbol: str,
+    neighborSymbol: str,
+    cutoff: float,
+    chunkSize: int = 500,
+    stride: int = 1,
+):
+    """Number of neighborSymbol atoms within cutoff (Å) of every centerSymbol atom, per ionic step"""
+    xd = xdatcar if isinstance(xdatcar, Xdatcar) else Xdatcar(xdatcar)
+    centers, neighbors = _indices(xd, centerSymbol), _indices(xd, neighborSymbol)
+
+    steps, counts = [], []
+    for chunkSteps, frac in _chunks(xd, chunkSize, stride):
+        distances = pairDistances(frac, centers, neighbors, xd.cell)
+        within = (distances < cutoff) & (distances > 1e-3)
+        counts.append(within.sum(axis=2))
+        steps.append(chunkSteps)
+
+    columns = [f"CN {centerSymbol}{i}-{neighborSymbol}" for i in centers]
+    return pd.DataFrame(
+        np.concatenate(counts),
+        index=pd.Index(np.concatenate(steps), name="Step"),
+        columns=columns,
+    )
+
+
+def nearestNeighborSeries(
+    xdatcar,
+    symbol: str,
+    neighborSymbols=("O", "W"),
+    chunkSize: int = 500,
+    stride: int = 1,
+):
+    """
+    For every atom of `symbol` (ex: H), the index, symbol and distance of its closest
+    neighborSymbols atom at each ionic step. A change in "H64 nearest" is H hopping sites
+    """
+    xd = xdatcar if isinstance(xdatcar, Xdatcar) else Xdatcar(xdatcar)
+    centers = _indices(xd, symbol)
+    neighbors = np.concatenate([_indices(xd, sym) for sym in neighborSymbols])
+    neighborNames = np.array([f"{xd.symbols[i]}{i}" for i in neighbors])
+
+    steps, nearest, closest = [], [], []
+    for chunkSteps, frac in _chunks(xd, chunkSize, stride):
+        distances = pairDistances(frac, centers, neighbors, xd.cell)
+        which = distances.argmin(axis=2)
+        nearest.append(which)
+        closest.append(np.take_along_axis(distances, which[..., None], axis=2)[..., 0])
+        steps.append(chunkSteps)
+
+    nearest = np.concatenate(nearest)
+    closest = np.concatenate(closest)
+    data = {}
+    for n, i in enumerate(centers):
+        data[f"{symbol}{i} nearest"] = neighborNames[nearest[:, n]]
+        data[f"{symbol}{i} distance"] = closest[:, n]
+    return pd.DataFrame(data, index=pd.Index(np.concatenate(steps), name="Step"))
+
+
+def plotTrajectorySeries(series, energies=None, ylabel="Distance (Å)"):
+    """
+    series from one of the functions above, energies is optional (steps, E0) from the OSZICAR
+    plotted on a second axis so geometry and energy changes line up
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for column in series.columns:
+        if np.issubdtype(series[column].dtype, np.number):
+            ax.plot(series.index, series[column], label=column)
+    ax.set_xlabel("Step")
+    ax.set_ylabel(ylabel)
+    ax.legend(loc="upper left", frameon=False)
+
+    if energies is not None:
+        steps, e0 = energies
+        ax2 = ax.twinx()
+        ax2.plot(steps, e0, "k:", label="E0")
+        ax2.set_ylabel("Energy sigma -> 0 (eV)")
+
+    plt.tight_layout()
+    plt.show()
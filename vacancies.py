@@ -0,0 +1,147 @@
+import numpy as np
+import spglib
+from ase.geometry import get_distances
+
+from configurations import Configuration
+from constants import *
+from selection import symbolLayerIndices
+
+# distances between sites are minimum image in plane whatever slab.pbc says, the spglib
+# symmetry the orbits come from treats the cell as periodic anyway
+SLAB_PBC = (True, True, False)
+
+
+def candidateSymmetryOps(slab, candidates, symprec: float = 1e-3):
+    """
+    (rotations, permutations, offsets) of every symmetry operation of the slab that maps
+    the candidate sites onto themselves. permutations[op][i] is where candidate i lands and
+    offsets[op][i] the lattice vector (fractional, integer) it lands in, relative to the
+    unwrapped positions of the slab. The identity comes first
+    """
+    frac = slab.get_scaled_positions(wrap=False)
+    sites = frac[candidates]
+    identity = np.arange(len(candidates))
+    rotations = [np.eye(3, dtype=int)]
+    permutations = [identity]
+    offsets = [np.zeros((len(candidates), 3), dtype=int)]
+
+    symmetry = spglib.get_symmetry(
+        (np.asarray(slab.get_cell()), frac, slab.numbers), symprec=symprec
+    )
+    if symmetry is None:
+        return np.array(rotations), np.array(permutations), np.array(offsets)
+
+    for rotation, translation in zip(symmetry["rotations"], symmetry["translations"]):
+        mapped = sites @ rotation.T + translation
+        diff = mapped[:, None, :] - sites[None, :, :]
+        diff -= np.rint(diff)
+        match = np.all(np.abs(diff) < 10 * symprec, axis=2)
+        # ops that send a candidate somewhere that isn't a candidate (ex: top -> bottom layer)
+        if not np.all(match.sum(axis=1) == 1):
+            continue
+        permutation = match.argmax(axis=1)
+        rotations.append(rotation)
+        permutations.append(permutation)
+        offsets.append(np.rint(mapped - sites[permutation]).astype(int))
+
+    return np.array(rotations), np.array(permutations), np.array(offsets)
+
+
+def candidateSymmetryPermutations(slab, candidates, symprec: float = 1e-3):
+    """
+    Every symmetry operation of the slab that maps the candidate sites onto themselves,
+    written as a permutation of positions in `candidates`. Shape (n_ops, n_candidates)
+    """
+    _, permutations, _ = candidateSymmetryOps(slab, candidates, symprec)
+    return np.unique(permutations, axis=0)
+
+
+def iterVacancyCombinations(
+    slab,
+    symbol: str = "O",
+    maxVacancies: int = 1,
+    layers=(-1,),
+    minDistance: float = 0.0,
+    symmetry=True,
+    candidates=None,
+    permutations=None,
+):
+    """
+    Streams every k-vacancy combination (k = 1..maxVacancies) of `symbol` atoms in `layers`
+    as arrays of slab indices. Vacancies closer than `minDistance` (in plane minimum image) are
+    pruned while branching, and with `symmetry` only one combination per symmetry orbit is kept.
+    `candidates` (sorted slab indices) and their `permutations` can be passed in when they
+    are already known, ex: broadcast from the unit cell by a Supercell
+    """
+    if candidates is None:
+        candidates = symbolLayerIndices(slab, symbol, layers)
+    candidates = np.asarray(candidates)
+    count = len(candidates)
+
+    _, distances = get_distances(
+        slab.positions[candidates], cell=slab.cell, pbc=SLAB_PBC
+    )
+    compatible = distances >= minDistance
+    np.fill_diagonal(compatible, False)
+    # only look forward so every combination is built once, in sorted order
+    compatible &= np.arange(count)[None, :] > np.arange(count)[:, None]
+
+    if not symmetry:
+        permutations = None
+    elif permutations is None:
+        permutations = candidateSymmetryPermutations(slab, candidates)
+
+    for k in range(1, maxVacancies + 1):
+        powers = count ** np.arange(k - 1, -1, -1, dtype=np.int64)
+        stack = [(np.array([i]), compatible[i]) for i in range(count - 1, -1, -1)]
+        while stack:
+            chosen, allowed = stack.pop()
+            if len(chosen) == k:
+                if permutations is not None:
+                    keys = np.sort(permutations[:, chosen], axis=1) @ powers
+                    if keys.min() < chosen @ powers:
+                        continue
+                yield candidates[chosen]
+                continue
+
+            for nxt in np.flatnonzero(allowed)[::-1]:
+                stack.append((np.append(chosen, nxt), allowed & compatible[nxt]))
+
+
+def removeAtoms(slab, indices):
+    """Copy of `slab` without `indices`, deleted in one go so constraints are reindexed once"""
+    mask = np.zeros(len(slab), dtype=bool)
+    mask[indices] = True
+    vacant = slab.copy()
+    del vacant[mask]
+    return vacant
+
+
+def iterVacancyStructures(
+    slab,
+    symbol: str = "O",
+    maxVacancies: int = 1,
+    layers=(-1,),
+    minDistance: float = 0.0,
+    symmetry=True,
+):
+    """Same as iterVacancyCombinations but yields (removed indices, vacancy slab)"""
+    for removed in iterVacancyCombinations(
+        slab, symbol, maxVacancies, layers, minDistance, symmetry
+    ):
+        yield removed, removeAtoms(slab, removed)
+
+
+def iterVacancyConfigurations(
+    slab,
+    symbol: str = "O",
+    maxVacancies: int = 1,
+    layers=(-1,),
+    minDistance: float = 0.0,
+    symmetry=True,
+):
+    """Same as iterVacancyStructures but yields Configurations, no slab copies until written"""
+    for removed in iterVacancyCombinations(
+        slab, symbol, maxVacancies, layers, minDistance, symmetry
+    ):
+        yield Configuration(slab, removed)
@@ -0,0 +1,327 @@
+// Structure viewer of report.py pages: every <canvas class="structure"> carries the
+// payload of viewer.structurePayload in data-structure. Structures are drawn as instanced
+// spheres on one shared WebGL2 canvas and copied into their own canvas, so a page of
+// hundreds of structures needs a single GL context. Drag to rotate, wheel to zoom,
+// double click to reset.
+(function () {
+  "use strict";
+
+  const SPHERE_VERTEX = `#version 300 es
+in vec3 vertex;
+in vec3 offset;
+in vec4 element;
+uniform mat3 rotation;
+uniform vec3 center;
+uniform float scale;
+out vec3 vColor;
+out vec3 vNormal;
+void main() {
+  vec3 p = rotation * (offset - center + vertex * element.w);
+  vNormal = rotation * vertex;
+  vColor = element.rgb;
+  gl_Position = vec4(p.xy * scale, -p.z * scale * 0.25, 1.0);
+}`;
+
+  const SPHERE_FRAGMENT = `#version 300 es
+precision mediump float;
+in vec3 vColor;
+in vec3 vNormal;
+out vec4 color;
+void main() {
+  float light = max(dot(normalize(vNormal), normalize(vec3(0.3, 0.4, 1.0))), 0.0);
+  color = vec4(vColor * (0.35 + 0.65 * light), 1.0);
+}`;
+
+  const LINE_VERTEX = `#version 300 es
+in vec3 vertex;
+uniform mat3 rotation;
+uniform vec3 center;
+uniform float scale;
+void main() {
+  vec3 p = rotation * (vertex - center);
+  gl_Position = vec4(p.xy * scale, -p.z * scale * 0.25, 1.0);
+}`;
+
+  const LINE_FRAGMENT = `#version 300 es
+precision mediump float;
+out vec4 color;
+void main() {
+  color = vec4(0.4, 0.4, 0.4, 1.0);
+}`;
+
+  // 3x3 matrices are column major, like uniformMatrix3fv wants them
+  function multiply(a, b) {
+    const out = new Float32Array(9);
+    for (let c = 0; c < 3; c++) {
+      for (let r = 0; r < 3; r++) {
+        let sum = 0;
+        for (let k = 0; k < 3; k++) sum += a[k * 3 + r] * b[c * 3 + k];
+        out[c * 3 + r] = sum;
+      }
+    }
+    return out;
+  }
+
+  function rotationX(t) {
+    const c = Math.cos(t), s = Math.sin(t);
+    return new Float32Array([1, 0, 0, 0, c, s, 0, -s, c]);
+  }
+
+  function rotationY(t) {
+    const c = Math.cos(t), s = Math.sin(t);
+    return new Float32Array([c, 0, -s, 0, 1, 0, s, 0, c]);
+  }
+
+  // looking at the slab from the side and a bit above, like the old finalAngle images
+  function initialRotation() {
+    return multiply(rotationX(-1.2), rotationY(0.4));
+  }
+
+  function sphere(rings, segments) {
+    const points = [];
+    for (let i = 0; i <= rings; i++) {
+      const theta = (i / rings) * Math.PI;
+      for (let j = 0; j <= segments; j++) {
+        const phi = (j / segments) * 2 * Math.PI;
+        points.push([Math.sin(theta) * Math.cos(phi), Math.sin(theta) * Math.sin(phi), Math.cos(theta)]);
+      }
+    }
+    const vertices = [];
+    const row = segments + 1;
+    for (let i = 0; i < rings; i++) {
+      for (let j = 0; j < segments; j++) {
+        const a = i * row + j, b = a + row;
+        for (const k of [a, b, a + 1, a + 1, b, b + 1]) vertices.push(...points[k]);
+      }
+    }
+    return new Float32Array(vertices);
+  }
+
+  function base64Bytes(text) {
+    const binary = atob(text);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    return bytes;
+  }
+
+  async function decode(text) {
+    if (text.startsWith("gz:")) {
+      const stream = new Blob([base64Bytes(text.slice(3))])
+        .stream()
+        .pipeThrough(new DecompressionStream("gzip"));
+      text = await new Response(stream).text();
+    }
+    const payload = JSON.parse(text);
+    const positions = new Float32Array(base64Bytes(payload.p).buffer);
+    const count = positions.length / 3;
+    const elements = new Float32Array(count * 4);
+    let atom = 0;
+    for (const [z, n] of payload.n) {
+      const element = payload.e[z];
+      for (let i = 0; i < n; i++, atom++) elements.set(element, atom * 4);
+    }
+
+    // rotate around the middle of the atoms, zoomed so the farthest one fits
+    const center = [0, 0, 0];
+    for (let i = 0; i < count; i++) {
+      for (let k = 0; k < 3; k++) center[k] += positions[i * 3 + k] / count;
+    }
+    let extent = 1;
+    for (let i = 0; i < count; i++) {
+      const dx = positions[i * 3] - center[0];
+      const dy = positions[i * 3 + 1] - center[1];
+      const dz = positions[i * 3 + 2] - center[2];
+      extent = Math.max(extent, Math.hypot(dx, dy, dz) + elements[i * 4 + 3]);
+    }
+
+    // 12 edges of the cell
+    const [a, b, c] = payload.c;
+    const corner = (i, j, k) => [0, 1, 2].map((x) => i * a[x] + j * b[x] + k * c[x]);
+    const cell = [];
+    for (const [i, j, k] of [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [1, 0, 1], [0, 1, 1], [1, 1, 1]]) {
+      if (i === 0) cell.push(...corner(i, j, k), ...corner(1, j, k));
+      if (j === 0) cell.push(...corner(i, j, k), ...corner(i, 1, k));
+      if (k === 0) cell.push(...corner(i, j, k), ...corner(i, j, 1));
+    }
+    return {
+      positions,
+      elements,
+      count,
+      center: new Float32Array(center),
+      extent,
+      cell: new Float32Array(cell),
+    };
+  }
+
+  function compile(gl, vertexSource, fragmentSource) {
+    const program = gl.createProgram();
+    for (const [type, source] of [[gl.VERTEX_SHADER, vertexSource], [gl.FRAGMENT_SHADER, fragmentSource]]) {
+      const shader = gl.createShader(type);
+      gl.shaderSource(shader, source);
+      gl.compileShader(shader);
+      if (!gl.getShaderParameter(shader, gl.COMPILE_STATUS)) throw new Error(gl.getShaderInfoLog(shader));
+      gl.attachShader(program, shader);
+    }
+    gl.linkProgram(program);
+    if (!gl.getProgramParameter(program, gl.LINK_STATUS)) throw new Error(gl.getProgramInfoLog(program));
+    return program;
+  }
+
+  function createRenderer() {
+    const canvas = document.createElement("canvas");
+    const gl = canvas.getContext("webgl2", { antialias: true, preserveDrawingBuffer: true });
+    if (!gl) return null;
+
+    const spheres = compile(gl, SPHERE_VERTEX, SPHERE_FRAGMENT);
+    const lines = compile(gl, LINE_VERTEX, LINE_FRAGMENT);
+    const mesh = sphere(10, 16);
+
+    const sphereArray = gl.createVertexArray();
+    gl.bindVertexArray(sphereArray);
+    const meshBuffer = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, meshBuffer);
+    gl.bufferData(gl.ARRAY_BUFFER, mesh, gl.STATIC_DRAW);
+    let location = gl.getAttribLocation(spheres, "vertex");
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 3, gl.FLOAT, false, 0, 0);
+
+    const offsetBuffer = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, offsetBuffer);
+    location = gl.getAttribLocation(spheres, "offset");
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 3, gl.FLOAT, false, 0, 0);
+    gl.vertexAttribDivisor(location, 1);
+
+    const elementBuffer = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, elementBuffer);
+    location = gl.getAttribLocation(spheres, "element");
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 4, gl.FLOAT, false, 0, 0);
+    gl.vertexAttribDivisor(location, 1);
+
+    const lineArray = gl.createVertexArray();
+    gl.bindVertexArray(lineArray);
+    const lineBuffer = gl.createBuffer();
+    gl.bindBuffer(gl.ARRAY_BUFFER, lineBuffer);
+    location = gl.getAttribLocation(lines, "vertex");
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 3, gl.FLOAT, false, 0, 0);
+
+    function setView(program, view, structure) {
+      gl.useProgram(program);
+      gl.uniformMatrix3fv(gl.getUniformLocation(program, "rotation"), false, view.rotation);
+      gl.uniform3fv(gl.getUniformLocation(program, "center"), structure.center);
+      gl.uniform1f(gl.getUniformLocation(program, "scale"), view.zoom / structure.extent);
+    }
+
+    return function draw(target, structure, view) {
+      canvas.width = target.width;
+      canvas.height = target.height;
+      gl.viewport(0, 0, canvas.width, canvas.height);
+      gl.clearColor(1, 1, 1, 1);
+      gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT);
+      gl.enable(gl.DEPTH_TEST);
+
+      gl.bindVertexArray(sphereArray);
+      gl.bindBuffer(gl.ARRAY_BUFFER, offsetBuffer);
+      gl.bufferData(gl.ARRAY_BUFFER, structure.positions, gl.DYNAMIC_DRAW);
+      gl.bindBuffer(gl.ARRAY_BUFFER, elementBuffer);
+      gl.bufferData(gl.ARRAY_BUFFER, structure.elements, gl.DYNAMIC_DRAW);
+      setView(spheres, view, structure);
+      gl.drawArraysInstanced(gl.TRIANGLES, 0, mesh.length / 3, structure.count);
+
+      gl.bindVertexArray(lineArray);
+      gl.bindBuffer(gl.ARRAY_BUFFER, lineBuffer);
+      gl.bufferData(gl.ARRAY_BUFFER, structure.cell, gl.DYNAMIC_DRAW);
+      setView(lines, view, structure);
+      gl.drawArrays(gl.LINES, 0, structure.cell.length / 3);
+
+      const context = target.getContext("2d");
+      context.clearRect(0, 0, target.width, target.height);
+      context.drawImage(canvas, 0, 0);
+    };
+  }
+
+  function attach(target, draw) {
+    const ratio = window.devicePixelRatio || 1;
+    const width = target.width, height = target.height;
+    target.style.width = width + "px";
+    target.style.height = height + "px";
+    target.width = Math.round(width * ratio);
+    target.height = Math.round(height * ratio);
+
+    const view = { rotation: initialRotation(), zoom: 1 };
+    let structure = null;
+    let pending = false;
+    const redraw = () => {
+      if (!structure || pending) return;
+      pending = true;
+      requestAnimationFrame(() => {
+        pending = false;
+        draw(target, structure, view);
+      });
+    };
+
+    let last = null;
+    target.addEventListener("pointerdown", (event) => {
+      last = [event.clientX, event.clientY];
+      target.setPointerCapture(event.pointerId);
+    });
+    target.addEventListener("pointermove", (event) => {
+      if (!last) return;
+      const dx = event.clientX - last[0], dy = event.clientY - last[1];
+      last = [event.clientX, event.clientY];
+      view.rotation = multiply(rotationX(dy * 0.01), multiply(rotationY(dx * 0.01), view.rotation));
+      redraw();
+    });
+    target.addEventListener("pointerup", () => (last = null));
+    target.addEventListener(
+      "wheel",
+      (event) => {
+        event.preventDefault();
+        view.zoom = Math.min(20, Math.max(0.2, view.zoom * Math.exp(-event.deltaY * 0.001)));
+        redraw();
+      },
+      { passive: false }
+    );
+    target.addEventListener("dblclick", () => {
+      view.rotation = initialRotation();
+      view.zoom = 1;
+      redraw();
+    });
+
+    return async () => {
+      structure = await decode(target.dataset.structure);
+      redraw();
+    };
+  }
+
+  function start() {
+    const targets = document.querySelectorAll("canvas.structure");
+    if (!targets.length) return;
+    const draw = createRenderer();
+    if (!draw) {
+      for (const target of targets) target.title = "WebGL2 is not available in this browser";
+      return;
+    }
+    // payloads are only decoded and drawn once their row is scrolled into view
+    const loaders = new Map();
+    const observer = new IntersectionObserver(
+      (entries) => {
+        for (const entry of entries) {
+          if (!entry.isIntersecting) continue;
+          observer.unobserve(entry.target);
+          loaders.get(entry.target)();
+        }
+      },
+      { rootMargin: "200px" }
+    );
+    for (const target of targets) {
+      loaders.set(target, attach(target, draw));
+      observer.observe(target);
+    }
+  }
+
+  if (document.readyState === "loading") document.addEventListener("DOMContentLoaded", start);
+  else start();
+})();
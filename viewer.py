@@ -0,0 +1,76 @@
+import base64
+import gzip
+import json
+import os
+
+import numpy as np
+from ase.data import covalent_radii
+from ase.data.colors import jmol_colors
+
+from archives import readResultAtoms, splitArchivePath
+from constants import *
+from tracing import count
+
+# drawn by viewer.js, copied next to the report pages
+VIEWER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "viewer.js")
+RADIUS_SCALE = 0.7  # of the covalent radius, neighbours touch without hiding each other
+
+
+def structurePayload(atoms):
+    """
+    What viewer.js needs to draw atoms, ex: a 144 atom slab is ~2.5 kB:
+    n: [[Z, count], ...] runs of atomic numbers (the POSCAR species blocks)
+    p: base64 little endian float32 positions (natoms x 3)
+    c: cell rows a, b, c
+    e: {Z: [r, g, b, radius]} jmol colors for the elements in n
+    """
+    runs = []
+    for z in atoms.numbers.tolist():
+        if runs and runs[-1][0] == z:
+            runs[-1][1] += 1
+        else:
+            runs.append([z, 1])
+    positions = np.ascontiguousarray(atoms.positions, dtype="<f4")
+    return {
+        "n": runs,
+        "p": base64.b64encode(positions.tobytes()).decode(),
+        "c": np.round(atoms.cell.array, 4).tolist(),
+        "e": {
+            str(z): np.round(jmol_colors[z], 3).tolist()
+            + [round(float(covalent_radii[z]) * RADIUS_SCALE, 3)]
+            for z in sorted(set(atoms.numbers.tolist()))
+        },
+    }
+
+
+def encodePayload(payload: dict, compress: bool = False):
+    # "gz:" + base64 gzip when compressed, viewer.js inflates it with DecompressionStream
+    text = json.dumps(payload, separators=(",", ":"))
+    if not compress:
+        return text
+    # mtime=0 so the same structure always encodes to the same bytes
+    return "gz:" + base64.b64encode(gzip.compress(text.encode(), mtime=0)).decode()
+
+
+def _sourceMtime(path: str):
+    # a member of a results archive changes with its zip
+    zipPath, _ = splitArchivePath(path)
+    return os.path.getmtime(zipPath or path)
+
+
+def writeStructurePayload(job):
+    """
+    Payload of a POSCAR/CONTCAR (archives included) in dst, skipped when dst is newer
+    than the structure so an unchanged geometry is never read again. Returns dst
+    """
+    src, dst, compress = job
+    if os.path.exists(dst) and os.path.getmtime(dst) >= _sourceMtime(src):
+        count("cache hits")
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    text = encodePayload(structurePayload(readResultAtoms(src)), compress)
+    tmp = dst + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, dst)
+    return dst
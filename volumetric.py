@@ -0,0 +1,217 @@
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from constants import *
+
+READ_CHUNK = 1 << 24  # bytes of text parsed at a time
+Z_CHUNK = 32  # z planes processed at a time
+
+
+class Volumetric:
+    """
+    CHGCAR / LOCPOT (or CHG, PARCHG, AECCAR) grid. The text grid is parsed once in chunks into
+    {path}.npy, later opens memory map that file instead of reparsing hundreds of MB.
+    grid is (NGX, NGY, NGZ) in the file's units: rho * V_cell for charge files, eV for LOCPOT
+    """
+
+    def __init__(self, path: str, cache=True):
+        self.path = path
+        self.cachePath = f"{path}.npy"
+        self.isPotential = "LOCPOT" in os.path.basename(path).upper()
+        self._readHeader()
+
+        fresh = os.path.exists(self.cachePath) and os.path.getmtime(
+            self.cachePath
+        ) >= os.path.getmtime(path)
+        if cache and fresh:
+            self.grid = np.load(self.cachePath, mmap_mode="r")
+        else:
+            self.grid = self._parseGrid(cache)
+
+    def _readHeader(self):
+        with open(self.path, "rb") as f:
+            lines = [f.readline() for _ in range(6)]
+            scale = float(lines[1].split()[0])
+            self.cell = scale * np.array(
+                [[float(v) for v in line.split()[:3]] for line in lines[2:5]]
+            )
+
+            if lines[5].split()[0].isdigit():
+                # VASP 4, no symbols line
+                self.species = None
+                countLine = lines[5]
+            else:
+                self.species = lines[5].decode().split()
+                countLine = f.readline()
+                lines.append(countLine)
+            self.counts = [int(c) for c in countLine.split()]
+            self.natoms = sum(self.counts)
+
+            mode = f.readline()
+            lines.append(mode)
+            if mode.strip()[:1] in (b"S", b"s"):
+                mode = f.readline()
+                lines.append(mode)
+
+            coordLines = [f.readline() for _ in range(self.natoms)]
+            lines.extend(coordLines)
+            coords = np.array(
+                [[float(v) for v in line.split()[:3]] for line in coordLines]
+            )
+            if mode.strip()[:1] in (b"C", b"c", b"K", b"k"):
+                self.positions = scale * coords
+            else:
+                self.positions = coords @ self.cell
+
+            line = f.readline()
+            while not line.strip():
+                lines.append(line)
+                line = f.readline()
+            lines.append(line)
+            self.shape = tuple(int(n) for n in line.split()[:3])
+            self.header = b"".join(lines)
+            self.dataOffset = f.tell()
+
+    def _parseGrid(self, cache):
+        # x runs fastest in the file, which is the memory order of a fortran ordered grid,
+        # so values are streamed straight into the flat view of the (memory mapped) grid
+        if cache:
+            grid = open_memmap(
+                self.cachePath + ".part",
+                mode="w+",
+                dtype=np.float32,
+                shape=self.shape,
+                fortran_order=True,
+            )
+        else:
+            grid = np.empty(self.shape, dtype=np.float32, order="F")
+        flat = grid.reshape(-1, order="F")
+
+        filled = 0
+        with open(self.path, "rb") as f:
+            f.seek(self.dataOffset)
+            while filled < len(flat):
+                lines = f.readlines(READ_CHUNK)
+                if not lines:
+                    print(
+                        f"{bcolors.FAIL}{self.path} ended before the grid did{bcolors.ENDC}"
+                    )
+                    raise ValueError
+                values = np.array(
+                    b"".join(lines).split()[: len(flat) - filled], dtype=np.float32
+                )
+                flat[filled : filled + len(values)] = values
+                filled += len(values)
+
+        if not cache:
+            return grid
+
+        grid.flush()
+        del grid, flat
+        os.replace(self.cachePath + ".part", self.cachePath)
+        return np.load(self.cachePath, mmap_mode="r")
+
+    @property
+    def volume(self):
+        return abs(np.linalg.det(self.cell))
+
+    def zPlanes(self, chunk: int = Z_CHUNK):
+        # (start, block) of z planes in physical units, contiguous in the fortran ordered cache
+        scale = 1.0 if self.isPotential else 1.0 / self.volume
+        for start in range(0, self.shape[2], chunk):
+            yield start, np.asarray(
+                self.grid[:, :, start : start + chunk], dtype=np.float64
+            ) * scale
+
+    def planarAverage(self):
+        """
+        xy averaged profile along z -> (z in Å, value). eV for LOCPOT, e/Å^3 for charge files
+        """
+        avg = np.empty(self.shape[2])
+        for start, block in self.zPlanes():
+            avg[start : start + block.shape[2]] = block.mean(axis=(0, 1))
+        z = np.arange(self.shape[2]) / self.shape[2] * self.cell[2, 2]
+        return z, avg
+
+
+def vacuumLevels(volumetric, z=None, avg=None):
+    """
+    Potential in the vacuum above the top surface and below the bottom surface.
+    With a dipole correction these differ, the difference is the potential step.
+    Sampled a quarter and three quarters of the way across the vacuum gap
+    """
+    if z is None:
+        z, avg = volumetric.planarAverage()
+    c = volumetric.cell[2, 2]
+    atomsZ = np.sort(volumetric.positions[:, 2] % c)
+    gaps = np.diff(np.r_[atomsZ, atomsZ[0] + c])
+    top = np.argmax(gaps)
+    start, gap = atomsZ[top], gaps[top]
+
+    above = np.interp((start + 0.25 * gap) % c, z, avg, period=c)
+    below = np.interp((start + 0.75 * gap) % c, z, avg, period=c)
+    return above, below
+
+
+def workFunction(locpotPath: str, efermi: float):
+    """Work function of the top surface and the potential step across the slab, in eV"""
+    locpot = Volumetric(locpotPath)
+    above, below = vacuumLevels(locpot)
+    return above - efermi, above - below
+
+
+def chargeDensityDifference(
+    pathBoth: str, pathSurf: str, pathAds: str, outputPath: str = None
+):
+    """
+    rho(slab + ads) - rho(slab) - rho(ads), same three terms as adsorptionEnergy.
+    All three CHGCARs need the same cell and grid. Done a few z planes at a time, the full
+    difference is written to outputPath (.npy, memory mapped) when given.
+    Returns (z, planar averaged difference in e/Å^3)
+    """
+    both, surf, ads = Volumetric(pathBoth), Volumetric(pathSurf), Volumetric(pathAds)
+    if not both.shape == surf.shape == ads.shape:
+        print(
+            f"{bcolors.FAIL}Grids don't match: {both.shape} {surf.shape} {ads.shape}{bcolors.ENDC}"
+        )
+        raise ValueError
+
+    out = None
+    if outputPath is not None:
+        out = open_memmap(
+            outputPath,
+            mode="w+",
+            dtype=np.float32,
+            shape=both.shape,
+            fortran_order=True,
+        )
+
+    avg = np.empty(both.shape[2])
+    for (start, b), (_, s), (_, a) in zip(
+        both.zPlanes(), surf.zPlanes(), ads.zPlanes()
+    ):
+        diff = b - s - a
+        avg[start : start + diff.shape[2]] = diff.mean(axis=(0, 1))
+        if out is not None:
+            out[:, :, start : start + diff.shape[2]] = diff
+
+    if out is not None:
+        out.flush()
+    z = np.arange(both.shape[2]) / both.shape[2] * both.cell[2, 2]
+    return z, avg
+
+
+def writeVolumetric(path: str, like: Volumetric, grid):
+    """CHGCAR style text file (ex: for VESTA) with the structure of `like` and a new grid"""
+    grid = np.asarray(grid, dtype=np.float64)
+    if not like.isPotential:
+        grid = grid * like.volume
+    flat = grid.reshape(-1, order="F")
+    full = len(flat) - len(flat) % 5
+    with open(path, "wb") as f:
+        f.write(like.header)
+        np.savetxt(f, flat[:full].reshape(-1, 5), fmt="%18.11E", delimiter="")
+        if full < len(flat):
+            np.savetxt(f, flat[full:][None], fmt="%18.11E", delimiter="")
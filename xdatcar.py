@@ -0,0 +1,146 @@
+import hashlib
+import mmap
+import os
+import re
+
+import numpy as np
+
+from constants import *
+
+FRAME_HEADER = re.compile(rb"configuration=\s*\d+[^\n]*\n")
+HEAD_BYTES = 4096  # hashed with the index, a different run in the same file rebuilds it
+
+
+class Xdatcar:
+    """
+    Random access XDATCAR reader. The first open scans the file once for the byte offset of
+    every frame and caches it next to the file ({path}.index.npz), after that the file is
+    memory mapped and any frame or strided slice is parsed on demand as float32.
+
+    xd = Xdatcar("H/1stLayer/O0/XDATCAR")
+    xd[-1]          # (natoms, 3) direct coordinates of the last frame
+    xd[::100]       # (n, natoms, 3)
+    xd.positions(5) # cartesian
+
+    Variable cell runs (NPT, ISIF=3) are read with the first cell only, the per frame
+    lattice headers are skipped
+    """
+
+    def __init__(self, path: str, cacheIndex=True):
+        self.path = path
+        self.indexPath = f"{path}.index.npz"
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._readHeader()
+        self.offsets = self._loadOrBuildIndex(cacheIndex)
+
+    def _readHeader(self):
+        lines = self.mm[: self.mm.find(b"configuration=")].decode().splitlines()
+        scale = float(lines[1].split()[0])
+        self.cell = scale * np.array(
+            [[float(v) for v in line.split()[:3]] for line in lines[2:5]]
+        )
+
+        if lines[5].split()[0].isdigit():
+            # VASP 4, no symbols line
+            self.symbols = None
+            counts = [int(c) for c in lines[5].split()]
+        else:
+            species = lines[5].split()
+            counts = [int(c) for c in lines[6].split()]
+            self.symbols = [
+                sym for sym, count in zip(species, counts) for _ in range(count)
+            ]
+        self.natoms = sum(counts)
+
+    def _scan(self, start: int):
+        offsets = [match.end() for match in FRAME_HEADER.finditer(self.mm, start)]
+        # a frame that is still being written by a running MD job
+        if offsets and len(self._parse(offsets[-1], len(self.mm))) < 3 * self.natoms:
+            offsets.pop()
+        return offsets
+
+    def _headHash(self):
+        return hashlib.sha1(self.mm[:HEAD_BYTES]).hexdigest()
+
+    def _isFrameStart(self, offset: int):
+        # the byte right after a "Direct configuration=" line
+        line = self.mm.rfind(b"\n", 0, max(offset - 1, 0)) + 1
+        match = FRAME_HEADER.search(self.mm, line, offset)
+        return match is not None and match.end() == offset
+
+    def _loadOrBuildIndex(self, cacheIndex):
+        size = len(self.mm)
+        mtime = os.path.getmtime(self.path)
+        head = self._headHash()
+
+        offsets = np.empty(0, dtype=np.int64)
+        if cacheIndex and os.path.exists(self.indexPath):
+            cached = np.load(self.indexPath)
+            same = "head" in cached and str(cached["head"]) == head
+            if same and int(cached["size"]) == size and float(cached["mtime"]) == mtime:
+                return cached["offsets"]
+            # file grew (MD still running), keep the frames we know about. A longer
+            # rerun written over the same file has other offsets, it is scanned again
+            known = cached["offsets"]
+            if (
+                same
+                and int(cached["size"]) < size
+                and (len(known) == 0 or self._isFrameStart(int(known[-1])))
+            ):
+                offsets = known
+
+        resume = int(offsets[-1]) if len(offsets) else 0
+        offsets = np.concatenate(
+            [offsets, np.array(self._scan(resume), dtype=np.int64)]
+        )
+
+        if cacheIndex:
+            with open(self.indexPath, "wb") as f:
+                np.savez(f, offsets=offsets, size=size, mtime=mtime, head=head)
+        return offsets
+
+    def _parse(self, start: int, end: int):
+        return np.array(self.mm[start:end].split()[: 3 * self.natoms], dtype=np.float32)
+
+    def _frame(self, i: int):
+        start = int(self.offsets[i])
+        # coordinates are followed by the next "Direct configuration" line (and a header for
+        # variable cell runs), only the first 3 * natoms tokens are read
+        end = int(self.offsets[i + 1]) if i + 1 < len(self.offsets) else len(self.mm)
+        return self._parse(start, end).reshape(self.natoms, 3)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            frames = range(*key.indices(len(self)))
+            out = np.empty((len(frames), self.natoms, 3), dtype=np.float32)
+            for n, i in enumerate(frames):
+                out[n] = self._frame(i)
+            return out
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            print(
+                f"{bcolors.FAIL}Frame {key} requested, {self.path} has {len(self)}{bcolors.ENDC}"
+            )
+            raise IndexError
+        return self._frame(key)
+
+    def positions(self, key):
+        """Cartesian positions (Å) of a frame or slice of frames"""
+        return self[key] @ self.cell.astype(np.float32)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()